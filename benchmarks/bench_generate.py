@@ -0,0 +1,38 @@
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from typestool.generate import render_type_body, write_types_xml
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark types.xml generation throughput.")
+    parser.add_argument("--types", type=int, default=1_000_000, help="number of type names to generate")
+    parser.add_argument("--max-seconds", type=float, default=5.0, help="fail when generation takes longer than this")
+    args = parser.parse_args(argv)
+
+    type_names = [f"Synthetic_Item_{i}" for i in range(args.types)]
+    fields = {"nominal": "10", "lifetime": "3600", "restock": "0", "min": "5", "quantmin": "-1", "quantmax": "-1", "cost": "100"}
+    flags = {"count_in_cargo": "0", "count_in_hoarder": "0", "count_in_map": "1", "count_in_player": "0", "crafted": "0", "deloot": "0"}
+    body = render_type_body(fields, flags, ["Tools"], ["Town", "Village"], ["Tier1"])
+
+    with tempfile.TemporaryDirectory() as tmp:
+        output_file = os.path.join(tmp, "types.xml")
+        start = time.perf_counter()
+        write_types_xml(type_names, body, output_file)
+        elapsed = time.perf_counter() - start
+        size = os.path.getsize(output_file)
+
+    print(f"generate: {args.types} types, {size / 1e6:.1f} MB in {elapsed:.2f}s ({args.types / elapsed:,.0f} types/s)")
+    if elapsed > args.max_seconds:
+        print(f"FAIL: slower than {args.max_seconds:.2f}s")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,278 @@
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+from benchmarks.synthetic import SEED, synthetic_names, write_synthetic_types
+
+# Times the paths behind the GUI actions on synthetic files of each size,
+# without Tk. Every size and path runs in a fresh process, so its peak
+# memory is its own; preparing the input (loading the file for search, save
+# and bulk edit) is not timed but shows up in the peak.
+#
+#   python benchmarks/bench_suite.py                  1k, 10k and 100k types
+#   python benchmarks/bench_suite.py --sizes all      also 1M (minutes, a few GB)
+#   python benchmarks/bench_suite.py --update-thresholds
+
+SIZES = {"1k": 1_000, "10k": 10_000, "100k": 100_000, "1m": 1_000_000}
+DEFAULT_SIZES = ("1k", "10k", "100k")
+PATHS = ("load", "search", "save", "bulk", "generate", "trader")
+THRESHOLDS_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "thresholds.json")
+# New thresholds are this many times the measured time, and never below the
+# floor, so only a real regression trips them and not run-to-run noise.
+THRESHOLD_HEADROOM = 2.0
+THRESHOLD_FLOOR = 0.25
+SEARCH_QUERIES = 200
+BULK_SHARE = 10
+
+
+def peak_memory_mb():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Kilobytes on Linux, bytes on macOS.
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def load_document(types_file):
+    # What the GUI does when a file is opened: parse with the name batches
+    # going into the search index, then validate, fingerprint for the
+    # watcher and total up the economy.
+    from typestool.aggregate import EconomyAggregates
+    from typestool.loader import TypesLoader
+    from typestool.search import SearchIndex
+    from typestool.validate import TypesValidator
+    from typestool.watch import fingerprint_elements
+
+    index = SearchIndex()
+    loader = TypesLoader(types_file)
+    for batch in loader.batches():
+        index.extend(batch)
+    index.prepare()
+    type_elems = loader.root_element.findall('type')
+    TypesValidator().validate_elements(type_elems)
+    fingerprint_elements(type_elems)
+    EconomyAggregates().build_elements(type_elems)
+    return loader, index
+
+
+def prepare_load(types_file, work_dir, count):
+    return lambda: load_document(types_file)
+
+
+def prepare_search(types_file, work_dir, count):
+    # Type-ahead queries (short, prefix and substring) plus the exact lookup
+    # done when a suggestion is picked.
+    loader, index = load_document(types_file)
+    names = loader.registry.names()
+    step = max(1, len(names) // SEARCH_QUERIES)
+    picked = names[::step][:SEARCH_QUERIES]
+    queries = []
+    for name in picked:
+        queries += [name[:2], name[:5], name[len(name) // 3:len(name) // 3 + 4], name]
+
+    def run():
+        for query in queries:
+            index.search(query)
+        for name in picked:
+            loader.registry.get(name.lower(), ignore_case=True)
+    return run
+
+
+def prepare_save(types_file, work_dir, count):
+    # One edited type saved as the autosave does it, spliced into the file.
+    from typestool.model import update_type_element
+    from typestool.spans import TypeSpans, save_tree
+    from typestool.storage import FSYNC_NEVER
+
+    loader, _ = load_document(types_file)
+    spans = TypeSpans(types_file)
+    spans.scan(loader.root_element)
+    name = loader.registry.names()[len(loader.registry) // 2]
+    type_elem = loader.registry.get(name)
+
+    def run():
+        update_type_element(type_elem, {"nominal": "11"}, {"crafted": "1"})
+        save_tree(loader.tree, types_file, spans, (name,), FSYNC_NEVER)
+    return run
+
+
+def prepare_bulk(types_file, work_dir, count):
+    from typestool.bulk import apply_bulk_edit
+    from typestool.history import EditHistory
+    from typestool.spans import TypeSpans, save_tree
+    from typestool.storage import FSYNC_NEVER
+
+    loader, _ = load_document(types_file)
+    spans = TypeSpans(types_file)
+    spans.scan(loader.root_element)
+    registry = loader.registry
+    selected = registry.names()[::BULK_SHARE]
+    history = EditHistory()
+
+    def run():
+        type_elems = [registry.get(name) for name in selected]
+        history.apply("bulk", type_elems, lambda: apply_bulk_edit(registry, selected, {"nominal": "7", "min": "3"}, {"count_in_cargo": "1"}, None, ["Town", "Village"], None))
+        save_tree(loader.tree, types_file, spans, selected, FSYNC_NEVER)
+    return run
+
+
+def prepare_generate(types_file, work_dir, count):
+    from typestool.generate import generate_types_xml
+
+    names = synthetic_names(count)
+    fields = {"nominal": "10", "lifetime": "3600", "restock": "0", "min": "5", "quantmin": "-1", "quantmax": "-1", "cost": "100"}
+    flags = {"count_in_cargo": "0", "count_in_hoarder": "0", "count_in_map": "1", "count_in_player": "0", "crafted": "0", "deloot": "0"}
+    output_file = os.path.join(work_dir, "generated.xml")
+    return lambda: generate_types_xml(names, output_file, fields, flags, ["tools"], ["Town", "Village"], ["Tier1"])
+
+
+def prepare_trader(types_file, work_dir, count):
+    from typestool.trader import write_trader_json
+
+    output_file = os.path.join(work_dir, "trader.json")
+    return lambda: write_trader_json(types_file, output_file, "Everything", "Deliver", "FBFCFEFF", 75)
+
+
+PREPARE = {
+    "load": prepare_load,
+    "search": prepare_search,
+    "save": prepare_save,
+    "bulk": prepare_bulk,
+    "generate": prepare_generate,
+    "trader": prepare_trader,
+}
+
+
+def run_worker(path, types_file, count):
+    # Runs one path in this process and prints its result as JSON.
+    with tempfile.TemporaryDirectory() as work_dir:
+        # Paths that change the file work on a copy.
+        if path in ("save", "bulk"):
+            copy = os.path.join(work_dir, "types.xml")
+            with open(types_file, 'rb') as src, open(copy, 'wb') as dst:
+                dst.write(src.read())
+            types_file = copy
+        run = PREPARE[path](types_file, work_dir, count)
+        before = peak_memory_mb()
+        start = time.perf_counter()
+        run()
+        seconds = time.perf_counter() - start
+        print(json.dumps({"seconds": seconds, "peak_mb": peak_memory_mb(), "setup_peak_mb": before}))
+
+
+def input_file(data_dir, size, seed):
+    types_file = os.path.join(data_dir, f"types-{size}-{seed}.xml")
+    if not os.path.exists(types_file):
+        partial = types_file + ".partial"
+        write_synthetic_types(partial, SIZES[size], seed)
+        os.replace(partial, types_file)
+    return types_file
+
+
+def measure(path, types_file, count):
+    env = dict(os.environ)
+    # Every run parses the file itself, a warm parse cache would hide the
+    # load cost.
+    env["TYPESTOOL_CACHE_DIR"] = ""
+    result = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), "--worker", path, types_file, str(count)],
+        env=env, capture_output=True, text=True,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"{path} failed:\n{result.stderr.strip()}")
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def load_thresholds(thresholds_file):
+    try:
+        with open(thresholds_file, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+def save_thresholds(thresholds_file, thresholds, results):
+    for path, by_size in results.items():
+        for size, result in by_size.items():
+            thresholds.setdefault(path, {})[size] = round(max(result["seconds"] * THRESHOLD_HEADROOM, THRESHOLD_FLOOR), 2)
+    with open(thresholds_file, 'w', encoding='utf-8') as f:
+        json.dump(thresholds, f, indent=2, sort_keys=True)
+        f.write("\n")
+
+
+def format_mb(value):
+    return f"{value:8.0f}" if value is not None else "       -"
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if argv and argv[0] == "--worker":
+        run_worker(argv[1], argv[2], int(argv[3]))
+        return 0
+
+    parser = argparse.ArgumentParser(description="Benchmark the main types.xml paths on synthetic files.")
+    parser.add_argument("--sizes", default=",".join(DEFAULT_SIZES), help=f"comma separated sizes out of {', '.join(SIZES)}, or 'all'")
+    parser.add_argument("--paths", default=",".join(PATHS), help=f"comma separated paths out of {', '.join(PATHS)}")
+    parser.add_argument("--seed", type=int, default=SEED, help="seed for the synthetic files")
+    parser.add_argument("--data-dir", help="keep the synthetic files here between runs instead of a temp folder")
+    parser.add_argument("--thresholds", default=THRESHOLDS_FILE, help="JSON file with the maximum seconds per path and size")
+    parser.add_argument("--update-thresholds", action="store_true", help=f"write {THRESHOLD_HEADROOM:g}x the measured times as the new thresholds")
+    parser.add_argument("--json", dest="json_file", help="also write the results to this JSON file")
+    args = parser.parse_args(argv)
+
+    sizes = list(SIZES) if args.sizes == "all" else [size.strip().lower() for size in args.sizes.split(",") if size.strip()]
+    paths = [path.strip() for path in args.paths.split(",") if path.strip()]
+    for size in sizes:
+        if size not in SIZES:
+            parser.error(f"unknown size '{size}', expected one of {', '.join(SIZES)}")
+    for path in paths:
+        if path not in PATHS:
+            parser.error(f"unknown path '{path}', expected one of {', '.join(PATHS)}")
+
+    thresholds = load_thresholds(args.thresholds)
+    results = {}
+    failures = []
+    print(f"python {platform.python_version()} on {platform.platform()}, seed {args.seed}")
+    print(f"{'path':<10}{'size':>6}{'seconds':>10}{'limit':>8}{'peak MB':>9}{'setup MB':>9}")
+    with tempfile.TemporaryDirectory() as tmp:
+        data_dir = args.data_dir or tmp
+        os.makedirs(data_dir, exist_ok=True)
+        for size in sizes:
+            types_file = input_file(data_dir, size, args.seed)
+            for path in paths:
+                result = measure(path, types_file, SIZES[size])
+                results.setdefault(path, {})[size] = result
+                limit = thresholds.get(path, {}).get(size)
+                status = ""
+                if limit is not None and result["seconds"] > limit and not args.update_thresholds:
+                    status = "  FAIL"
+                    failures.append(f"{path} at {size}: {result['seconds']:.2f}s, limit {limit:.2f}s")
+                limit_text = f"{limit:8.2f}" if limit is not None else "       -"
+                print(f"{path:<10}{size:>6}{result['seconds']:10.3f}{limit_text}{format_mb(result['peak_mb'])} {format_mb(result['setup_peak_mb'])}{status}", flush=True)
+
+    if args.json_file:
+        with open(args.json_file, 'w', encoding='utf-8') as f:
+            json.dump({"python": platform.python_version(), "platform": platform.platform(), "seed": args.seed, "results": results}, f, indent=2)
+    if args.update_thresholds:
+        save_thresholds(args.thresholds, thresholds, results)
+        print(f"thresholds written to {args.thresholds}")
+        return 0
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
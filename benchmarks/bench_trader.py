@@ -0,0 +1,69 @@
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from typestool.generate import render_type_body, write_types_xml
+from typestool.trader import write_split_trader_json, write_trader_json
+
+CATEGORIES = ["clothes", "containers", "explosives", "food", "tools", "weapons"]
+TIERS = ["Tier1", "Tier2", "Tier3", "Tier4"]
+
+
+def write_input(output_file, count):
+    # Several bodies concatenated so the file has a spread of categories and
+    # tiers; write_types_xml renders one body per call.
+    fields = {"nominal": "10", "lifetime": "3600", "restock": "0", "min": "5", "quantmin": "-1", "quantmax": "-1", "cost": "100"}
+    flags = {"count_in_cargo": "0", "count_in_hoarder": "0", "count_in_map": "1", "count_in_player": "0", "crafted": "0", "deloot": "0"}
+    parts = []
+    groups = [(category, tier) for category in CATEGORIES for tier in TIERS]
+    per_group = count // len(groups) + 1
+    for index, (category, tier) in enumerate(groups):
+        names = [f"Synthetic_{category}_{tier}_{i}" for i in range(per_group)][:max(0, count - index * per_group)]
+        part_file = f"{output_file}.{index}"
+        write_types_xml(names, render_type_body(fields, flags, [category], ["Town"], [tier]), part_file)
+        with open(part_file, encoding='utf-8') as f:
+            parts.append(f.read().split("<types>\n", 1)[1].rsplit("</types>", 1)[0])
+        os.remove(part_file)
+    with open(output_file, "w", encoding='utf-8') as f:
+        f.write('<?xml version="1.0" encoding="UTF-8" standalone="yes" ?>\n<types>\n')
+        f.writelines(parts)
+        f.write("</types>\n")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark trader JSON export.")
+    parser.add_argument("--types", type=int, default=50_000, help="number of types in the input")
+    parser.add_argument("--max-seconds", type=float, default=5.0, help="fail when an export takes longer than this")
+    args = parser.parse_args(argv)
+
+    failed = False
+    with tempfile.TemporaryDirectory() as tmp:
+        # A private cache directory, so the first run is a real parse and the
+        # second shows the cached reopen.
+        os.environ["TYPESTOOL_CACHE_DIR"] = os.path.join(tmp, "cache")
+        types_file = os.path.join(tmp, "types.xml")
+        write_input(types_file, args.types)
+
+        runs = [
+            ("single file, cold", lambda: write_trader_json(types_file, os.path.join(tmp, "trader.json"), "All", "Deliver", "FBFCFEFF", 75)),
+            ("single file, cached", lambda: write_trader_json(types_file, os.path.join(tmp, "trader.json"), "All", "Deliver", "FBFCFEFF", 75)),
+            ("split category-value", lambda: write_split_trader_json(types_file, os.path.join(tmp, "split"), "category-value")),
+        ]
+        for label, run in runs:
+            start = time.perf_counter()
+            result = run()
+            elapsed = time.perf_counter() - start
+            files = len(result) if isinstance(result, dict) else 1
+            print(f"trader {label}: {args.types} types, {files} files in {elapsed:.2f}s ({args.types / elapsed:,.0f} types/s)")
+            if elapsed > args.max_seconds:
+                print(f"FAIL: slower than {args.max_seconds:.2f}s")
+                failed = True
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
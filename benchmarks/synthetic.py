@@ -0,0 +1,112 @@
+import argparse
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from typestool.generate import write_records_xml
+from typestool.model import new_record
+from typestool.storage import FSYNC_NEVER
+
+# Synthetic types.xml files shaped like a modded vanilla economy: mostly
+# clothing, a long tail of low nominals, one category, up to three usages
+# and one or two value tiers per type. Same seed and size, same file.
+
+SEED = 47
+
+# category: (weight, name stems, usages with weights)
+CATEGORY_PROFILES = {
+    "clothes": (40, ["TShirt", "Hoodie", "Jeans", "Cargo", "Boots", "Sneakers", "Jacket", "Vest", "Helmet", "Gloves", "Balaclava", "Backpack"], {"Town": 5, "Village": 5, "Military": 3, "Police": 2, "Hunting": 2, "Farm": 2, "Industrial": 1}),
+    "weapons": (15, ["AKM", "M4A1", "SKS", "Mosin", "FAL", "MP5", "Glock", "Deagle", "Mag", "Ammo", "Optic", "Suppressor"], {"Military": 6, "Police": 3, "Hunting": 3, "Town": 1}),
+    "food": (12, ["Can", "Rice", "Apple", "Pear", "Sardines", "Tuna", "Bacon", "Water", "Soda", "Powder"], {"Town": 5, "Village": 5, "Farm": 3, "Coast": 1, "Office": 1}),
+    "tools": (10, ["Hammer", "Wrench", "Pliers", "Shovel", "Hatchet", "Saw", "Knife", "Lockpick", "Flashlight", "Rope"], {"Industrial": 5, "Farm": 3, "Village": 3, "Town": 2}),
+    "vehiclesparts": (8, ["Wheel", "Door", "Hood", "Trunk", "SparkPlug", "Battery", "Radiator", "HeadlightH7"], {"Industrial": 5, "Town": 2, "Farm": 1}),
+    "containers": (6, ["Barrel", "Crate", "Tent", "Case", "Pouch", "Box"], {"Town": 2, "Military": 2, "Farm": 1, "Industrial": 1}),
+    "explosives": (3, ["Grenade", "Claymore", "Plastic", "Flashbang", "Smoke"], {"Military": 5, "Police": 1}),
+    "books": (1, ["Book", "Map", "Note"], {"School": 3, "Office": 3, "Town": 1}),
+}
+VARIANTS = ["", "Black", "Green", "Blue", "Red", "Grey", "Brown", "Camo", "Winter", "Desert", "Olive", "Tan", "Worn", "Damaged", "Large", "Small"]
+TIER_WEIGHTS = {"Tier1": 4, "Tier2": 4, "Tier3": 3, "Tier4": 1}
+HIGH_TIER_WEIGHTS = {"Tier1": 1, "Tier2": 2, "Tier3": 4, "Tier4": 3}
+UNCATEGORIZED_SHARE = 0.05
+LIFETIMES = [3600, 7200, 14400, 28800, 45000, 3888000]
+LIFETIME_WEIGHTS = [5, 10, 30, 30, 20, 5]
+
+
+def _weighted(rng, weights, count):
+    # count distinct picks, weights keyed by name.
+    names = list(weights)
+    picked = []
+    count = min(count, len(names))
+    while len(picked) < count:
+        name = rng.choices(names, [weights[name] for name in names])[0]
+        if name not in picked:
+            picked.append(name)
+    return picked
+
+
+def iter_synthetic_records(count, seed=SEED):
+    rng = random.Random(seed)
+    categories = list(CATEGORY_PROFILES)
+    category_weights = [CATEGORY_PROFILES[category][0] for category in categories]
+    seen = {}
+    for _ in range(count):
+        category = rng.choices(categories, category_weights)[0]
+        _, stems, usage_weights = CATEGORY_PROFILES[category]
+        base = rng.choice(stems) + ("_" + rng.choice(VARIANTS) if rng.random() < 0.7 else "")
+        base = base.rstrip("_")
+        # Repeated stems get a numeric suffix, like the modded packs do.
+        number = seen.get(base, 0)
+        seen[base] = number + 1
+        record = new_record(f"{base}_{number}" if number else base)
+
+        nominal = 0 if rng.random() < 0.12 else min(200, int(rng.paretovariate(1.3) * 3))
+        record["nominal"] = str(nominal)
+        record["min"] = str(nominal // 2 if nominal else 0)
+        record["lifetime"] = str(rng.choices(LIFETIMES, LIFETIME_WEIGHTS)[0])
+        record["restock"] = str(rng.choice([0, 0, 0, 1800, 3600]))
+        if category in ("food", "weapons") and rng.random() < 0.5:
+            quantmin = rng.choice([10, 20, 30, 50])
+            record["quantmin"], record["quantmax"] = str(quantmin), str(rng.randint(quantmin, 100))
+        else:
+            record["quantmin"] = record["quantmax"] = "-1"
+        record["cost"] = "100"
+        record["flags"] = {
+            "count_in_cargo": "0",
+            "count_in_hoarder": "0",
+            "count_in_map": "1",
+            "count_in_player": "0",
+            "crafted": "1" if rng.random() < 0.03 else "0",
+            "deloot": "1" if rng.random() < 0.01 else "0",
+        }
+
+        if rng.random() >= UNCATEGORIZED_SHARE:
+            record["category"] = [category]
+        record["usage"] = _weighted(rng, usage_weights, rng.choice([0, 1, 1, 2, 2, 3]))
+        tiers = HIGH_TIER_WEIGHTS if category in ("weapons", "explosives") else TIER_WEIGHTS
+        record["value"] = _weighted(rng, tiers, rng.choice([0, 1, 1, 1, 2]))
+        yield record
+
+
+def synthetic_names(count, seed=SEED):
+    return [record["name"] for record in iter_synthetic_records(count, seed)]
+
+
+def write_synthetic_types(output_file, count, seed=SEED):
+    return write_records_xml(iter_synthetic_records(count, seed), output_file, FSYNC_NEVER)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Write a synthetic types.xml for benchmarks.")
+    parser.add_argument("output", help="types.xml to write")
+    parser.add_argument("--types", type=int, default=10_000, help="number of types")
+    parser.add_argument("--seed", type=int, default=SEED, help="random seed, the same seed gives the same file")
+    args = parser.parse_args(argv)
+    written = write_synthetic_types(args.output, args.types, args.seed)
+    print(f"wrote {written} types to {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,8 +1,75 @@
 import tkinter as tk
-from tkinter import ttk, filedialog, messagebox, StringVar, Toplevel, Listbox, MULTIPLE, Scrollbar
+from tkinter import ttk, filedialog, messagebox, simpledialog, Listbox, MULTIPLE, Scrollbar
 import os
 import xml.etree.ElementTree as ET
-import json
+
+from typestool import instrument
+from typestool.aggregate import GROUPINGS as AGGREGATE_GROUPINGS, METRICS as AGGREGATE_METRICS, EconomyAggregates
+from typestool.autosave import STATE_PENDING, STATE_SAVED, STATE_SAVING, CommitQueue
+from typestool.batch import DONE as BATCH_DONE, FAILED as BATCH_FAILED, SKIPPED as BATCH_SKIPPED, batch_summary, load_manifest, run_batch
+from typestool.bulk import TypeColumns, apply_bulk_edit, apply_rule_plan, plan_rule_edit
+from typestool.cache import default_cache, default_cache_dir
+from typestool.generate import generate_types_xml
+from typestool.history import EditHistory
+from typestool.jobs import JobRunner, watch_job
+from typestool.loader import TypesLoader
+from typestool.merge import STRATEGIES, MergePolicy, merge_types_files, parse_field_rules
+from typestool.model import FIELDS, pack_record, record_from_element, update_type_element
+from typestool.namelist import FilteredNameList
+from typestool.names import read_new_type_names
+from typestool.presets import LEGACY_FIELD_KEYS, PresetLibrary, format_rules, generate_preset_types_xml, import_settings_file, load_presets, new_preset, parse_rules, save_presets
+from typestool.trader import ITEM_FIELDS as TRADER_ITEM_FIELDS, SPLIT_MODES, TraderDocument, write_split_trader_json, write_trader_json
+from typestool.search import SearchIndex
+from typestool.spans import TypeSpans
+from typestool.storage import file_state
+from typestool.validate import ERROR as VALIDATION_ERROR, WARNING as VALIDATION_WARNING, TypesValidator
+from typestool.watch import TypesWatcher, fingerprint_elements
+
+SEARCH_DEBOUNCE_MS = 150
+AUTOSAVE_INTERVAL_MS = 2000
+# One of typestool.storage.FSYNC_POLICIES: "never", "file" or "full".
+AUTOSAVE_FSYNC = "file"
+RULE_PREVIEW_LIMIT = 20
+NAME_LIST_ROWS = 20
+NAME_LIST_WHEEL_ROWS = 3
+TRADER_SPLIT_NONE = "none"
+TRADER_DISPLAY_NAME = "My Category Title !"
+VALIDATION_REPORT_LIMIT = 5000
+WATCH_INTERVAL_MS = 1000
+CONFLICT_LIST_LIMIT = 20
+PRESETS_FILE = "presets.json"
+# Written by older versions, imported once when there is no presets file.
+LEGACY_SETTINGS_FILE = "settings.txt"
+BATCH_STATE_COLORS = {BATCH_DONE: "dark green", BATCH_FAILED: "red", BATCH_SKIPPED: "grey"}
+search_index = SearchIndex()
+search_after_id = None
+job_runner = JobRunner()
+generation_job = None
+commit_queue = None
+types_watcher = None
+validator = None
+aggregates = None
+# Cached snapshot of the file being loaded and its lowercase name index,
+# answers lookups until the parsed tree replaces it.
+cached_preview = None
+# Refresh callbacks of the open economy totals windows.
+aggregate_views = []
+edit_history = EditHistory()
+screens = {}
+current_screen = None
+document_version = 0
+bulk_list_version = 0
+bulk_names = FilteredNameList()
+render_bulk_list = None
+
+FLAG_DEFAULTS = {
+    "count_in_cargo": "0",
+    "count_in_hoarder": "0",
+    "count_in_map": "1",
+    "count_in_player": "0",
+    "crafted": "0",
+    "deloot": "0",
+}
 
 def validate_inputs(entries):
     for entry in entries:
@@ -21,45 +88,96 @@ def validate_non_empty(entry, entry_name):
         return False
     return True
 
-def generate_types_xml(type_names, nominal, lifetime, restock, min_entry, quantmin, quantmax, cost, flags, categories, usages, values, output_file, status_label, progress):
-    with open(output_file, 'w', encoding='utf-8') as f:
-        f.write('<?xml version="1.0" encoding="UTF-8"?>\n')
-        f.write('<types>\n')
-        total = len(type_names)
-        for idx, type_name in enumerate(type_names):
-            f.write(f'    <type name="{type_name}">\n')
-            f.write(f'        <nominal>{nominal.get()}</nominal>\n')
-            f.write(f'        <lifetime>{lifetime.get()}</lifetime>\n')
-            f.write(f'        <restock>{restock.get()}</restock>\n')
-            f.write(f'        <min>{min_entry.get()}</min>\n')
-            f.write(f'        <quantmin>{quantmin.get()}</quantmin>\n')
-            f.write(f'        <quantmax>{quantmax.get()}</quantmax>\n')
-            f.write(f'        <cost>{cost.get()}</cost>\n')
-            f.write(f'        <flags count_in_cargo="{flags["count_in_cargo"].get()}" count_in_hoarder="{flags["count_in_hoarder"].get()}" count_in_map="{flags["count_in_map"].get()}" count_in_player="{flags["count_in_player"].get()}" crafted="{flags["crafted"].get()}" deloot="{flags["deloot"].get()}"/>\n')
-            
-            for category in categories:
-                f.write(f'        <category name="{category}"/>\n')
-            for usage in usages:
-                f.write(f'        <usage name="{usage}"/>\n')
-            for value in values:
-                f.write(f'        <value name="{value}"/>\n')
-
-            f.write('    </type>\n')
-            progress['value'] = (idx + 1) / total * 100
-            root.update_idletasks()
-        f.write('</types>\n')
-    status_label.config(text=f"Generated types.xml successfully at {output_file}")
-
-def select_file_for_generation(nominal, lifetime, restock, min_entry, quantmin, quantmax, cost, flags, categories, usages, values, status_label, progress):
+def run_in_background(name, fn, *args, status_label=None, progress=None, on_event=None, on_done=None, on_error=None, operation=instrument.NULL_OPERATION, phase=None):
+    def on_progress(done, total):
+        if progress is not None:
+            progress['value'] = done / total * 100 if total else 100
+
+    def show_error(error):
+        if isinstance(error, ET.ParseError):
+            messagebox.showerror("Parse Error", f"Failed to parse XML file: {error}")
+        else:
+            messagebox.showerror("Error", f"{name.capitalize()} failed: {error}")
+
+    def on_cancel():
+        if status_label is not None:
+            status_label.config(text=f"{name.capitalize()} cancelled.")
+
+    def finishing(callback):
+        # The operation ends with the job, whatever the outcome, and times
+        # what the callback does on this thread first.
+        def finish(*result):
+            try:
+                if callback is not None:
+                    callback(*result)
+            finally:
+                operation.finish()
+        return finish
+
+    if phase is not None:
+        job = job_runner.submit(name, run_in_phase, operation, phase, fn, *args)
+    else:
+        job = job_runner.submit(name, fn, *args)
+    return watch_job(root, job, on_event=on_event, on_progress=on_progress, on_done=finishing(on_done), on_error=finishing(on_error or show_error), on_cancel=finishing(on_cancel))
+
+def run_in_phase(job, operation, phase, fn, *args):
+    with operation.phase(phase):
+        return fn(job, *args)
+
+def cancel_job(job):
+    if job is not None and not job.done():
+        job.cancel()
+
+def generate_types_job(job, operation, input_file, output_file, append, fields, flags, categories, usages, values, library=None):
+    # Reads the names file as a stream, every name once and, when appending,
+    # only those the target does not define yet.
+    stats = {}
+    with operation.phase("parse"):
+        type_names = read_new_type_names(input_file, output_file if append else None, stats)
+    operation.count("types", len(type_names))
+    with operation.phase("serialize"):
+        if library is not None:
+            # Names no rule matches get the values on screen unless the library has a default preset.
+            fallback = new_preset(fields, flags, categories, usages, values)
+            written, counts, skipped = generate_preset_types_xml(type_names, output_file, library, fallback, job=job, append=append)
+        else:
+            written = generate_types_xml(type_names, output_file, fields, flags, categories, usages, values, job=job, append=append)
+            counts = None
+    return output_file, written, stats, counts
+
+def generation_summary(result, append):
+    output_file, written, stats, counts = result
+    text = f"{'Appended' if append else 'Generated'} {written} types {'to' if append else 'at'} {output_file}"
+    if counts:
+        text += ": " + ", ".join(f"{count} {name or 'on-screen values'}" for name, count in counts.most_common())
+    skipped = [f"{stats[key]} {key}" for key in ("duplicate", "existing") if stats.get(key)]
+    if skipped:
+        text += f" (skipped {' and '.join(skipped)} names)"
+    return text
+
+def select_file_for_generation(nominal, lifetime, restock, min_entry, quantmin, quantmax, cost, flags, categories, usages, values, status_label, progress, use_rules=None, append=None):
+    global generation_job
     input_file = filedialog.askopenfilename(filetypes=[("Text files", "*.txt")])
     if input_file:
-        with open(input_file, 'r', encoding='utf-8') as f:
-            content = f.read().replace(",", " ").replace("\n", " ")
-            type_names = content.split()
-        output_file = filedialog.asksaveasfilename(defaultextension=".xml", filetypes=[("XML files", "*.xml")], initialfile="types.xml")
+        appending = append is not None and append.get()
+        if appending:
+            output_file = filedialog.askopenfilename(title="Add new types to", filetypes=[("XML files", "*.xml")])
+        else:
+            output_file = filedialog.asksaveasfilename(defaultextension=".xml", filetypes=[("XML files", "*.xml")], initialfile="types.xml")
         if output_file:
             if validate_inputs([nominal, lifetime, restock, min_entry, quantmin, quantmax, cost] + list(flags.values())):
-                generate_types_xml(type_names, nominal, lifetime, restock, min_entry, quantmin, quantmax, cost, flags, categories, usages, values, output_file, status_label, progress)
+                # Widget values are read here because Tk may only be touched from the main thread.
+                field_values = dict(zip(FIELDS, [nominal.get(), lifetime.get(), restock.get(), min_entry.get(), quantmin.get(), quantmax.get(), cost.get()]))
+                flag_values = {flag: flags[flag].get() for flag in flags}
+                library = None
+                if use_rules is not None and use_rules.get():
+                    library = open_preset_library()
+                    if library is None:
+                        status_label.config(text="Generation cancelled.")
+                        return
+                status_label.config(text="Reading type names...")
+                operation = instrument.start("generate", append=appending)
+                generation_job = run_in_background("generation", generate_types_job, operation, input_file, output_file, appending, field_values, flag_values, categories, usages, values, library, status_label=status_label, progress=progress, on_done=lambda result: status_label.config(text=generation_summary(result, appending)), operation=operation)
             else:
                 status_label.config(text="Invalid input detected. Please check your entries.")
         else:
@@ -71,173 +189,577 @@ def show_help():
     help_text = """Instructions:
 1. Enter the values for Nominal, Lifetime, Restock, Min, Quantmin, Quantmax, Cost, and Flags.
 2. Enter values for Category, Usage, and Value.
-3. Click the 'Select Input File' button to choose a text file containing type names. Each type name should be separated by spaces, commas, or new lines.
+3. Click the 'Select Input File' button to choose a text file containing type names. Each type name should be separated by spaces, commas, or new lines; repeated names are generated once. With 'Add New Types to Existing XML' checked you then pick a types.xml and only the names it does not define yet are added to it.
 4. Click the 'Generate XML' button to create the types.xml file. You will be prompted to choose the save location.
 5. To edit an existing types.xml file, click 'Load XML File', search for the type name, edit the values, and click 'Save Changes'.
 6. To generate an Expansion Trader JSON file, click 'Generate Expansion Trader', fill in the details and click 'Generate'. The JSON file will be saved at the specified location.
-7. To edit an existing JSON file, click 'Open JSON Editor', select the file, make your changes, and save."""
+7. To edit an existing JSON file, click 'Open JSON Editor', select the file, make your changes, and save.
+8. 'Save Settings' stores the values on screen as a named preset. 'Edit Preset Rules' maps class name patterns to presets, and with 'Apply Preset Rules' checked each generated type gets the preset of the first matching rule."""
     help_window = tk.Toplevel()
     help_window.title("Help")
     help_label = ttk.Label(help_window, text=help_text, wraplength=400, padding=20)
     help_label.pack()
 
-def save_settings(entries, flags):
-    settings = {entry[0]: entry[1].get() for entry in entries}
+def open_preset_library():
+    # presets.json next to the program; an old settings.txt becomes the
+    # "default" preset the first time. None after a reported error.
+    try:
+        if os.path.exists(PRESETS_FILE):
+            return load_presets(PRESETS_FILE)
+        library = PresetLibrary()
+        if os.path.exists(LEGACY_SETTINGS_FILE):
+            library.set_preset("default", import_settings_file(LEGACY_SETTINGS_FILE))
+        return library
+    except (OSError, ValueError, SyntaxError) as e:
+        messagebox.showerror("Presets", f"Could not read the presets: {e}")
+        return None
+
+def store_preset_library(library):
+    try:
+        save_presets(PRESETS_FILE, library)
+        return True
+    except OSError as e:
+        messagebox.showerror("Presets", f"Could not save the presets: {e}")
+        return False
+
+def selected_items(listbox):
+    return [listbox.get(index) for index in listbox.curselection()]
+
+def select_items(listbox, names):
+    # Selects exactly these names. Items match regardless of case and take
+    # the spelling given, names the listbox lacks are added, so saving the
+    # selection writes back what was shown.
+    listbox.selection_clear(0, tk.END)
+    items = {item.lower(): index for index, item in enumerate(listbox.get(0, tk.END))}
+    for name in names:
+        if not name:
+            continue
+        index = items.get(name.lower())
+        if index is None:
+            index = items[name.lower()] = listbox.size()
+            listbox.insert(tk.END, name)
+        elif listbox.get(index) != name:
+            listbox.delete(index)
+            listbox.insert(index, name)
+        listbox.selection_set(index)
+
+def save_settings(entries, flags, listboxes):
+    library = open_preset_library()
+    if library is None:
+        return
+    name = simpledialog.askstring("Save Preset", "Preset name:", initialvalue=library.default or "default")
+    if not name:
+        return
+    fields = {LEGACY_FIELD_KEYS[entry[0]]: entry[1].get() for entry in entries}
     flag_settings = {flag: flags[flag].get() for flag in flags}
-    settings.update(flag_settings)
-    with open("settings.txt", "w") as f:
-        f.write(str(settings))
-    messagebox.showinfo("Settings Saved", "Settings have been saved successfully.")
-
-def load_settings(entries, flags):
-    if os.path.exists("settings.txt"):
-        with open("settings.txt", "r") as f:
-            settings = eval(f.read())
-            for entry in entries:
-                entry[1].delete(0, tk.END)
-                entry[1].insert(0, settings.get(entry[0], ""))
-            for flag in flags:
-                flags[flag].delete(0, tk.END)
-                flags[flag].insert(0, settings.get(flag, "0"))
-        messagebox.showinfo("Settings Loaded", "Settings have been loaded successfully.")
+    try:
+        library.set_preset(name.strip(), new_preset(fields, flag_settings, *[selected_items(listbox) for listbox in listboxes]))
+    except ValueError as e:
+        messagebox.showerror("Invalid Preset", str(e))
+        return
+    if store_preset_library(library):
+        messagebox.showinfo("Settings Saved", f"Preset '{name.strip()}' has been saved.")
+
+def load_settings(entries, flags, listboxes):
+    library = open_preset_library()
+    if library is None:
+        return
+    if not library.presets:
+        messagebox.showwarning("No Settings Found", "No saved presets found.")
+        return
+    names = sorted(library.presets)
+    name = simpledialog.askstring("Load Preset", "Preset name (" + ", ".join(names) + "):", initialvalue=library.default or names[0])
+    if not name:
+        return
+    preset = library.presets.get(name.strip())
+    if preset is None:
+        messagebox.showwarning("No Settings Found", f"There is no preset named '{name.strip()}'.")
+        return
+    for entry in entries:
+        entry[1].delete(0, tk.END)
+        entry[1].insert(0, preset["fields"].get(LEGACY_FIELD_KEYS[entry[0]], ""))
+    for flag in flags:
+        flags[flag].delete(0, tk.END)
+        flags[flag].insert(0, preset["flags"].get(flag, "0"))
+    for listbox, tag in zip(listboxes, ("category", "usage", "value")):
+        select_items(listbox, preset[tag])
+    messagebox.showinfo("Settings Loaded", f"Preset '{name.strip()}' has been loaded.")
+
+def edit_preset_rules():
+    library = open_preset_library()
+    if library is None:
+        return
+    window = tk.Toplevel(root)
+    window.title("Preset Rules")
+    help_label = ttk.Label(window, text="One rule per line: pattern = preset, e.g. *_Mag_* = magazines. Patterns are case-insensitive globs, the first match wins.\nPresets: " + (", ".join(sorted(library.presets)) or "none saved yet"), wraplength=520)
+    help_label.grid(row=0, column=0, columnspan=2, padx=10, pady=5, sticky=tk.W)
+    rules_text = tk.Text(window, width=70, height=20)
+    rules_text.grid(row=1, column=0, columnspan=2, padx=10, pady=5, sticky=(tk.W, tk.E, tk.N, tk.S))
+    rules_text.insert("1.0", format_rules(library.rules))
+    default_label = ttk.Label(window, text="Preset for unmatched names:")
+    default_label.grid(row=2, column=0, padx=10, pady=5, sticky=tk.W)
+    default_var = tk.StringVar(value=library.default or "")
+    default_box = ttk.Combobox(window, textvariable=default_var, values=[""] + sorted(library.presets), state="readonly")
+    default_box.grid(row=2, column=1, padx=10, pady=5, sticky=tk.W)
+
+    def save_rules():
+        try:
+            library.set_rules(parse_rules(rules_text.get("1.0", tk.END)))
+        except ValueError as e:
+            messagebox.showerror("Invalid Rules", str(e), parent=window)
+            return
+        library.default = default_var.get() or None
+        if store_preset_library(library):
+            window.destroy()
+
+    save_button = ttk.Button(window, text="Save Rules", command=save_rules)
+    save_button.grid(row=3, column=0, columnspan=2, padx=10, pady=10)
+
+def parse_types_xml(job, selected_file, operation=instrument.NULL_OPERATION):
+    # With a cached snapshot the name list and search fill in at once, and
+    # the snapshot itself is handed over so types can be looked at while the
+    # tree is parsed behind it; otherwise names arrive batch by batch and the
+    # snapshot is written for the next time the file is opened.
+    # The watcher compares the file against what was read here, state is
+    # taken first so a change made while parsing is picked up afterwards.
+    state = file_state(selected_file)
+    cache = load_cache()
+    cached = cache.lookup(selected_file) if cache is not None else None
+    source = None
+    if cached is not None:
+        job.post("batch", cached.names)
+        job.post("preview", cached)
+    elif cache is not None:
+        source = cache.source_state(selected_file)
+    loader = TypesLoader(selected_file)
+    with operation.phase("parse"):
+        for batch in loader.batches():
+            job.check_cancelled()
+            if cached is None:
+                job.post("batch", batch)
+        type_elems = loader.root_element.findall('type')
+    operation.count("types", len(type_elems))
+    if source is not None:
+        with operation.phase("cache"):
+            try:
+                cache.store(selected_file, [pack_record(record_from_element(type_elem)) for type_elem in type_elems], source)
+            except OSError:
+                pass
+    with operation.phase("validate"):
+        validator = TypesValidator()
+        validator.validate_elements(type_elems)
+    with operation.phase("index"):
+        fingerprints = fingerprint_elements(type_elems)
+        loaded_aggregates = EconomyAggregates().build_elements(type_elems)
+        # Spans of a file changed since state was taken are not trusted.
+        spans = TypeSpans(selected_file)
+        spans.trust(state)
+        spans.scan(loader.root_element)
+    return loader, validator, loaded_aggregates, spans, (fingerprints, state)
+
+def load_cache():
+    return default_cache() if default_cache_dir() is not None else None
+
+def load_types_progressively(selected_file, on_batch, on_done, status_label, operation=instrument.NULL_OPERATION):
+    loaded = [0]
+
+    def on_event(event, batch):
+        if event == "preview":
+            set_cached_preview(batch)
+            return
+        on_batch(batch)
+        loaded[0] += len(batch)
+        status_label.config(text=f"Loading {os.path.basename(selected_file)}... {loaded[0]} types")
+
+    def on_error(error):
+        close_cached_preview()
+        if isinstance(error, ET.ParseError):
+            messagebox.showerror("Parse Error", f"Failed to parse XML file: {error}")
+        else:
+            messagebox.showerror("Error", f"Loading failed: {error}")
+
+    return run_in_background("loading", parse_types_xml, selected_file, operation, status_label=status_label, on_event=on_event, on_done=on_done, on_error=on_error, operation=operation)
+
+def set_cached_preview(cached):
+    global cached_preview
+    close_cached_preview()
+    # Reversed so the first of two names differing in case wins, as in the registry.
+    cached_preview = (cached, {name.lower(): index for index, name in reversed(list(enumerate(cached.names)))})
+
+def close_cached_preview():
+    global cached_preview
+    if cached_preview is not None:
+        cached_preview[0].close()
+        cached_preview = None
+
+def preview_record(type_name):
+    cached, indexes = cached_preview
+    index = indexes.get(type_name.lower())
+    return cached.record(index) if index is not None else None
+
+def update_save_indicator(state, pending):
+    if state == STATE_SAVING:
+        save_indicator.config(text=f"Saving {pending} changed types to {os.path.basename(xml_file)}...")
+    elif state == STATE_PENDING:
+        save_indicator.config(text=f"Unsaved changes: {pending} types pending")
+    elif commit_queue is not None and commit_queue.xml_file:
+        save_indicator.config(text=f"All changes saved to {os.path.basename(commit_queue.xml_file)}")
+
+def show_save_error(error):
+    messagebox.showerror("Save Error", f"Failed to save {os.path.basename(xml_file)}, changes are kept and will be retried: {error}")
+
+def close_application():
+    save = True
+    if commit_queue.state != STATE_SAVED and types_watcher.changed_on_disk():
+        answer = messagebox.askyesnocancel("File Changed", f"{os.path.basename(xml_file)} was changed by another program since it was last read. Save your unsaved changes over it?\n\nYes saves them, No quits without saving, Cancel keeps the editor open.")
+        if answer is None:
+            types_watcher.check_now()
+            return
+        save = answer
+    types_watcher.detach()
+    commit_queue.close(save=save)
+    root.destroy()
+
+def set_loaded_types(loader, loaded_validator, loaded_aggregates, spans, watch_baseline):
+    global tree, root_element, xml_file, registry, document_version, validator, aggregates
+    tree = loader.tree
+    root_element = loader.root_element
+    registry = loader.registry
+    xml_file = loader.xml_file
+    validator = loaded_validator
+    aggregates = loaded_aggregates
+    close_cached_preview()
+    edit_history.clear()
+    document_version += 1
+    commit_queue.attach(tree, xml_file, spans)
+    types_watcher.attach(registry, xml_file, *watch_baseline)
+    update_validation_indicator()
+    refresh_aggregate_views()
+
+def update_validation_indicator():
+    report = validator.report
+    if report:
+        validation_indicator.config(text=f"{os.path.basename(xml_file)}: {report.count(VALIDATION_ERROR)} errors, {report.count(VALIDATION_WARNING)} warnings in {len(report.issues)} types")
     else:
-        messagebox.showwarning("No Settings Found", "No saved settings found.")
+        validation_indicator.config(text=f"{os.path.basename(xml_file)}: no problems found")
+
+def type_elements(type_names):
+    return [type_elem for type_elem in map(registry.get, type_names) if type_elem is not None]
+
+def undo_edit(status_label=None):
+    run_history_step(edit_history.undo, "Undid", "Nothing to undo", status_label)
+
+def redo_edit(status_label=None):
+    run_history_step(edit_history.redo, "Redid", "Nothing to redo", status_label)
+
+def run_history_step(step_fn, done_text, empty_text, status_label):
+    # Goes through the commit queue like any edit, so it waits for a running
+    # save and the restored types are saved and revalidated.
+    def edit():
+        step = step_fn()
+        text = f"{done_text} {step.label}" if step is not None else empty_text
+        if status_label is not None:
+            status_label.config(text=text)
+        else:
+            save_indicator.config(text=text)
+        return step.names() if step is not None else []
+
+    if document_version:
+        commit_queue.edit(edit)
+
+def revalidate_types(type_names):
+    # Called after every applied edit with just the types it touched.
+    if validator is not None:
+        validator.revalidate(registry, type_names)
+        update_validation_indicator()
+    if aggregates is not None:
+        aggregates.update(registry, type_names)
+        refresh_aggregate_views()
+
+def refresh_aggregate_views():
+    for refresh in list(aggregate_views):
+        refresh()
+
+def show_economy_totals():
+    if aggregates is None:
+        messagebox.showinfo("Economy Totals", "Load an XML file first.")
+        return
+    totals_window = tk.Toplevel()
+    totals_window.title("Economy Totals")
+    controls = ttk.Frame(totals_window, padding=(10, 5))
+    controls.grid(row=0, column=0, columnspan=2, sticky=tk.W)
+    ttk.Label(controls, text="Group by:").grid(row=0, column=0, sticky=tk.W)
+    grouping_var = tk.StringVar(value=next(iter(AGGREGATE_GROUPINGS)))
+    grouping_box = ttk.Combobox(controls, textvariable=grouping_var, values=list(AGGREGATE_GROUPINGS), state="readonly", width=20)
+    grouping_box.grid(row=0, column=1, padx=10)
+    ttk.Label(controls, text="Sort by:").grid(row=0, column=2, sticky=tk.W)
+    sort_var = tk.StringVar(value="nominal")
+    sort_box = ttk.Combobox(controls, textvariable=sort_var, values=["types"] + list(AGGREGATE_METRICS), state="readonly", width=10)
+    sort_box.grid(row=0, column=3, padx=10)
+    text = tk.Text(totals_window, width=90, height=30, wrap="none", font=('Courier', 10))
+    scrollbar = Scrollbar(totals_window, orient="vertical", command=text.yview)
+    text.config(yscrollcommand=scrollbar.set)
+    text.grid(row=1, column=0, sticky=(tk.W, tk.E, tk.N, tk.S))
+    scrollbar.grid(row=1, column=1, sticky='ns')
+
+    def refresh():
+        # Reads the running totals, nothing is recounted here.
+        columns = ["types"] + list(AGGREGATE_METRICS)
+        lines = [f"{'group':<40}" + "".join(f"{column:>12}" for column in columns), ""]
+        for row in aggregates.table(grouping_var.get(), sort_var.get()):
+            lines.append(f"{' / '.join(row[0]):<40}" + "".join(f"{value:>12}" for value in row[1:]))
+        lines += ["", f"{'all types':<40}" + "".join(f"{value:>12}" for value in aggregates.total)]
+        position = text.yview()[0]
+        text.config(state="normal")
+        text.delete("1.0", tk.END)
+        text.insert(tk.END, "\n".join(lines))
+        text.config(state="disabled")
+        text.yview_moveto(position)
+
+    def close():
+        aggregate_views.remove(refresh)
+        totals_window.destroy()
+
+    grouping_box.bind("<<ComboboxSelected>>", lambda event: refresh())
+    sort_box.bind("<<ComboboxSelected>>", lambda event: refresh())
+    totals_window.protocol("WM_DELETE_WINDOW", close)
+    aggregate_views.append(refresh)
+    refresh()
+
+def apply_external_change(change):
+    # Another program changed the open file and everything without unsaved
+    # edits here is already merged into the tree; keep the rest in sync.
+    edit_history.forget(change.replaced)
+    sync_type_names(change.added + change.removed)
+    revalidate_types(change.names())
+    save_indicator.config(text=f"{os.path.basename(xml_file)} changed on disk: {change.summary()}")
+    if change.conflicts:
+        resolve_conflicts(change)
+
+def resolve_conflicts(change):
+    names = sorted(change.conflicts)
+    shown = "\n".join(names[:CONFLICT_LIST_LIMIT]) + (f"\n... and {len(names) - CONFLICT_LIST_LIMIT} more" if len(names) > CONFLICT_LIST_LIMIT else "")
+    keep = messagebox.askyesno("External Changes", f"{len(names)} types with unsaved edits were also changed in {os.path.basename(xml_file)} by another program:\n\n{shown}\n\nKeep your versions? No loads the versions from the file and drops your edits to them.")
+    if not keep:
+        edit_history.forget(types_watcher.take_theirs(change, names))
+        sync_type_names(names)
+        revalidate_types(names)
+        save_indicator.config(text=f"Loaded {len(names)} types from {os.path.basename(xml_file)}")
+
+def sync_type_names(type_names):
+    # Names that appeared or disappeared, for the search index and the bulk
+    # editor list.
+    if not type_names:
+        return
+    for name in type_names:
+        if name in registry:
+            search_index.add(name)
+        else:
+            search_index.remove(name)
+    bulk_names.set_names(registry.names())
+    if render_bulk_list is not None:
+        render_bulk_list()
+
+def show_watch_error(error):
+    save_indicator.config(text=f"Could not read the changed {os.path.basename(xml_file)}, saving is paused until it is readable: {error}")
+
+def set_watching(enabled):
+    types_watcher.enabled = enabled
+    if enabled:
+        types_watcher.check_now()
+
+def show_operation_timing(operation):
+    perf_indicator.config(text=operation.summary())
+
+def set_recording_timings(enabled):
+    instrument.set_enabled(enabled)
+    perf_indicator.config(text="Recording operation timings" if enabled else "")
+
+def export_timings():
+    output_file = filedialog.asksaveasfilename(defaultextension=".json", filetypes=[("Timings JSON", "*.json"), ("Chrome trace", "*.trace.json")], initialfile="timings.json")
+    if not output_file:
+        return
+    try:
+        if output_file.endswith(".trace.json"):
+            instrument.save_chrome_trace(output_file)
+        else:
+            instrument.save_json(output_file)
+    except OSError as e:
+        messagebox.showerror("Error", f"Failed to export timings: {e}")
+        return
+    perf_indicator.config(text=f"Timings exported to {output_file}")
+
+def profile_next_operation(record_var):
+    profile_file = filedialog.asksaveasfilename(defaultextension=".prof", filetypes=[("Profile", "*.prof")], initialfile="operation.prof")
+    if profile_file:
+        instrument.profile_next(profile_file)
+        record_var.set(True)
+        perf_indicator.config(text=f"The next operation will be profiled to {os.path.basename(profile_file)}")
+
+def show_validation_report():
+    if validator is None:
+        messagebox.showinfo("Validation", "Load an XML file first.")
+        return
+    report_window = tk.Toplevel()
+    report_window.title(f"Problems in {os.path.basename(xml_file)}")
+    text = tk.Text(report_window, width=100, height=30, wrap="none")
+    scrollbar = Scrollbar(report_window, orient="vertical", command=text.yview)
+    text.config(yscrollcommand=scrollbar.set)
+    text.grid(row=0, column=0, sticky=(tk.W, tk.E, tk.N, tk.S))
+    scrollbar.grid(row=0, column=1, sticky='ns')
+    text.insert(tk.END, validator.report.summary() + "\n\n" + "\n".join(validator.report.lines(VALIDATION_REPORT_LIMIT)))
+    text.config(state="disabled")
+
+def load_types_document(selected_file, on_batch, status_label):
+    # The editor and bulk editor share one loaded document and search index,
+    # so a file opened on either screen is ready on the other one too.
+    global search_index
+    search_index = SearchIndex()
+    operation = instrument.start("load", file=os.path.basename(selected_file))
+
+    def on_index_batch(batch):
+        with operation.phase("index"):
+            search_index.extend(batch)
+        with operation.phase("widget fill"):
+            on_batch(batch)
+
+    def on_done(result):
+        loader, loaded_validator, loaded_aggregates, spans, watch_baseline = result
+        set_loaded_types(loader, loaded_validator, loaded_aggregates, spans, watch_baseline)
+        with operation.phase("index"):
+            search_index.prepare()
+        status_label.config(text=f"Loaded XML file: {os.path.basename(selected_file)}")
+
+    load_types_progressively(selected_file, on_index_batch, on_done, status_label, operation)
 
 def load_xml_file(entries, flags, categories, usages, values, search_entry, status_label):
-    global tree, root_element, xml_file
-    xml_file = filedialog.askopenfilename(filetypes=[("XML files", "*.xml")])
-    if xml_file:
-        try:
-            tree = ET.parse(xml_file)
-            root_element = tree.getroot()
-            type_names = [type_elem.get('name') for type_elem in root_element.findall('type')]
-            search_entry['values'] = type_names
-            status_label.config(text=f"Loaded XML file: {os.path.basename(xml_file)}")
-        except ET.ParseError as e:
-            messagebox.showerror("Parse Error", f"Failed to parse XML file: {e}")
+    selected_file = filedialog.askopenfilename(filetypes=[("XML files", "*.xml")])
+    if selected_file:
+        search_entry['values'] = []
+        # Nothing is selected until a type of the new file is shown.
+        for listbox in (categories, usages, values):
+            listbox.selection_clear(0, tk.END)
+        load_types_document(selected_file, lambda batch: search_entry.configure(values=search_index.search(search_entry.get())), status_label)
     else:
         status_label.config(text="XML file loading cancelled.")
 
-def update_search_suggestions(entries, flags, categories, usages, values, search_entry, status_label):
-    search_text = search_entry.get().lower()
-    suggestions = [type_elem.get('name') for type_elem in root_element.findall('type') if search_text in type_elem.get('name').lower()]
-    search_entry['values'] = suggestions
+def schedule_search_suggestions(search_entry):
+    global search_after_id
+    if search_after_id is not None:
+        root.after_cancel(search_after_id)
+    search_after_id = root.after(SEARCH_DEBOUNCE_MS, lambda: update_search_suggestions(search_entry))
+
+def update_search_suggestions(search_entry):
+    global search_after_id
+    search_after_id = None
+    operation = instrument.start("search")
+    with operation.phase("lookup"):
+        suggestions = search_index.search(search_entry.get())
+    with operation.phase("widget fill"):
+        search_entry['values'] = suggestions
+    operation.count("suggestions", len(suggestions))
+    operation.finish()
 
 def search_type(entries, flags, categories, usages, values, search_entry):
     type_name = search_entry.get()
-    type_elem = root_element.find(f"./type[@name='{type_name}']")
-    if type_elem is not None:
-        for entry in entries:
-            xml_value = type_elem.find(entry[0].lower()).text if type_elem.find(entry[0].lower()) is not None else ""
-            entry[1].delete(0, tk.END)
-            entry[1].insert(0, xml_value)
-
-        for flag in flags:
-            flag_value = type_elem.find('flags').get(flag) if type_elem.find('flags') is not None else ""
-            flags[flag].delete(0, tk.END)
-            flags[flag].insert(0, flag_value)
-
-        categories.clear()
-        for category_elem in type_elem.findall('category'):
-            categories.append(category_elem.get('name'))
+    operation = instrument.start("lookup")
+    with operation.phase("lookup"):
+        # While a cached file is still parsing its snapshot answers, the
+        # registry still holds the previous file.
+        if cached_preview is not None:
+            record = preview_record(type_name)
+        else:
+            type_elem = registry.get(type_name, ignore_case=True)
+            record = record_from_element(type_elem) if type_elem is not None else None
+    if record is not None:
+        with operation.phase("widget fill"):
+            for entry in entries:
+                entry[1].delete(0, tk.END)
+                entry[1].insert(0, record[entry[0].lower()])
 
-        usages.clear()
-        for usage_elem in type_elem.findall('usage'):
-            usages.append(usage_elem.get('name'))
+            for flag in flags:
+                flags[flag].delete(0, tk.END)
+                flags[flag].insert(0, record["flags"].get(flag, ""))
 
-        values.clear()
-        for value_elem in type_elem.findall('value'):
-            values.append(value_elem.get('name'))
+            select_items(categories, record["category"])
+            select_items(usages, record["usage"])
+            select_items(values, record["value"])
+        operation.finish()
 
     else:
+        operation.finish()
         messagebox.showerror("Type Not Found", f"Type '{type_name}' not found in the XML file.")
 
 def save_changes_to_xml(entries, flags, categories, usages, values, search_entry, status_label):
+    if cached_preview is not None:
+        messagebox.showinfo("Still Loading", "The file is still being parsed, changes can be saved once it has loaded.")
+        return
     type_name = search_entry.get()
-    type_elem = root_element.find(f"./type[@name='{type_name}']")
+    type_elem = registry.get(type_name, ignore_case=True)
     if type_elem is not None:
-        for entry in entries:
-            elem = type_elem.find(entry[0].lower())
-            if elem is not None:
-                elem.text = entry[1].get()
-        
-        flags_elem = type_elem.find('flags')
-        for
-flag in flags:
-            flags_elem.set(flag, flags[flag].get())
-
-        # Clear existing categories, usages, and values
-        for category_elem in type_elem.findall('category'):
-            type_elem.remove(category_elem)
-        for usage_elem in type_elem.findall('usage'):
-            type_elem.remove(usage_elem)
-        for value_elem in type_elem.findall('value'):
-            type_elem.remove(value_elem)
-
-        # Add new categories, usages, and values
-        for category in categories:
-            category_elem = ET.SubElement(type_elem, 'category')
-            category_elem.set('name', category)
-
-        for usage in usages:
-            usage_elem = ET.SubElement(type_elem, 'usage')
-            usage_elem.set('name', usage)
-
-        for value in values:
-            if value:
-                value_elem = ET.SubElement(type_elem, 'value')
-                value_elem.set('name', value)
-
-        tree.write(xml_file, encoding='utf-8', xml_declaration=True)
-        status_label.config(text=f"Changes saved to {os.path.basename(xml_file)}")
+        fields = {entry[0].lower(): entry[1].get() for entry in entries}
+        flag_values = {flag: flags[flag].get() for flag in flags}
+        operation = instrument.start("edit", type=type_elem.get('name'))
+
+        def edit():
+            # Looked up again, the element may have been replaced by a change
+            # made outside the editor since the click.
+            current = registry.get(type_elem.get('name'))
+            if current is None:
+                operation.finish()
+                return []
+            with operation.phase("mutate"):
+                touched = edit_history.apply(f"edit of {current.get('name')}", [current], lambda: update_type_element(current, fields, flag_values, categories, usages, values))
+            operation.finish()
+            return touched
+
+        commit_queue.edit(edit)
+        status_label.config(text=f"Changes to {type_elem.get('name')} queued for saving")
     else:
         messagebox.showerror("Type Not Found", f"Type '{type_name}' not found in the XML file.")
 
-def generate_trader_json(display_name, icon, color, init_stock_percent, types_file):
+def write_trader_json_job(job, types_file, output_file, display_name, icon, color, init_stock_percent):
+    return write_trader_json(types_file, output_file, display_name, icon, color, init_stock_percent, job=job)
+
+def write_split_trader_json_job(job, types_file, output_dir, split, display_name, icon, color, init_stock_percent):
+    return write_split_trader_json(types_file, output_dir, split, display_name, icon, color, init_stock_percent, job=job)
+
+def generate_trader_json(display_name, icon, color, init_stock_percent, types_file, split):
     try:
-        tree = ET.parse(types_file)
-        root = tree.getroot()
-        items = []
-        for type_elem in root.findall('type'):
-            item = {
-                "ClassName": type_elem.get('name'),
-                "MaxPriceThreshold": 1000,
-                "MinPriceThreshold": 500,
-                "SellPricePercent": -1,
-                "MaxStockThreshold": 50,
-                "MinStockThreshold": 10,
-                "QuantityPercent": -1,
-                "SpawnAttachments": [],
-                "Variants": []
-            }
-            items.append(item)
-
-        data = {
-            "m_Version": 8,
-            "DisplayName": display_name.get(),
-            "Icon": icon.get(),
-            "Color": color.get(),
-            "InitStockPercent": int(init_stock_percent.get()),
-            "Items": items
-        }
-        
-        output_file = filedialog.asksaveasfilename(defaultextension=".json", filetypes=[("JSON files", "*.json")], initialfile="trader.json")
-        if output_file:
-            with open(output_file, 'w', encoding='utf-8') as f:
-                json.dump(data, f, indent=4)
-            messagebox.showinfo("Success", f"Generated trader JSON successfully at {output_file}")
-        else:
-            messagebox.showwarning("Cancelled", "JSON file saving cancelled.")
-    except ET.ParseError as e:
-        messagebox.showerror("Parse Error", f"Failed to parse types.xml file: {e}")
+        init_stock_percent_value = int(init_stock_percent.get())
     except ValueError as e:
         messagebox.showerror("Value Error", f"Invalid value: {e}")
+        return
+
+    def show_trader_error(error):
+        if isinstance(error, ET.ParseError):
+            messagebox.showerror("Parse Error", f"Failed to parse types.xml file: {error}")
+        else:
+            messagebox.showerror("Error", f"Trader generation failed: {error}")
+
+    if split != TRADER_SPLIT_NONE:
+        # Every file is named after its group unless the name says where.
+        split_display_name = display_name.get().strip()
+        if "{group}" not in split_display_name:
+            split_display_name = "{group}" if split_display_name in ("", TRADER_DISPLAY_NAME) else split_display_name + " {group}"
+        output_dir = filedialog.askdirectory(title="Folder for the trader files")
+        if output_dir:
+            run_in_background("trader generation", write_split_trader_json_job, types_file, output_dir, split, split_display_name, icon.get(), color.get(), init_stock_percent_value, on_done=lambda files: messagebox.showinfo("Success", f"Generated {len(files)} trader JSON files in {output_dir}"), on_error=show_trader_error, operation=instrument.start("trader export", split=split), phase="serialize")
+        else:
+            messagebox.showwarning("Cancelled", "JSON file saving cancelled.")
+        return
+
+    output_file = filedialog.asksaveasfilename(defaultextension=".json", filetypes=[("JSON files", "*.json")], initialfile="trader.json")
+    if output_file:
+        run_in_background("trader generation", write_trader_json_job, types_file, output_file, display_name.get(), icon.get(), color.get(), init_stock_percent_value, on_done=lambda path: messagebox.showinfo("Success", f"Generated trader JSON successfully at {path}"), on_error=show_trader_error, operation=instrument.start("trader export"), phase="serialize")
+    else:
+        messagebox.showwarning("Cancelled", "JSON file saving cancelled.")
 
 def show_trader_generator():
-    for widget in root.winfo_children():
-        widget.destroy()
+    show_screen("trader", trader_gui)
 
-    main_frame = ttk.Frame(root, padding=(20, 10))
+def trader_gui(parent):
+    main_frame = ttk.Frame(parent, padding=(20, 10))
     main_frame.grid(row=0, column=0, sticky=(tk.W, tk.E, tk.N, tk.S))
 
     entry_frame = ttk.LabelFrame(main_frame, text="Trader Category", padding=(10, 5))
@@ -247,7 +769,7 @@ def show_trader_generator():
     display_name_label.grid(row=0, column=0, padx=10, pady=5, sticky=tk.W)
     display_name_entry = ttk.Entry(entry_frame, width=40)
     display_name_entry.grid(row=0, column=1, padx=10, pady=5, sticky=tk.W)
-    display_name_entry.insert(0, "My Category Title !")
+    display_name_entry.insert(0, TRADER_DISPLAY_NAME)
 
     icon_label = ttk.Label(entry_frame, text="Icon:")
     icon_label.grid(row=1, column=0, padx=10, pady=5, sticky=tk.W)
@@ -267,6 +789,12 @@ def show_trader_generator():
     init_stock_percent_entry.grid(row=3, column=1, padx=10, pady=5, sticky=tk.W)
     init_stock_percent_entry.insert(0, "75")
 
+    split_label = ttk.Label(entry_frame, text="Split Files By:")
+    split_label.grid(row=4, column=0, padx=10, pady=5, sticky=tk.W)
+    split_combobox = ttk.Combobox(entry_frame, values=(TRADER_SPLIT_NONE,) + SPLIT_MODES, state="readonly", width=37)
+    split_combobox.set(TRADER_SPLIT_NONE)
+    split_combobox.grid(row=4, column=1, padx=10, pady=5, sticky=tk.W)
+
     file_frame = ttk.Frame(main_frame, padding=(10, 5))
     file_frame.grid(row=1, column=0, padx=10, pady=10, sticky=(tk.W, tk.E))
 
@@ -280,7 +808,7 @@ def show_trader_generator():
     button_frame = ttk.Frame(main_frame, padding=(10, 5))
     button_frame.grid(row=2, column=0, padx=10, pady=10, sticky=(tk.W, tk.E))
 
-    generate_button = ttk.Button(button_frame, text="Generate JSON", command=lambda: generate_trader_json(display_name_entry, icon_entry, color_entry, init_stock_percent_entry, types_file_entry.get()))
+    generate_button = ttk.Button(button_frame, text="Generate JSON", command=lambda: generate_trader_json(display_name_entry, icon_entry, color_entry, init_stock_percent_entry, types_file_entry.get(), split_combobox.get()))
     generate_button.grid(row=0, column=0, padx=10, pady=10, sticky=(tk.W, tk.E))
 
     help_button = ttk.Button(button_frame, text="Help", command=show_help)
@@ -289,25 +817,165 @@ def show_trader_generator():
     back_button = ttk.Button(button_frame, text="Back to Menu", command=show_main_menu)
     back_button.grid(row=2, column=0, padx=10, pady=10, sticky=(tk.W, tk.E))
 
+def merge_types_job(job, xml_files, output_file, policy, report_file):
+    return merge_types_files(xml_files, output_file, policy, report_file, job=job)
+
+def add_merge_files(file_listbox):
+    for xml_file in filedialog.askopenfilenames(filetypes=[("XML files", "*.xml")]):
+        file_listbox.insert(tk.END, xml_file)
+
+def remove_merge_files(file_listbox):
+    for i in reversed(file_listbox.curselection()):
+        file_listbox.delete(i)
+
+def move_merge_file(file_listbox, step):
+    selection = file_listbox.curselection()
+    if len(selection) != 1:
+        return
+    i = selection[0]
+    target = i + step
+    if 0 <= target < file_listbox.size():
+        xml_file = file_listbox.get(i)
+        file_listbox.delete(i)
+        file_listbox.insert(target, xml_file)
+        file_listbox.selection_set(target)
+
+def run_merge(file_listbox, strategy_combobox, field_rules_entry, status_label, progress):
+    xml_files = list(file_listbox.get(0, tk.END))
+    if len(xml_files) < 2:
+        messagebox.showerror("Merge Error", "Add at least two types.xml files to merge.")
+        return
+    try:
+        policy = MergePolicy(strategy_combobox.get(), parse_field_rules(field_rules_entry.get()))
+    except ValueError as e:
+        messagebox.showerror("Merge Error", str(e))
+        return
+    output_file = filedialog.asksaveasfilename(defaultextension=".xml", filetypes=[("XML files", "*.xml")], initialfile="types.xml")
+    if not output_file:
+        status_label.config(text="Output file selection cancelled.")
+        return
+    report_file = os.path.splitext(output_file)[0] + ".conflicts.json"
+
+    def on_done(result):
+        count, conflicts = result
+        status_label.config(text=f"Merged {len(xml_files)} files into {count} types, {len(conflicts)} conflicts reported in {os.path.basename(report_file)}")
+
+    status_label.config(text=f"Merging {len(xml_files)} files...")
+    run_in_background("merge", merge_types_job, xml_files, output_file, policy, report_file, status_label=status_label, progress=progress, on_done=on_done)
+
+def show_merger():
+    show_screen("merger", merge_gui)
+
+def merge_gui(parent):
+    main_frame = ttk.Frame(parent, padding=(20, 10))
+    main_frame.grid(row=0, column=0, sticky=(tk.W, tk.E, tk.N, tk.S))
+
+    files_label = ttk.Label(main_frame, text="Files to merge (lowest precedence first):")
+    files_label.grid(row=0, column=0, padx=10, pady=5, sticky=tk.W)
+    file_listbox = Listbox(main_frame, width=70, height=12)
+    file_listbox.grid(row=1, column=0, padx=10, pady=5, sticky=tk.W)
+
+    file_button_frame = ttk.Frame(main_frame, padding=(10, 5))
+    file_button_frame.grid(row=1, column=1, padx=10, pady=5, sticky=tk.N)
+
+    add_button = ttk.Button(file_button_frame, text="Add Files", command=lambda: add_merge_files(file_listbox))
+    add_button.grid(row=0, column=0, padx=10, pady=5, sticky=(tk.W, tk.E))
+    remove_button = ttk.Button(file_button_frame, text="Remove", command=lambda: remove_merge_files(file_listbox))
+    remove_button.grid(row=1, column=0, padx=10, pady=5, sticky=(tk.W, tk.E))
+    up_button = ttk.Button(file_button_frame, text="Move Up", command=lambda: move_merge_file(file_listbox, -1))
+    up_button.grid(row=2, column=0, padx=10, pady=5, sticky=(tk.W, tk.E))
+    down_button = ttk.Button(file_button_frame, text="Move Down", command=lambda: move_merge_file(file_listbox, 1))
+    down_button.grid(row=3, column=0, padx=10, pady=5, sticky=(tk.W, tk.E))
+
+    rule_frame = ttk.LabelFrame(main_frame, text="Conflict Resolution", padding=(10, 5))
+    rule_frame.grid(row=2, column=0, padx=10, pady=10, sticky=(tk.W, tk.E))
+
+    strategy_label = ttk.Label(rule_frame, text="Winner:")
+    strategy_label.grid(row=0, column=0, padx=10, pady=5, sticky=tk.W)
+    strategy_combobox = ttk.Combobox(rule_frame, values=STRATEGIES, state="readonly", width=37)
+    strategy_combobox.grid(row=0, column=1, padx=10, pady=5, sticky=tk.W)
+    strategy_combobox.set(STRATEGIES[0])
+
+    field_rules_label = ttk.Label(rule_frame, text="Field Rules:")
+    field_rules_label.grid(row=1, column=0, padx=10, pady=5, sticky=tk.W)
+    field_rules_entry = ttk.Entry(rule_frame, width=40)
+    field_rules_entry.grid(row=1, column=1, padx=10, pady=5, sticky=tk.W)
+    field_rules_hint = ttk.Label(rule_frame, text="e.g. nominal=max, min=max, usage=union")
+    field_rules_hint.grid(row=2, column=1, padx=10, pady=(0, 5), sticky=tk.W)
+
+    button_frame = ttk.Frame(main_frame, padding=(10, 5))
+    button_frame.grid(row=3, column=0, padx=10, pady=10, sticky=(tk.W, tk.E))
+
+    merge_button = ttk.Button(button_frame, text="Merge", command=lambda: run_merge(file_listbox, strategy_combobox, field_rules_entry, status_label, progress))
+    merge_button.grid(row=0, column=0, padx=10, pady=10, sticky=(tk.W, tk.E))
+
+    back_button = ttk.Button(button_frame, text="Back to Menu", command=show_main_menu)
+    back_button.grid(row=0, column=1, padx=10, pady=10, sticky=(tk.W, tk.E))
+
+    progress = ttk.Progressbar(parent, mode='determinate')
+    progress.grid(row=1, column=0, padx=20, pady=10, sticky=(tk.W, tk.E))
+
+    status_label = ttk.Label(parent, text="", font=('Arial', 12))
+    status_label.grid(row=2, column=0, padx=20, pady=10, sticky=(tk.W, tk.E))
+
 def select_types_file(entry):
     types_file = filedialog.askopenfilename(filetypes=[("XML files", "*.xml")])
     if types_file:
         entry.delete(0, tk.END)
         entry.insert(0, types_file)
 
-def load_json_file(json_file):
-    with open(json_file, 'r', encoding='utf-8') as f:
-        return json.load(f)
+def run_batch_job(job, batch_jobs):
+    positions = {batch_job.name: index for index, batch_job in enumerate(batch_jobs)}
+    run_batch(batch_jobs, on_status=lambda batch_job: job.post("status", (positions[batch_job.name], batch_job.state, batch_job.summary())), cancel=job)
+    return batch_jobs
 
-def save_json_file(json_file, data):
-    with open(json_file, 'w', encoding='utf-8') as f:
-        json.dump(data, f, indent=4)
+def show_batch_runner():
+    manifest_file = filedialog.askopenfilename(title="Batch manifest", filetypes=[("JSON files", "*.json")])
+    if not manifest_file:
+        return
+    try:
+        batch_jobs = load_manifest(manifest_file)
+    except (OSError, ValueError) as e:
+        messagebox.showerror("Batch", f"Could not read {os.path.basename(manifest_file)}: {e}")
+        return
+    batch_window = tk.Toplevel(root)
+    batch_window.title(f"Batch: {os.path.basename(manifest_file)}")
+    job_list = tk.Listbox(batch_window, width=110, height=min(max(len(batch_jobs), 5), 30))
+    scrollbar = Scrollbar(batch_window, orient="vertical", command=job_list.yview)
+    job_list.config(yscrollcommand=scrollbar.set)
+    job_list.grid(row=0, column=0, columnspan=2, padx=(10, 0), pady=10, sticky=(tk.W, tk.E, tk.N, tk.S))
+    scrollbar.grid(row=0, column=2, pady=10, sticky='ns')
+    for batch_job in batch_jobs:
+        job_list.insert(tk.END, batch_job.summary())
+    status_label = ttk.Label(batch_window, text=f"Running {len(batch_jobs)} jobs...")
+    status_label.grid(row=1, column=0, padx=10, sticky=tk.W)
+
+    def on_event(event, value):
+        if event != "status" or not job_list.winfo_exists():
+            return
+        index, state, text = value
+        job_list.delete(index)
+        job_list.insert(index, text)
+        job_list.itemconfig(index, foreground=BATCH_STATE_COLORS.get(state, "black"))
+
+    def on_done(finished):
+        if status_label.winfo_exists():
+            status_label.config(text=batch_summary(finished))
+
+    batch = run_in_background("batch", run_batch_job, batch_jobs, status_label=status_label, on_event=on_event, on_done=on_done)
+    cancel_button = ttk.Button(batch_window, text="Cancel Remaining", command=lambda: cancel_job(batch))
+    cancel_button.grid(row=1, column=1, padx=10, pady=10, sticky=tk.E)
+    batch_window.protocol("WM_DELETE_WINDOW", lambda: (cancel_job(batch), batch_window.destroy()))
 
 def show_json_editor():
     json_file = filedialog.askopenfilename(filetypes=[("JSON files", "*.json")])
     if json_file:
-        data = load_json_file(json_file)
-        class_names = [item["ClassName"] for item in data["Items"]]
+        try:
+            document = TraderDocument(json_file)
+        except (OSError, ValueError, KeyError) as e:
+            messagebox.showerror("Error", f"Failed to open trader JSON: {e}")
+            return
+        data = document.data
 
         editor_window = tk.Toplevel()
         editor_window.title("JSON Editor")
@@ -344,89 +1012,70 @@ def show_json_editor():
         init_stock_percent_entry.grid(row=3, column=1, padx=10, pady=5, sticky=tk.W)
         init_stock_percent_entry.insert(0, str(data["InitStockPercent"]))
 
-        item_frame = ttk.LabelFrame(main_frame, text="Item", padding=(10, 5))
+        item_frame = ttk.LabelFrame(main_frame, text="Items", padding=(10, 5))
         item_frame.grid(row=1, column=0, padx=10, pady=10, sticky=(tk.W, tk.E))
 
-        class_name_label = ttk.Label(item_frame, text="ClassName:")
-        class_name_label.grid(row=0, column=0, padx=10, pady=5, sticky=tk.W)
-        class_name_combobox = ttk.Combobox(item_frame, values=class_names, width=37)
-        class_name_combobox.grid(row=0, column=1, padx=10, pady=5, sticky=tk.W)
-        class_name_combobox.set(class_names[0])
-
-        max_price_label = ttk.Label(item_frame, text="MaxPriceThreshold:")
-        max_price_label.grid(row=1, column=0, padx=10, pady=5, sticky=tk.W)
-        max_price_entry = ttk.Entry(item_frame, width=10)
-        max_price_entry.grid(row=1, column=1, padx=10, pady=5, sticky=tk.W)
-        max_price_entry.insert(0, str(data["Items"][0]["MaxPriceThreshold"]))
-
-        min_price_label = ttk.Label(item_frame, text="MinPriceThreshold:")
-        min_price_label.grid(row=1, column=2, padx=10, pady=5, sticky=tk.W)
-        min_price_entry = ttk.Entry(item_frame, width=10)
-        min_price_entry.grid(row=1, column=3, padx=10, pady=5, sticky=tk.W)
-        min_price_entry.insert(0, str(data["Items"][0]["MinPriceThreshold"]))
-
-        sell_price_label = ttk.Label(item_frame, text="SellPricePercent:")
-        sell_price_label.grid(row=2, column=0, padx=10, pady=5, sticky=tk.W)
-        sell_price_entry = ttk.Entry(item_frame, width=10)
-        sell_price_entry.grid(row=2, column=1, padx=10, pady=5, sticky=tk.W)
-        sell_price_entry.insert(0, str(data["Items"][0]["SellPricePercent"]))
-
-        max_stock_label = ttk.Label(item_frame, text="MaxStockThreshold:")
-        max_stock_label.grid(row=2, column=2, padx=10, pady=5, sticky=tk.W)
-        max_stock_entry = ttk.Entry(item_frame, width=10)
-        max_stock_entry.grid(row=2, column=3, padx=10, pady=5, sticky=tk.W)
-        max_stock_entry.insert(0, str(data["Items"][0]["MaxStockThreshold"]))
-
-        min_stock_label = ttk.Label(item_frame, text="MinStockThreshold:")
-        min_stock_label.grid(row=3, column=0, padx=10, pady=5, sticky=tk.W)
-        min_stock_entry = ttk.Entry(item_frame, width=10)
-        min_stock_entry.grid(row=3, column=1, padx=10, pady=5, sticky=tk.W)
-        min_stock_entry.insert(0, str(data["Items"][0]["MinStockThreshold"]))
-
-        qty_percent_label = ttk.Label(item_frame, text="QuantityPercent:")
-        qty_percent_label.grid(row=3, column=2, padx=10, pady=5, sticky=tk.W)
-        qty_percent_entry = ttk.Entry(item_frame, width=10)
-        qty_percent_entry.grid(row=3, column=3, padx=10, pady=5, sticky=tk.W)
-        qty_percent_entry.insert(0, str(data["Items"][0]["QuantityPercent"]))
-
-        def update_item_fields(event):
-            selected_class = class_name_combobox.get()
-            item = next(item for item in data["Items"] if item["ClassName"] == selected_class)
-            max_price_entry.delete(0, tk.END)
-            max_price_entry.insert(0, str(item["MaxPriceThreshold"]))
-            min_price_entry.delete(0, tk.END)
-            min_price_entry.insert(0, str(item["MinPriceThreshold"]))
-            sell_price_entry.delete(0, tk.END)
-            sell_price_entry.insert(0, str(item["SellPricePercent"]))
-            max_stock_entry.delete(0, tk.END)
-            max_stock_entry.insert(0, str(item["MaxStockThreshold"]))
-            min_stock_entry.delete(0, tk.END)
-            min_stock_entry.insert(0, str(item["MinStockThreshold"]))
-            qty_percent_entry.delete(0, tk.END)
-            qty_percent_entry.insert(0, str(item["QuantityPercent"]))
-
-        class_name_combobox.bind("<<ComboboxSelected>>", update_item_fields)
+        fields_frame = ttk.Frame(item_frame)
+        fields_frame.grid(row=2, column=0, padx=10, pady=5, sticky=(tk.W, tk.E))
+        item_entries = {}
+        for i, key in enumerate(TRADER_ITEM_FIELDS):
+            label = ttk.Label(fields_frame, text=f"{key}:")
+            label.grid(row=i // 2, column=(i % 2) * 2, padx=10, pady=5, sticky=tk.W)
+            entry = ttk.Entry(fields_frame, width=10)
+            entry.grid(row=i // 2, column=(i % 2) * 2 + 1, padx=10, pady=5, sticky=tk.W)
+            item_entries[key] = entry
+
+        def update_item_fields():
+            # One item shows its values; for several, a field is only filled
+            # when they all share the value, and blank fields are left alone.
+            selected = [document.item(name) for name in item_names.selected_names()]
+            for key, entry in item_entries.items():
+                shared = {item.get(key) for item in selected}
+                entry.delete(0, tk.END)
+                if len(shared) == 1:
+                    entry.insert(0, str(shared.pop()))
+
+        item_names = FilteredNameList(document.class_names())
+        if document.items:
+            item_names.set_selected(document.items[0]["ClassName"], True)
+        create_name_list(item_frame, item_names, 0, "items", on_select=update_item_fields)
+        update_item_fields()
 
         button_frame = ttk.Frame(main_frame, padding=(10, 5))
         button_frame.grid(row=2, column=0, padx=10, pady=10, sticky=(tk.W, tk.E))
 
+        def apply_item_changes():
+            selected = item_names.selected_names()
+            changes = {key: int(entry.get()) for key, entry in item_entries.items() if entry.get().strip()}
+            if not selected or not changes:
+                return 0
+            return document.update_items(selected, changes)
+
+        def apply_to_selected():
+            try:
+                updated = apply_item_changes()
+            except ValueError as e:
+                messagebox.showerror("Value Error", f"Invalid value: {e}")
+                return
+            messagebox.showinfo("Success", f"Updated {updated} items, not saved yet.")
+
         def save_changes():
-            data["DisplayName"] = display_name_entry.get()
-            data["Icon"] = icon_entry.get()
-            data["Color"] = color_entry.get()
-            data["InitStockPercent"] = int(init_stock_percent_entry.get())
-            
-            selected_class = class_name_combobox.get()
-            item = next(item for item in data["Items"] if item["ClassName"] == selected_class)
-            item["MaxPriceThreshold"] = int(max_price_entry.get())
-            item["MinPriceThreshold"] = int(min_price_entry.get())
-            item["SellPricePercent"] = int(sell_price_entry.get())
-            item["MaxStockThreshold"] = int(max_stock_entry.get())
-            item["MinStockThreshold"] = int(min_stock_entry.get())
-            item["QuantityPercent"] = int(qty_percent_entry.get())
-
-            save_json_file(json_file, data)
-            messagebox.showinfo("Success", "Changes saved successfully.")
+            try:
+                document.set_header("DisplayName", display_name_entry.get())
+                document.set_header("Icon", icon_entry.get())
+                document.set_header("Color", color_entry.get())
+                document.set_header("InitStockPercent", int(init_stock_percent_entry.get()))
+                apply_item_changes()
+            except ValueError as e:
+                messagebox.showerror("Value Error", f"Invalid value: {e}")
+                return
+            if document.save():
+                messagebox.showinfo("Success", "Changes saved successfully.")
+            else:
+                messagebox.showinfo("No Changes", "Nothing has changed since the last save.")
+
+        apply_button = ttk.Button(button_frame, text="Apply to Selected", command=apply_to_selected)
+        apply_button.grid(row=0, column=1, padx=10, pady=10, sticky=(tk.W, tk.E))
 
         save_button = ttk.Button(button_frame, text="Save", command=save_changes)
         save_button.grid(row=0, column=0, padx=10, pady=10, sticky=(tk.W, tk.E))
@@ -437,13 +1086,27 @@ def show_json_editor():
         back_button = ttk.Button(button_frame, text="Back to Menu", command=show_main_menu)
         back_button.grid(row=2, column=0, padx=10, pady=10, sticky=(tk.W, tk.E))
 
+def show_screen(name, build, on_show=None):
+    # Screens are built the first time they are opened and afterwards only
+    # hidden and shown again, keeping their widgets and loaded data.
+    global current_screen
+    frame = screens.get(name)
+    if frame is None:
+        frame = ttk.Frame(root)
+        build(frame)
+        screens[name] = frame
+    if current_screen is not None and current_screen is not frame:
+        current_screen.grid_remove()
+    frame.grid(row=0, column=0, sticky=(tk.W, tk.E, tk.N, tk.S))
+    current_screen = frame
+    if on_show is not None:
+        on_show()
+
 def show_main_menu():
-    for widget in root.winfo_children():
-        widget.destroy()
-    main_menu()
+    show_screen("menu", main_menu)
 
-def main_menu():
-    menu_frame = ttk.Frame(root, padding=(20, 10))
+def main_menu(parent):
+    menu_frame = ttk.Frame(parent, padding=(20, 10))
     menu_frame.grid(row=0, column=0, sticky=(tk.W, tk.E, tk.N, tk.S))
 
     generator_button = ttk.Button(menu_frame, text="Open XML Generator", command=open_generator)
@@ -461,18 +1124,29 @@ def main_menu():
     bulk_edit_button = ttk.Button(menu_frame, text="Bulk Edit Types", command=show_bulk_editor)
     bulk_edit_button.grid(row=4, column=0, padx=20, pady=20, sticky=(tk.W, tk.E))
 
+    merge_button = ttk.Button(menu_frame, text="Merge Mod Types", command=show_merger)
+    merge_button.grid(row=5, column=0, padx=20, pady=20, sticky=(tk.W, tk.E))
+
+    batch_button = ttk.Button(menu_frame, text="Run Batch Manifest", command=show_batch_runner)
+    batch_button.grid(row=6, column=0, padx=20, pady=20, sticky=(tk.W, tk.E))
+
 def open_generator():
-    for widget in root.winfo_children():
-        widget.destroy()
-    generator_gui()
+    show_screen("generator", generator_gui)
 
 def open_editor():
-    for widget in root.winfo_children():
-        widget.destroy()
-    editor_gui()
+    show_screen("editor", editor_gui)
+
+def create_flag_entries(flags_frame):
+    flags = {flag: ttk.Entry(flags_frame, width=40) for flag in FLAG_DEFAULTS}
+    for i, (flag, entry) in enumerate(flags.items()):
+        label = ttk.Label(flags_frame, text=f"{flag.replace('_', ' ').capitalize()}:")
+        label.grid(row=i, column=0, padx=10, pady=5, sticky=tk.W)
+        entry.grid(row=i, column=1, padx=10, pady=5, sticky=tk.W)
+        entry.insert(0, FLAG_DEFAULTS[flag])
+    return flags
 
-def generator_gui():
-    main_frame = ttk.Frame(root, padding=(20, 10))
+def generator_gui(parent):
+    main_frame = ttk.Frame(parent, padding=(20, 10))
     main_frame.grid(row=0, column=0, sticky=(tk.W, tk.E, tk.N, tk.S))
 
     entry_frame = ttk.LabelFrame(main_frame, text="Entry Fields", padding=(10, 5))
@@ -503,29 +1177,7 @@ def generator_gui():
     flags_frame = ttk.LabelFrame(main_frame, text="Flags", padding=(10, 5))
     flags_frame.grid(row=1, column=0, padx=10, pady=10, sticky=(tk.W, tk.E))
 
-    flags = {
-        "count_in_cargo": ttk.Entry(flags_frame, width=40),
-        "count_in_hoarder": ttk.Entry(flags_frame, width=40),
-        "count_in_map": ttk.Entry(flags_frame, width=40),
-        "count_in_player": ttk.Entry(flags_frame, width=40),
-        "crafted": ttk.Entry(flags_frame, width=40),
-        "deloot": ttk.Entry(flags_frame, width=40),
-    }
-
-    flag_defaults = {
-        "count_in_cargo": "0",
-        "count_in_hoarder": "0",
-        "count_in_map": "1",
-        "count_in_player": "0",
-        "crafted": "0",
-        "deloot": "0",
-    }
-
-    for i, (flag, entry) in enumerate(flags.items()):
-        label = ttk.Label(flags_frame, text=f"{flag.replace('_', ' ').capitalize()}:")
-        label.grid(row=i, column=0, padx=10, pady=5, sticky=tk.W)
-        entry.grid(row=i, column=1, padx=10, pady=5, sticky=tk.W)
-        entry.insert(0, flag_defaults[flag])
+    flags = create_flag_entries(flags_frame)
 
     category_label = ttk.Label(main_frame, text="Categories:")
     category_label.grid(row=2, column=0, padx=10, pady=5, sticky=tk.W)
@@ -551,29 +1203,43 @@ def generator_gui():
     button_frame = ttk.Frame(main_frame, padding=(10, 5))
     button_frame.grid(row=0, column=2, rowspan=5, padx=10, pady=10, sticky=(tk.N, tk.S))
 
-    select_button = ttk.Button(button_frame, text="Select Input File", command=lambda: select_file_for_generation(*[entry[1] for entry in entries], flags, list(category_entry.get(0, tk.END)), list(usage_entry.get(0, tk.END)), list(value_entry.get(0, tk.END)), status_label, progress))
+    use_rules = tk.BooleanVar(value=False)
+    append_new = tk.BooleanVar(value=False)
+    select_button = ttk.Button(button_frame, text="Select Input File", command=lambda: select_file_for_generation(*[entry[1] for entry in entries], flags, selected_items(category_entry), selected_items(usage_entry), selected_items(value_entry), status_label, progress, use_rules, append_new))
     select_button.grid(row=0, column=0, padx=10, pady=10, sticky=(tk.W, tk.E))
 
     help_button = ttk.Button(button_frame, text="Help", command=show_help)
     help_button.grid(row=1, column=0, padx=10, pady=10, sticky=(tk.W, tk.E))
 
-    save_button = ttk.Button(button_frame, text="Save Settings", command=lambda: save_settings(entries, flags))
+    save_button = ttk.Button(button_frame, text="Save Settings", command=lambda: save_settings(entries, flags, (category_entry, usage_entry, value_entry)))
     save_button.grid(row=2, column=0, padx=10, pady=10, sticky=(tk.W, tk.E))
 
-    load_button = ttk.Button(button_frame, text="Load Settings", command=lambda: load_settings(entries, flags))
+    load_button = ttk.Button(button_frame, text="Load Settings", command=lambda: load_settings(entries, flags, (category_entry, usage_entry, value_entry)))
     load_button.grid(row=3, column=0, padx=10, pady=10, sticky=(tk.W, tk.E))
 
     back_button = ttk.Button(button_frame, text="Back to Menu", command=show_main_menu)
     back_button.grid(row=4, column=0, padx=10, pady=10, sticky=(tk.W, tk.E))
 
-    progress = ttk.Progressbar(root, mode='determinate')
+    cancel_button = ttk.Button(button_frame, text="Cancel Generation", command=lambda: cancel_job(generation_job))
+    cancel_button.grid(row=5, column=0, padx=10, pady=10, sticky=(tk.W, tk.E))
+
+    rules_button = ttk.Button(button_frame, text="Edit Preset Rules", command=edit_preset_rules)
+    rules_button.grid(row=6, column=0, padx=10, pady=10, sticky=(tk.W, tk.E))
+
+    rules_check = ttk.Checkbutton(button_frame, text="Apply Preset Rules", variable=use_rules)
+    rules_check.grid(row=7, column=0, padx=10, pady=10, sticky=tk.W)
+
+    append_check = ttk.Checkbutton(button_frame, text="Add New Types to Existing XML", variable=append_new)
+    append_check.grid(row=8, column=0, padx=10, pady=10, sticky=tk.W)
+
+    progress = ttk.Progressbar(parent, mode='determinate')
     progress.grid(row=5, column=0, padx=20, pady=10, sticky=(tk.W, tk.E))
 
-    status_label = ttk.Label(root, text="", font=('Arial', 12))
+    status_label = ttk.Label(parent, text="", font=('Arial', 12))
     status_label.grid(row=6, column=0, padx=20, pady=10, sticky=(tk.W, tk.E))
 
-def editor_gui():
-    main_frame = ttk.Frame(root, padding=(20, 10))
+def editor_gui(parent):
+    main_frame = ttk.Frame(parent, padding=(20, 10))
     main_frame.grid(row=0, column=0, sticky=(tk.W, tk.E, tk.N, tk.S))
 
     entry_frame = ttk.LabelFrame(main_frame, text="Entry Fields", padding=(10, 5))
@@ -602,30 +1268,34 @@ def editor_gui():
             entry[1].insert(0, "100")
 
     category_label = ttk.Label(entry_frame, text="Categories:")
-    category_label.grid(row=6, column=0, padx=10, pady=5, sticky=tk.W)
+    category_label.grid(row=7, column=0, padx=10, pady=5, sticky=tk.W)
     category_entry = tk.Listbox(entry_frame, selectmode=MULTIPLE, height=5)
     for category in ["Clothes", "Containers", "Explosives", "Food", "Tools", "Vehicle Parts", "Weapons"]:
         category_entry.insert(tk.END, category)
-    category_entry.grid(row=6, column=1, padx=10, pady=5, sticky=tk.W)
+    category_entry.grid(row=7, column=1, padx=10, pady=5, sticky=tk.W)
 
     usage_label = ttk.Label(entry_frame, text="Usages:")
-    usage_label.grid(row=7, column=0, padx=10, pady=5, sticky=tk.W)
+    usage_label.grid(row=8, column=0, padx=10, pady=5, sticky=tk.W)
     usage_entry = tk.Listbox(entry_frame, selectmode=MULTIPLE, height=5)
     for usage in ["Coast", "Farm", "Firefighter", "Hunting", "Industrial", "Medic", "Military", "Office", "Police", "Prison", "School", "Town", "Village"]:
         usage_entry.insert(tk.END, usage)
-    usage_entry.grid(row=7, column=1, padx=10, pady=5, sticky=tk.W)
+    usage_entry.grid(row=8, column=1, padx=10, pady=5, sticky=tk.W)
 
     value_label = ttk.Label(entry_frame, text="Values:")
-    value_label.grid(row=8, column=0, padx=10, pady=5, sticky=tk.W)
+    value_label.grid(row=9, column=0, padx=10, pady=5, sticky=tk.W)
     value_entry = tk.Listbox(entry_frame, selectmode=MULTIPLE, height=4)
     for value in ["Tier1", "Tier2", "Tier3", "Tier4"]:
         value_entry.insert(tk.END, value)
-    value_entry.grid(row=8, column=1, padx=10, pady=5, sticky=tk.W)
+    value_entry.grid(row=9, column=1, padx=10, pady=5, sticky=tk.W)
+
+    flags_frame = ttk.LabelFrame(main_frame, text="Flags", padding=(10, 5))
+    flags_frame.grid(row=1, column=0, padx=10, pady=10, sticky=(tk.W, tk.E))
+    flags = create_flag_entries(flags_frame)
 
     button_frame = ttk.Frame(main_frame, padding=(10, 5))
     button_frame.grid(row=0, column=2, rowspan=9, padx=10, pady=10, sticky=(tk.N, tk.S))
 
-    load_xml_button = ttk.Button(button_frame, text="Load XML File", command=lambda: load_xml_file(entries, flags, list(category_entry.get(0, tk.END)), list(usage_entry.get(0, tk.END)), list(value_entry.get(0, tk.END)), search_entry, status_label))
+    load_xml_button = ttk.Button(button_frame, text="Load XML File", command=lambda: load_xml_file(entries, flags, category_entry, usage_entry, value_entry, search_entry, status_label))
     load_xml_button.grid(row=0, column=0, padx=10, pady=10, sticky=(tk.W, tk.E))
 
     help_button = ttk.Button(button_frame, text="Help", command=show_help)
@@ -635,45 +1305,136 @@ def editor_gui():
     search_label.grid(row=2, column=0, padx=10, pady=5, sticky=tk.W)
     search_entry = ttk.Combobox(main_frame, width=37)
     search_entry.grid(row=2, column=1, padx=10, pady=5, sticky=tk.W)
-    search_entry.bind("<KeyRelease>", lambda event: update_search_suggestions(entries, flags, list(category_entry.get(0, tk.END)), list(usage_entry.get(0, tk.END)), list(value_entry.get(0, tk.END)), search_entry, status_label))
+    search_entry.bind("<KeyRelease>", lambda event: schedule_search_suggestions(search_entry))
 
-    search_button = ttk.Button(main_frame, text="Search", command=lambda: search_type(entries, flags, list(category_entry.get(0, tk.END)), list(usage_entry.get(0, tk.END)), list(value_entry.get(0, tk.END)), search_entry))
+    search_button = ttk.Button(main_frame, text="Search", command=lambda: search_type(entries, flags, category_entry, usage_entry, value_entry, search_entry))
     search_button.grid(row=2, column=2, padx=10, pady=5, sticky=tk.W)
 
-    save_changes_button = ttk.Button(main_frame, text="Save Changes", command=lambda: save_changes_to_xml(entries, flags, list(category_entry.get(0, tk.END)), list(usage_entry.get(0, tk.END)), list(value_entry.get(0, tk.END)), search_entry, status_label))
+    save_changes_button = ttk.Button(main_frame, text="Save Changes", command=lambda: save_changes_to_xml(entries, flags, selected_items(category_entry), selected_items(usage_entry), selected_items(value_entry), search_entry, status_label))
     save_changes_button.grid(row=3, column=0, columnspan=3, padx=10, pady=10, sticky=(tk.W, tk.E))
 
     back_button = ttk.Button(button_frame, text="Back to Menu", command=show_main_menu)
     back_button.grid(row=2, column=0, padx=10, pady=10, sticky=(tk.W, tk.E))
 
-    status_label = ttk.Label(root, text="", font=('Arial', 12))
+    flush_button = ttk.Button(button_frame, text="Save Now", command=lambda: commit_queue.flush())
+    flush_button.grid(row=3, column=0, padx=10, pady=10, sticky=(tk.W, tk.E))
+
+    undo_button = ttk.Button(button_frame, text="Undo", command=lambda: undo_edit(status_label))
+    undo_button.grid(row=4, column=0, padx=10, pady=10, sticky=(tk.W, tk.E))
+    redo_button = ttk.Button(button_frame, text="Redo", command=lambda: redo_edit(status_label))
+    redo_button.grid(row=5, column=0, padx=10, pady=10, sticky=(tk.W, tk.E))
+
+    status_label = ttk.Label(parent, text="", font=('Arial', 12))
     status_label.grid(row=4, column=0, padx=20, pady=10, sticky=(tk.W, tk.E))
 
 def show_bulk_editor():
-    for widget in root.winfo_children():
-        widget.destroy()
-
-    bulk_editor_window = ttk.Frame(root, padding=(20, 10))
+    show_screen("bulk_editor", bulk_editor_gui, on_show=refresh_bulk_type_list)
+
+def create_name_list(parent, names, row, noun, on_select=None):
+    # A filter box and a multi-select list over a FilteredNameList. The
+    # listbox only ever holds the visible rows, the model has the full list,
+    # the filter and the selection. Returns the function that redraws it.
+    view = {"top": 0, "after_id": None}
+
+    filter_frame = ttk.Frame(parent)
+    filter_frame.grid(row=row, column=0, padx=10, pady=5, sticky=(tk.W, tk.E))
+    ttk.Label(filter_frame, text="Filter:").grid(row=0, column=0, sticky=tk.W)
+    filter_entry = ttk.Entry(filter_frame, width=30)
+    filter_entry.grid(row=0, column=1, padx=5, sticky=tk.W)
+    count_label = ttk.Label(filter_frame, text="")
+    count_label.grid(row=1, column=0, columnspan=4, pady=(5, 0), sticky=tk.W)
+
+    listbox = Listbox(parent, selectmode=MULTIPLE, width=50, height=NAME_LIST_ROWS, exportselection=False)
+    listbox.grid(row=row + 1, column=0, padx=10, pady=5, sticky=tk.W)
+    scrollbar = Scrollbar(parent, orient="vertical")
+    scrollbar.grid(row=row + 1, column=1, sticky='ns')
+
+    def update_count():
+        count_label.config(text=f"{len(names)} of {len(names.names)} {noun} shown, {len(names.selected)} selected")
+
+    def render():
+        total = len(names)
+        view["top"] = max(0, min(view["top"], total - NAME_LIST_ROWS))
+        rows = names.rows(view["top"], NAME_LIST_ROWS)
+        listbox.delete(0, tk.END)
+        if rows:
+            listbox.insert(tk.END, *rows)
+        for i, name in enumerate(rows):
+            if names.is_selected(name):
+                listbox.selection_set(i)
+        if total:
+            scrollbar.set(view["top"] / total, min(1.0, (view["top"] + NAME_LIST_ROWS) / total))
+        else:
+            scrollbar.set(0.0, 1.0)
+        update_count()
+
+    def scroll(action, amount, unit=None):
+        if action == "moveto":
+            view["top"] = int(float(amount) * len(names))
+        elif action == "scroll":
+            view["top"] += int(amount) * (NAME_LIST_ROWS if unit == "pages" else 1)
+        render()
+
+    def scroll_wheel(event):
+        scroll("scroll", -NAME_LIST_WHEEL_ROWS if event.num == 4 or event.delta > 0 else NAME_LIST_WHEEL_ROWS)
+        return "break"
+
+    def sync_selection(event):
+        for i, name in enumerate(listbox.get(0, tk.END)):
+            names.set_selected(name, listbox.selection_includes(i))
+        update_count()
+        if on_select is not None:
+            on_select()
+
+    def apply_filter():
+        view["after_id"] = None
+        names.set_filter(filter_entry.get())
+        view["top"] = 0
+        render()
+
+    def schedule_filter(event):
+        if view["after_id"] is not None:
+            listbox.after_cancel(view["after_id"])
+        view["after_id"] = listbox.after(SEARCH_DEBOUNCE_MS, apply_filter)
+
+    def change_selection(select):
+        if select:
+            names.select_all_matching()
+        else:
+            names.clear_selection()
+        render()
+        if on_select is not None:
+            on_select()
+
+    filter_entry.bind("<KeyRelease>", schedule_filter)
+    select_all_button = ttk.Button(filter_frame, text="Select All Matching", command=lambda: change_selection(True))
+    select_all_button.grid(row=0, column=2, padx=5)
+    clear_button = ttk.Button(filter_frame, text="Clear Selection", command=lambda: change_selection(False))
+    clear_button.grid(row=0, column=3, padx=5)
+    listbox.bind("<<ListboxSelect>>", sync_selection)
+    for sequence in ("<MouseWheel>", "<Button-4>", "<Button-5>"):
+        listbox.bind(sequence, scroll_wheel)
+    scrollbar.config(command=scroll)
+    render()
+    return render
+
+def bulk_editor_gui(parent):
+    bulk_editor_window = ttk.Frame(parent, padding=(20, 10))
     bulk_editor_window.grid(row=0, column=0, sticky=(tk.W, tk.E, tk.N, tk.S))
 
-    load_xml_button = ttk.Button(bulk_editor_window, text="Load XML File", command=lambda: load_xml_file_for_bulk_edit(status_label, type_listbox))
+    load_xml_button = ttk.Button(bulk_editor_window, text="Load XML File", command=lambda: load_xml_file_for_bulk_edit(status_label))
     load_xml_button.grid(row=0, column=0, padx=10, pady=10, sticky=(tk.W, tk.E))
 
-    listbox_label = ttk.Label(bulk_editor_window, text="Select Types to Edit:")
-    listbox_label.grid(row=1, column=0, padx=10, pady=5, sticky=tk.W)
-
-    global type_listbox
-    type_listbox = Listbox(bulk_editor_window, selectmode=MULTIPLE, width=50, height=20)
-    type_listbox.grid(row=2, column=0, padx=10, pady=5, sticky=tk.W)
-
-    scrollbar = Scrollbar(bulk_editor_window, orient="vertical")
-    scrollbar.config(command=type_listbox.yview)
-    type_listbox.config(yscrollcommand=scrollbar.set)
-    scrollbar.grid(row=2, column=1, sticky='ns')
+    global render_bulk_list
+    render_bulk_list = create_name_list(bulk_editor_window, bulk_names, 1, "types")
 
     entry_frame = ttk.LabelFrame(bulk_editor_window, text="Entry Fields", padding=(10, 5))
     entry_frame.grid(row=3, column=0, padx=10, pady=10, sticky=(tk.W, tk.E))
 
+    flags_frame = ttk.LabelFrame(bulk_editor_window, text="Flags", padding=(10, 5))
+    flags_frame.grid(row=3, column=2, padx=10, pady=10, sticky=(tk.W, tk.E, tk.N))
+    flags = create_flag_entries(flags_frame)
+
     entries = [
         ("Nominal", ttk.Entry(entry_frame, width=40)),
         ("Lifetime", ttk.Entry(entry_frame, width=40)),
@@ -720,76 +1481,157 @@ def show_bulk_editor():
     button_frame = ttk.Frame(bulk_editor_window, padding=(10, 5))
     button_frame.grid(row=4, column=0, padx=10, pady=10, sticky=(tk.W, tk.E))
 
-    bulk_edit_button = ttk.Button(button_frame, text="Apply Changes", command=lambda: apply_bulk_edits(entries, flags, list(category_entry.get(0, tk.END)), list(usage_entry.get(0, tk.END)),
-    list(value_entry.get(0, tk.END)), type_listbox))
+    bulk_edit_button = ttk.Button(button_frame, text="Apply Changes", command=lambda: apply_bulk_edits(entries, flags, selected_items(category_entry) or None, selected_items(usage_entry) or None,
+    selected_items(value_entry) or None, bulk_names.selected_names(), status_label))
     bulk_edit_button.grid(row=0, column=0, padx=10, pady=10, sticky=(tk.W, tk.E))
 
     back_button = ttk.Button(button_frame, text="Back to Menu", command=show_main_menu)
     back_button.grid(row=1, column=0, padx=10, pady=10, sticky=(tk.W, tk.E))
 
-    status_label = ttk.Label(root, text="", font=('Arial', 12))
-    status_label.grid(row=5, column=0, padx=20, pady=10, sticky=(tk.W, tk.E))
+    flush_button = ttk.Button(button_frame, text="Save Now", command=lambda: commit_queue.flush())
+    flush_button.grid(row=2, column=0, padx=10, pady=10, sticky=(tk.W, tk.E))
 
-def load_xml_file_for_bulk_edit(status_label, type_listbox):
-    global tree, root_element, xml_file
-    xml_file = filedialog.askopenfilename(filetypes=[("XML files", "*.xml")])
-    if xml_file:
-        try:
-            tree = ET.parse(xml_file)
-            root_element = tree.getroot()
-            type_names = [type_elem.get('name') for type_elem in root_element.findall('type')]
-            type_listbox.delete(0, tk.END)
-            for type_name in type_names:
-                type_listbox.insert(tk.END, type_name)
-            status_label.config(text=f"Loaded XML file: {os.path.basename(xml_file)}")
-        except ET.ParseError as e:
-            messagebox.showerror("Parse Error", f"Failed to parse XML file: {e}")
-    else:
-        status_label.config(text="XML file loading cancelled.")
+    undo_button = ttk.Button(button_frame, text="Undo", command=lambda: undo_edit(status_label))
+    undo_button.grid(row=3, column=0, padx=10, pady=10, sticky=(tk.W, tk.E))
+    redo_button = ttk.Button(button_frame, text="Redo", command=lambda: redo_edit(status_label))
+    redo_button.grid(row=4, column=0, padx=10, pady=10, sticky=(tk.W, tk.E))
 
-def apply_bulk_edits(entries, flags, categories, usages, values, type_listbox):
-    selected_types = [type_listbox.get(i) for i in type_listbox.curselection()]
-    for type_name in selected_types:
-        type_elem = root_element.find(f"./type[@name='{type_name}']")
-        if type_elem is not None:
-            for entry in entries:
-                elem = type_elem.find(entry[0].lower())
-                if elem is not None:
-                    elem.text = entry[1].get()
-            
-            flags_elem = type_elem.find('flags')
-            for flag in flags:
-                flags_elem.set(flag, flags[flag].get())
+    rule_frame = ttk.LabelFrame(bulk_editor_window, text="Rule Edit", padding=(10, 5))
+    rule_frame.grid(row=4, column=2, padx=10, pady=10, sticky=(tk.W, tk.E, tk.N))
 
-            # Clear existing categories, usages, and values
-            for category_elem in type_elem.findall('category'):
-                type_elem.remove(category_elem)
-            for usage_elem in type_elem.findall('usage'):
-                type_elem.remove(usage_elem)
-            for value_elem in type_elem.findall('value'):
-                type_elem.remove(value_elem)
+    ttk.Label(rule_frame, text="Where:").grid(row=0, column=0, padx=10, pady=5, sticky=tk.W)
+    where_entry = ttk.Entry(rule_frame, width=50)
+    where_entry.insert(0, '"Military" in usage and value == "Tier4"')
+    where_entry.grid(row=0, column=1, padx=10, pady=5, sticky=tk.W)
 
-            # Add new categories, usages, and values
-            for category in categories:
-                category_elem = ET.SubElement(type_elem, 'category')
-                category_elem.set('name', category)
+    ttk.Label(rule_frame, text="Set:").grid(row=1, column=0, padx=10, pady=5, sticky=tk.W)
+    set_entry = ttk.Entry(rule_frame, width=50)
+    set_entry.insert(0, "nominal *= 0.7, min = ceil(nominal / 2)")
+    set_entry.grid(row=1, column=1, padx=10, pady=5, sticky=tk.W)
 
-            for usage in usages:
-                usage_elem = ET.SubElement(type_elem, 'usage')
-                usage_elem.set('name', usage)
+    preview_button = ttk.Button(rule_frame, text="Preview", command=lambda: preview_rule_edit(where_entry.get(), set_entry.get(), status_label))
+    preview_button.grid(row=2, column=0, padx=10, pady=5, sticky=(tk.W, tk.E))
+    rule_button = ttk.Button(rule_frame, text="Apply Rule", command=lambda: apply_rule_edit(where_entry.get(), set_entry.get(), status_label))
+    rule_button.grid(row=2, column=1, padx=10, pady=5, sticky=tk.W)
 
-            for value in values:
-                if value:
-                    value_elem = ET.SubElement(type_elem, 'value')
-                    value_elem.set('name', value)
-
-    tree.write(xml_file, encoding='utf-8', xml_declaration=True)
-    messagebox.showinfo("Success", "Bulk edits applied successfully.")
-    status_label.config(text=f"Changes saved to {os.path.basename(xml_file)}")
-
-root = tk.Tk()
-root.title("Types XML Tool")
+    status_label = ttk.Label(parent, text="", font=('Arial', 12))
+    status_label.grid(row=5, column=0, padx=20, pady=10, sticky=(tk.W, tk.E))
 
-main_menu()
+def plan_rule(where, assignments):
+    if not document_version:
+        messagebox.showerror("Error", "Load an XML file first.")
+        return None
+    operation = instrument.start("rule plan")
+    try:
+        with operation.phase("index"):
+            columns = TypeColumns.from_registry(registry)
+        with operation.phase("lookup"):
+            plan = plan_rule_edit(columns, where, assignments)
+    except (ValueError, SyntaxError) as e:
+        operation.finish()
+        messagebox.showerror("Error", f"Invalid rule: {e}")
+        return None
+    operation.count("types", len(plan.selected))
+    operation.finish()
+    return plan
+
+def preview_rule_edit(where, assignments, status_label):
+    plan = plan_rule(where, assignments)
+    if plan is not None:
+        lines = "\n".join(plan.preview_lines(RULE_PREVIEW_LIMIT))
+        messagebox.showinfo("Rule Preview", f"{len(plan.selected)} types match, {len(plan.changes)} would change.\n\n{lines}")
+        status_label.config(text=f"{len(plan.selected)} types match the rule")
+
+def apply_rule_edit(where, assignments, status_label):
+    plan = plan_rule(where, assignments)
+    if plan is None:
+        return
+    if not plan.changes:
+        status_label.config(text=f"{len(plan.selected)} types match, nothing to change")
+        return
+    if messagebox.askyesno("Apply Rule", f"Change {len(plan.changes)} of {len(plan.selected)} matching types?"):
+        commit_queue.edit(lambda: timed_edit("rule edit", len(plan.changes), lambda: edit_history.apply(f"rule edit of {len(plan.changes)} types", type_elements(plan.changes), lambda: apply_rule_plan(registry, plan))))
+        status_label.config(text=f"Rule edit of {len(plan.changes)} types queued for saving")
+
+def timed_edit(name, count, edit):
+    operation = instrument.start(name, types=count)
+    with operation.phase("mutate"):
+        touched = edit()
+    operation.count("types", len(touched))
+    operation.finish()
+    return touched
+
+def load_xml_file_for_bulk_edit(status_label):
+    global bulk_list_version
+    selected_file = filedialog.askopenfilename(filetypes=[("XML files", "*.xml")])
+    if selected_file:
+        bulk_names.set_names([])
+        render_bulk_list()
+        # The list fills from the batches, mark it current for the version
+        # this load is about to publish.
+        bulk_list_version = document_version + 1
+        load_types_document(selected_file, add_bulk_names, status_label)
+    else:
+        status_label.config(text="XML file loading cancelled.")
 
-root.mainloop()
+def add_bulk_names(batch):
+    bulk_names.extend(batch)
+    render_bulk_list()
+
+def refresh_bulk_type_list():
+    global bulk_list_version
+    if bulk_list_version != document_version:
+        bulk_names.set_names(registry.names() if document_version else [])
+        bulk_list_version = document_version
+    render_bulk_list()
+
+def apply_bulk_edits(entries, flags, categories, usages, values, selected_types, status_label):
+    if not selected_types:
+        messagebox.showerror("Error", "Select at least one type to edit.")
+        return
+    fields = {entry[0].lower(): entry[1].get() for entry in entries}
+    flag_values = {flag: flags[flag].get() for flag in flags}
+    commit_queue.edit(lambda: timed_edit("bulk edit", len(selected_types), lambda: edit_history.apply(f"bulk edit of {len(selected_types)} types", type_elements(selected_types), lambda: apply_bulk_edit(registry, selected_types, fields, flag_values, categories, usages, values))))
+    status_label.config(text=f"Bulk edits to {len(selected_types)} types queued for saving")
+
+if __name__ == "__main__":
+    root = tk.Tk()
+    root.title("Types XML Tool")
+
+    save_indicator = ttk.Label(root, text="", font=('Arial', 10))
+    save_indicator.grid(row=1, column=0, padx=20, pady=(0, 10), sticky=tk.W)
+    validation_frame = ttk.Frame(root)
+    validation_frame.grid(row=2, column=0, padx=20, pady=(0, 10), sticky=tk.W)
+    validation_indicator = ttk.Label(validation_frame, text="", font=('Arial', 10))
+    validation_indicator.grid(row=0, column=0, sticky=tk.W)
+    validation_button = ttk.Button(validation_frame, text="Show Problems", command=show_validation_report)
+    validation_button.grid(row=0, column=1, padx=10)
+    totals_button = ttk.Button(validation_frame, text="Economy Totals", command=show_economy_totals)
+    totals_button.grid(row=0, column=2)
+    watch_var = tk.BooleanVar(value=True)
+    watch_check = ttk.Checkbutton(validation_frame, text="Watch for external changes", variable=watch_var, command=lambda: set_watching(watch_var.get()))
+    watch_check.grid(row=0, column=3, padx=10)
+    instrument_frame = ttk.Frame(root)
+    instrument_frame.grid(row=3, column=0, padx=20, pady=(0, 10), sticky=tk.W)
+    record_var = tk.BooleanVar(value=instrument.enabled())
+    record_check = ttk.Checkbutton(instrument_frame, text="Record Timings", variable=record_var, command=lambda: set_recording_timings(record_var.get()))
+    record_check.grid(row=0, column=0)
+    export_timings_button = ttk.Button(instrument_frame, text="Export Timings...", command=export_timings)
+    export_timings_button.grid(row=0, column=1, padx=10)
+    profile_button = ttk.Button(instrument_frame, text="Profile Next...", command=lambda: profile_next_operation(record_var))
+    profile_button.grid(row=0, column=2)
+    perf_indicator = ttk.Label(instrument_frame, text="", font=('Arial', 10))
+    perf_indicator.grid(row=0, column=3, padx=10, sticky=tk.W)
+    instrument.add_listener(show_operation_timing)
+    commit_queue = CommitQueue(root, job_runner, interval=AUTOSAVE_INTERVAL_MS, fsync=AUTOSAVE_FSYNC, on_state=update_save_indicator, on_error=show_save_error, on_edit=revalidate_types, can_write=lambda: types_watcher.can_write(), on_saved=lambda type_names, state: types_watcher.on_saved(type_names, state))
+    types_watcher = TypesWatcher(root, job_runner, commit_queue, interval=WATCH_INTERVAL_MS, on_change=apply_external_change, on_error=show_watch_error)
+    root.protocol("WM_DELETE_WINDOW", close_application)
+    root.bind("<Control-z>", lambda event: undo_edit())
+    root.bind("<Control-y>", lambda event: redo_edit())
+    root.bind("<Control-Z>", lambda event: redo_edit())
+
+    show_main_menu()
+
+    root.mainloop()
+    cancel_job(generation_job)
+    job_runner.shutdown()
@@ -0,0 +1,65 @@
+import xml.etree.ElementTree as ET
+
+import pytest
+
+from typestool.bulk import TypeColumns, apply_rule_plan, parse_assignments, plan_rule_edit, select_type_names
+from typestool.registry import TypeRegistry
+
+SOURCE = """<types>
+    <type name="AKM">
+        <nominal>10</nominal>
+        <lifetime>100</lifetime>
+        <flags count_in_map="1"/>
+        <usage name="Military"/>
+        <value name="Tier4"/>
+    </type>
+    <type name="Apple">
+        <nominal>3</nominal>
+        <lifetime>50</lifetime>
+        <usage name="Village"/>
+    </type>
+    <type name="Rag">
+        <lifetime>20</lifetime>
+        <usage name="Military"/>
+    </type>
+</types>"""
+
+
+def registry():
+    return TypeRegistry(ET.fromstring(SOURCE))
+
+
+def plan(registry, where, assignments):
+    return plan_rule_edit(TypeColumns.from_registry(registry), where, assignments, use_numpy=False)
+
+
+def test_select_type_names_by_list_and_pattern():
+    assert select_type_names(["AKM", "Apple", "Rag"], names=["Rag"], pattern="A*") == ["Rag", "AKM", "Apple"]
+
+
+def test_plan_changes_only_selected_numeric_fields():
+    edit = plan(registry(), '"Military" in usage and nominal > 0', "nominal *= 0.5, lifetime = lifetime + 1")
+    assert edit.changes == {"AKM": {"nominal": ("10", "5"), "lifetime": ("100", "101")}}
+
+
+def test_tag_assignments():
+    edit = plan(registry(), 'usage == "Village"', 'usage += "Hunting", value = "Tier1"')
+    assert edit.changes == {"Apple": {"usage": (["Village"], ["Village", "Hunting"]), "value": ([], ["Tier1"])}}
+
+
+def test_bad_rules_raise_value_error():
+    with pytest.raises(ValueError, match="needs a name or a list of names"):
+        parse_assignments("usage += Hunting")
+    with pytest.raises(ValueError, match="needs a number"):
+        plan(registry(), "", "nominal = name")
+    with pytest.raises(ValueError, match="one is a number and the other text"):
+        plan(registry(), 'nominal > "5"', "nominal = 1")
+
+
+def test_apply_adds_missing_field_in_place():
+    types = registry()
+    edit = plan(types, 'name == "Rag"', "nominal = 4")
+    assert apply_rule_plan(types, edit) == ["Rag"]
+    assert [child.tag for child in types.get("Rag")] == ["nominal", "lifetime", "usage"]
+    # Run again the rule changes nothing and touches no type.
+    assert apply_rule_plan(types, plan(types, 'name == "Rag"', "nominal = 4")) == []
@@ -0,0 +1,74 @@
+import os
+
+from typestool.cache import ParseCache, load_cached_types
+from typestool.loader import iter_type_records
+from typestool.model import pack_record
+
+SOURCE = """<types>
+    <type name="AKM">
+        <nominal>10</nominal>
+        <flags count_in_map="1"/>
+        <category name="weapons"/>
+    </type>
+    <type name="Apple">
+        <nominal>3</nominal>
+    </type>
+</types>
+"""
+
+
+def write_types(tmp_path, source=SOURCE):
+    xml_file = tmp_path / "types.xml"
+    xml_file.write_text(source, encoding='utf-8')
+    return str(xml_file)
+
+
+def test_store_and_lookup(tmp_path):
+    xml_file = write_types(tmp_path)
+    cache = ParseCache(str(tmp_path / "cache"))
+    assert cache.lookup(xml_file) is None
+    records = list(iter_type_records(xml_file))
+    assert cache.store(xml_file, [pack_record(record) for record in records])
+    with cache.lookup(xml_file) as cached:
+        assert cached.names == ["AKM", "Apple"]
+        assert len(cached) == 2
+        assert [cached.record(index) for index in range(2)] == records
+
+
+def test_changed_file_misses(tmp_path):
+    xml_file = write_types(tmp_path)
+    cache = ParseCache(str(tmp_path / "cache"))
+    cache.load(xml_file).close()
+    write_types(tmp_path, SOURCE.replace("<nominal>3</nominal>", "<nominal>30</nominal>"))
+    assert cache.lookup(xml_file) is None
+    with cache.load(xml_file) as cached:
+        assert cached.record(1)["nominal"] == "30"
+
+
+def test_touched_file_with_same_content_hits(tmp_path):
+    xml_file = write_types(tmp_path)
+    cache = ParseCache(str(tmp_path / "cache"))
+    cache.load(xml_file).close()
+    stat = os.stat(xml_file)
+    os.utime(xml_file, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+    cached = cache.lookup(xml_file)
+    assert cached is not None
+    assert cached.mtime_ns == stat.st_mtime_ns + 10 ** 9
+    cached.close()
+
+
+def test_evict_to_size(tmp_path):
+    cache = ParseCache(str(tmp_path / "cache"))
+    for name in ("a", "b"):
+        (tmp_path / name).mkdir()
+        cache.load(write_types(tmp_path / name)).close()
+    assert len(cache.entries()) == 2
+    assert cache.evict(max_bytes=0) == 2
+    assert cache.entries() == []
+
+
+def test_disabled_cache_parses(tmp_path, monkeypatch):
+    monkeypatch.setenv("TYPESTOOL_CACHE_DIR", "")
+    with load_cached_types(write_types(tmp_path)) as types:
+        assert types.names == ["AKM", "Apple"]
+    assert not (tmp_path / "cache").exists()
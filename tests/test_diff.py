@@ -0,0 +1,98 @@
+import xml.etree.ElementTree as ET
+
+import pytest
+
+from typestool.cache import load_cached_types
+from typestool.diff import apply_patch_file, apply_patch_to_registry, diff_types_files, load_patch, save_patch
+from typestool.registry import TypeRegistry
+from typestool.storage import FSYNC_NEVER
+
+OLD = """<types>
+    <type name="AKM">
+        <nominal>10</nominal>
+        <lifetime>100</lifetime>
+        <flags count_in_map="1" crafted="0"/>
+        <usage name="Military"/>
+    </type>
+    <type name="Apple">
+        <nominal>3</nominal>
+    </type>
+</types>
+"""
+
+NEW = """<types>
+    <type name="AKM">
+        <nominal>8</nominal>
+        <lifetime>100</lifetime>
+        <flags count_in_map="1"/>
+        <usage name="Military"/>
+        <usage name="Hunting"/>
+    </type>
+    <type name="Pear">
+        <nominal>2</nominal>
+    </type>
+</types>
+"""
+
+
+@pytest.fixture(autouse=True)
+def no_cache(monkeypatch):
+    monkeypatch.setenv("TYPESTOOL_CACHE_DIR", "")
+
+
+def write_types(tmp_path, name, source):
+    xml_file = tmp_path / name
+    xml_file.write_text(source, encoding='utf-8')
+    return str(xml_file)
+
+
+def records(xml_file):
+    with load_cached_types(xml_file) as types:
+        return list(types)
+
+
+def test_diff_lists_added_removed_and_changed(tmp_path):
+    diff = diff_types_files(write_types(tmp_path, "old.xml", OLD), write_types(tmp_path, "new.xml", NEW))
+    assert [record["name"] for record in diff.added] == ["Pear"]
+    assert diff.removed == ["Apple"]
+    assert diff.changed == {"AKM": {
+        "nominal": ("10", "8"),
+        "flags": {"crafted": ("0", None)},
+        "usage": (["Military"], ["Military", "Hunting"]),
+    }}
+    assert list(diff.summary_lines()) == [
+        "+ Pear",
+        "- Apple",
+        "~ AKM: nominal 10 -> 8; flags.crafted 0 -> None; usage [Military] -> [Military, Hunting]",
+    ]
+
+
+def test_identical_files_have_no_diff(tmp_path):
+    assert not diff_types_files(write_types(tmp_path, "old.xml", OLD), write_types(tmp_path, "copy.xml", OLD))
+
+
+def test_patch_file_round_trip(tmp_path):
+    old_file = write_types(tmp_path, "old.xml", OLD)
+    new_file = write_types(tmp_path, "new.xml", NEW)
+    patch_file = save_patch(str(tmp_path / "changes.json"), diff_types_files(old_file, new_file).to_patch(), FSYNC_NEVER)
+    patched_file = str(tmp_path / "patched.xml")
+    apply_patch_file(old_file, load_patch(patch_file), patched_file, FSYNC_NEVER)
+    assert records(patched_file) == records(new_file)
+
+
+def test_patch_to_registry(tmp_path):
+    patch = diff_types_files(write_types(tmp_path, "old.xml", OLD), write_types(tmp_path, "new.xml", NEW)).to_patch()
+    registry = TypeRegistry(ET.fromstring(OLD))
+    assert sorted(apply_patch_to_registry(registry, patch)) == ["AKM", "Apple", "Pear"]
+    assert sorted(registry.names()) == ["AKM", "Pear"]
+    akm = registry.get("AKM")
+    assert akm.find('nominal').text == "8"
+    assert akm.find('flags').attrib == {"count_in_map": "1"}
+    assert [usage.get('name') for usage in akm.findall('usage')] == ["Military", "Hunting"]
+
+
+def test_load_patch_rejects_other_json(tmp_path):
+    patch_file = tmp_path / "other.json"
+    patch_file.write_text('{"format": "something-else"}', encoding='utf-8')
+    with pytest.raises(ValueError):
+        load_patch(str(patch_file))
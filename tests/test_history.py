@@ -0,0 +1,63 @@
+import xml.etree.ElementTree as ET
+
+from typestool.history import EditHistory
+from typestool.model import update_type_element
+
+
+def new_type(name="AKM"):
+    return ET.fromstring(f"""<type name="{name}">
+        <nominal>10</nominal>
+        <flags count_in_map="1"/>
+        <usage name="Military"/>
+    </type>""")
+
+
+def test_undo_and_redo_restore_the_element():
+    history = EditHistory()
+    type_elem = new_type()
+    before = ET.tostring(type_elem)
+    assert history.apply("edit", [type_elem], lambda: update_type_element(type_elem, {"nominal": "12"}, None, None, ["Military", "Hunting"])) == ["AKM"]
+    after = ET.tostring(type_elem)
+    assert history.undo().label == "edit"
+    assert ET.tostring(type_elem) == before
+    history.redo()
+    assert ET.tostring(type_elem) == after
+    assert not history.can_redo()
+
+
+def test_edit_that_changes_nothing_is_not_recorded():
+    history = EditHistory()
+    type_elem = new_type()
+    assert history.apply("edit", [type_elem], lambda: update_type_element(type_elem, {"nominal": "10"})) == []
+    assert not history.can_undo()
+
+
+def test_new_edit_drops_redo():
+    history = EditHistory()
+    type_elem = new_type()
+    history.apply("first", [type_elem], lambda: update_type_element(type_elem, {"nominal": "1"}))
+    history.undo()
+    history.apply("second", [type_elem], lambda: update_type_element(type_elem, {"nominal": "2"}))
+    assert not history.can_redo()
+    assert type_elem.find('nominal').text == "2"
+
+
+def test_limit_drops_the_oldest_steps():
+    history = EditHistory(limit=2)
+    type_elem = new_type()
+    for nominal in ("1", "2", "3"):
+        history.apply(nominal, [type_elem], lambda: update_type_element(type_elem, {"nominal": nominal}))
+    assert [step.label for step in history.undo_steps] == ["2", "3"]
+    history.undo()
+    history.undo()
+    assert history.undo() is None
+    assert type_elem.find('nominal').text == "1"
+
+
+def test_forget_drops_steps_of_replaced_elements():
+    history = EditHistory()
+    akm, apple = new_type(), new_type("Apple")
+    history.apply("akm", [akm], lambda: update_type_element(akm, {"nominal": "1"}))
+    history.apply("apple", [apple], lambda: update_type_element(apple, {"nominal": "2"}))
+    history.forget([akm])
+    assert [step.names() for step in history.undo_steps] == [["Apple"]]
@@ -0,0 +1,96 @@
+import xml.etree.ElementTree as ET
+
+from typestool.loader import TypesLoader
+from typestool.model import update_type_element
+from typestool.spans import TypeSpans, save_tree, scan_type_spans
+from typestool.storage import FSYNC_NEVER
+
+SOURCE = """<?xml version="1.0" encoding="UTF-8" standalone="yes" ?>
+<!-- header -->
+<types>
+    <!-- ===== Weapons ===== -->
+    <type name="AKM">
+        <nominal>10</nominal>
+        <!-- keep it rare -->
+        <lifetime>100</lifetime>
+        <restock>0</restock>
+        <min>5</min>
+        <flags count_in_map="1"/>
+        <category name="weapons"/>
+        <usage name="Military"/>
+        <value name="Tier4"/>
+    </type>
+    <!-- <type name="Fake"><nominal>1</nominal></type> -->
+    <type name='Single'/>
+
+	<!-- ===== Food ===== -->
+    <type name="Apple">
+        <nominal>3</nominal>
+    </type>
+</types>
+"""
+
+
+def load(tmp_path, source=SOURCE):
+    xml_file = tmp_path / "types.xml"
+    xml_file.write_text(source, encoding='utf-8')
+    loader = TypesLoader(str(xml_file))
+    loader.load()
+    spans = TypeSpans(str(xml_file))
+    assert spans.scan(loader.root_element)
+    return loader, spans, xml_file
+
+
+def save(loader, spans, changed):
+    assert save_tree(loader.tree, loader.xml_file, spans, changed, FSYNC_NEVER) is spans
+    assert spans.usable
+
+
+def test_scan_skips_comments():
+    data = SOURCE.encode('utf-8')
+    assert [span[0] for span in scan_type_spans(data)] == ["AKM", "Single", "Apple"]
+
+
+def test_unchanged_save_is_byte_identical(tmp_path):
+    loader, spans, xml_file = load(tmp_path)
+    save(loader, spans, ())
+    assert xml_file.read_text(encoding='utf-8') == SOURCE
+
+
+def test_edited_type_keeps_its_untouched_lines(tmp_path):
+    loader, spans, xml_file = load(tmp_path)
+    update_type_element(loader.registry.get("AKM"), {"nominal": "12"}, None, None, ["Military", "Hunting"])
+    save(loader, spans, {"AKM"})
+    before = SOURCE.splitlines()
+    after = xml_file.read_text(encoding='utf-8').splitlines()
+    assert after[after.index('        <usage name="Military"/>') + 1] == '        <usage name="Hunting"/>'
+    assert '        <nominal>12</nominal>' in after
+    # Every other line, the comment inside AKM included, is unchanged.
+    assert [line for line in after if line not in ('        <nominal>12</nominal>', '        <usage name="Hunting"/>')] == [line for line in before if line != '        <nominal>10</nominal>']
+
+
+def test_added_and_removed_types(tmp_path):
+    loader, spans, xml_file = load(tmp_path)
+    loader.registry.remove("Single")
+    new = ET.fromstring('<type name="New"><nominal>2</nominal><flags count_in_map="1"/></type>')
+    loader.registry.add(new)
+    save(loader, spans, {"Single", "New"})
+    text = xml_file.read_text(encoding='utf-8')
+    assert "Single" not in text
+    assert '<type name="New"><nominal>2</nominal><flags count_in_map="1"/></type>' in text
+    assert "<!-- <type name=\"Fake\">" in text and "<!-- ===== Food ===== -->" in text
+    # The spans kept after the save match a fresh scan.
+    fresh = TypeSpans(str(xml_file))
+    fresh.scan(loader.root_element)
+    assert fresh.spans == spans.spans
+
+
+def test_file_changed_elsewhere_is_not_copied(tmp_path):
+    loader, spans, xml_file = load(tmp_path)
+    spans.trust(spans.state)
+    loader.registry.remove("Apple")
+    xml_file.write_text(SOURCE.replace("<nominal>10</nominal>", "<nominal>999</nominal>").replace("<!-- header -->", "<!-- edited -->"), encoding='utf-8')
+    save(loader, spans, {"Apple"})
+    text = xml_file.read_text(encoding='utf-8')
+    assert "<!-- edited -->" in text
+    assert "<nominal>10</nominal>" in text and "Apple" not in text
@@ -0,0 +1,46 @@
+import xml.etree.ElementTree as ET
+
+from typestool.model import pack_record, record_from_element
+from typestool.validate import TypesValidator
+
+TYPE = """<type name="AKM">
+    <nominal>{nominal}</nominal>
+    <lifetime>100</lifetime>
+    <restock>0</restock>
+    <min>5</min>
+    <quantmin>-1</quantmin>
+    <quantmax>-1</quantmax>
+    <cost>100</cost>
+    <flags count_in_map="1"/>
+    <category name="weapons"/>
+</type>"""
+
+
+def issues_both_ways(type_xml):
+    type_elem = ET.fromstring(type_xml)
+    by_element = TypesValidator().validate_elements([type_elem]).get("AKM")
+    by_packed = TypesValidator().validate_packed([pack_record(record_from_element(type_elem))]).get("AKM")
+    return by_element, by_packed
+
+
+def test_empty_field_is_missing_on_both_paths():
+    by_element, by_packed = issues_both_ways(TYPE.format(nominal=""))
+    assert by_element == by_packed
+    assert [code for code, field, _ in by_element] == ["missing-field"]
+    assert by_element[0][1] == "nominal"
+
+
+def test_blank_field_is_missing_too():
+    by_element, by_packed = issues_both_ways(TYPE.format(nominal="  "))
+    assert by_element == by_packed
+    assert by_element[0][:2] == ("missing-field", "nominal")
+
+
+def test_text_field_is_not_numeric():
+    by_element, by_packed = issues_both_ways(TYPE.format(nominal="abc"))
+    assert by_element == by_packed
+    assert by_element[0][:2] == ("not-numeric", "nominal")
+
+
+def test_clean_type_has_no_issues():
+    assert issues_both_ways(TYPE.format(nominal="10")) == ([], [])
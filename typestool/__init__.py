@@ -0,0 +1,56 @@
+# Public API, resolved lazily so importing the package (and starting the
+# CLI) does not pull in every submodule.
+_EXPORTS = {
+    "TypeRegistry": "typestool.registry",
+    "SearchIndex": "typestool.search",
+    "FilteredNameList": "typestool.namelist",
+    "TypesLoader": "typestool.loader",
+    "load_types": "typestool.loader",
+    "iter_type_names": "typestool.loader",
+    "iter_type_records": "typestool.loader",
+    "write_tree": "typestool.storage",
+    "TypeSpans": "typestool.spans",
+    "save_tree": "typestool.spans",
+    "ParseCache": "typestool.cache",
+    "load_cached_types": "typestool.cache",
+    "generate_types_xml": "typestool.generate",
+    "select_type_names": "typestool.bulk",
+    "apply_bulk_edit": "typestool.bulk",
+    "TypeColumns": "typestool.bulk",
+    "plan_rule_edit": "typestool.bulk",
+    "apply_rule_plan": "typestool.bulk",
+    "write_trader_json": "typestool.trader",
+    "write_split_trader_json": "typestool.trader",
+    "load_json_file": "typestool.trader",
+    "save_json_file": "typestool.trader",
+    "update_trader_items": "typestool.trader",
+    "TraderDocument": "typestool.trader",
+    "read_type_names": "typestool.names",
+    "iter_names_file": "typestool.names",
+    "read_new_type_names": "typestool.names",
+    "atomic_open": "typestool.storage",
+    "CommitQueue": "typestool.autosave",
+    "EditHistory": "typestool.history",
+    "TypesWatcher": "typestool.watch",
+    "PresetLibrary": "typestool.presets",
+    "generate_preset_types_xml": "typestool.presets",
+    "load_manifest": "typestool.batch",
+    "run_batch": "typestool.batch",
+    "MergePolicy": "typestool.merge",
+    "merge_types_files": "typestool.merge",
+    "TypesValidator": "typestool.validate",
+    "EconomyAggregates": "typestool.aggregate",
+    "validate_types_file": "typestool.validate",
+    "diff_types_files": "typestool.diff",
+    "apply_patch_file": "typestool.diff",
+}
+
+__all__ = sorted(_EXPORTS)
+
+
+def __getattr__(name):
+    module_name = _EXPORTS.get(name)
+    if module_name is None:
+        raise AttributeError(f"module 'typestool' has no attribute {name!r}")
+    from importlib import import_module
+    return getattr(import_module(module_name), name)
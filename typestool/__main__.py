@@ -0,0 +1,5 @@
+import sys
+
+from typestool.cli import main
+
+sys.exit(main())
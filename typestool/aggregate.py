@@ -0,0 +1,150 @@
+from itertools import product
+
+from typestool.model import TAGS
+
+# Economy totals of a loaded types.xml: per group the number of types and
+# the sums of their nominal, min and cost. Built in one pass at load, then
+# update(registry, names) after edits subtracts what the touched types added
+# before and adds what they add now, so the totals never need a rescan.
+# There is no NumPy backend like bulk.py's: reading the rows from the
+# elements is most of the build, and the group sums it could vectorize run
+# over a few thousand distinct tag sets, not one row per type.
+
+METRICS = ("nominal", "min", "cost")
+# Label: the tags a type is grouped by. A type with several usages or tiers
+# counts once in each of their groups.
+GROUPINGS = {
+    "category": ("category",),
+    "usage": ("usage",),
+    "tier": ("value",),
+    "category and tier": ("category", "value"),
+    "usage and tier": ("usage", "value"),
+}
+NO_TAG = "(none)"
+_METRIC_INDEX = {metric: index for index, metric in enumerate(METRICS)}
+_TAG_INDEX = {tag: index for index, tag in enumerate(TAGS)}
+
+
+def _number(text):
+    # Values the validator reports as broken, and -1 for "unset", add nothing.
+    try:
+        number = int(text)
+    except (TypeError, ValueError):
+        return 0
+    return number if number > 0 else 0
+
+
+def _layout(shape):
+    metric_positions = [None] * len(METRICS)
+    tag_positions = tuple([] for _ in TAGS)
+    for position, tag in enumerate(shape):
+        index = _METRIC_INDEX.get(tag)
+        if index is not None:
+            if metric_positions[index] is None:
+                metric_positions[index] = position
+            continue
+        index = _TAG_INDEX.get(tag)
+        if index is not None:
+            tag_positions[index].append(position)
+    return metric_positions, tag_positions
+
+
+def element_row(type_elem, layouts=None):
+    # (metric values, (categories, usages, values)) of a type, first
+    # occurrence of each field like record_from_element. Types share a few
+    # child layouts, pass a dict to work each out only once.
+    children = type_elem[:]
+    shape = tuple([child.tag for child in children])
+    layout = layouts.get(shape) if layouts is not None else None
+    if layout is None:
+        layout = _layout(shape)
+        if layouts is not None:
+            layouts[shape] = layout
+    metric_positions, tag_positions = layout
+    metrics = tuple([_number(children[i].text) if i is not None else 0 for i in metric_positions])
+    tags = []
+    for positions in tag_positions:
+        if not positions:
+            tags.append(())
+            continue
+        names = [children[i].get('name') for i in positions]
+        if len(names) > 1 or not names[0]:
+            # Repeated or nameless tags would count a type twice or nowhere.
+            names = [name for name in dict.fromkeys(names) if name]
+        tags.append(tuple(names))
+    return metrics, tuple(tags)
+
+
+class EconomyAggregates:
+    def __init__(self):
+        self.version = 0
+        self.clear()
+
+    def clear(self):
+        # name -> the row its totals were built from.
+        self.rows = {}
+        # grouping -> {group key: [types, nominal, min, cost]}
+        self.groups = {grouping: {} for grouping in GROUPINGS}
+        self.total = [0] * (len(METRICS) + 1)
+
+    def _apply(self, row, sign):
+        metrics, tags = row
+        self._add(tags, (sign,) + tuple(sign * value for value in metrics))
+
+    def _add(self, tags, delta):
+        total = self.total
+        for i, value in enumerate(delta):
+            total[i] += value
+        for grouping, dimensions in GROUPINGS.items():
+            groups = self.groups[grouping]
+            for key in product(*[tags[_TAG_INDEX[tag]] or (NO_TAG,) for tag in dimensions]):
+                sums = groups.get(key)
+                if sums is None:
+                    sums = groups[key] = [0] * len(delta)
+                for i, value in enumerate(delta):
+                    sums[i] += value
+                if not sums[0]:
+                    del groups[key]
+
+    def build_elements(self, type_elems):
+        # The first definition of a name counts, like TypeRegistry.
+        # Types are summed per distinct set of tags first, a few thousand in
+        # a large file, and only those sums are spread over the groups.
+        self.clear()
+        rows = self.rows
+        layouts = {}
+        by_tags = {}
+        for type_elem in type_elems:
+            name = type_elem.get('name')
+            if name is None or name in rows:
+                continue
+            metrics, tags = rows[name] = element_row(type_elem, layouts)
+            sums = by_tags.get(tags)
+            if sums is None:
+                sums = by_tags[tags] = [0] * (len(METRICS) + 1)
+            sums[0] += 1
+            for i, value in enumerate(metrics, 1):
+                sums[i] += value
+        for tags, sums in by_tags.items():
+            self._add(tags, sums)
+        self.version += 1
+        return self
+
+    def update(self, registry, names):
+        for name in names:
+            old = self.rows.pop(name, None)
+            if old is not None:
+                self._apply(old, -1)
+            type_elem = registry.get(name)
+            if type_elem is not None:
+                row = self.rows[name] = element_row(type_elem)
+                self._apply(row, 1)
+        self.version += 1
+        return self
+
+    def table(self, grouping, sort_by="nominal"):
+        # [(group key, types, nominal, min, cost)], largest first.
+        column = 0 if sort_by == "types" else _METRIC_INDEX[sort_by] + 1
+        rows = [(key,) + tuple(sums) for key, sums in self.groups[grouping].items()]
+        rows.sort(key=lambda row: (-row[column + 1], row[0]))
+        return rows
@@ -0,0 +1,178 @@
+import threading
+from collections import deque
+
+from typestool import instrument
+from typestool.jobs import watch_job
+from typestool.spans import save_tree
+from typestool.storage import FSYNC_FILE, file_state
+
+AUTOSAVE_INTERVAL_MS = 2000
+EDIT_RETRY_MS = 20
+
+STATE_SAVED = "saved"
+STATE_PENDING = "pending"
+STATE_SAVING = "saving"
+
+
+def _write_document(job, tree, xml_file, fsync, lock, operation, spans=None, changed=()):
+    with operation.phase("serialize"):
+        save_tree(tree, xml_file, spans, changed, fsync, lock)
+    # Taken right after the write, so a watcher can tell this save from a
+    # later change made by someone else.
+    return file_state(xml_file)
+
+
+class CommitQueue:
+    # Collects edits to the loaded document and writes them out together, at
+    # most once per interval or when flushed. The writer serializes the tree
+    # while holding the lock, edits that arrive meanwhile are queued and
+    # applied as soon as it is released instead of blocking the UI.
+    # can_write may hold a save back (it is retried on the next flush) and
+    # on_saved gets the written names and the file state after each save.
+    # With the TypeSpans of the file attached, saves keep its formatting and
+    # only serialize the types that changed.
+    def __init__(self, widget, runner, interval=AUTOSAVE_INTERVAL_MS, fsync=FSYNC_FILE, on_state=None, on_error=None, on_edit=None, can_write=None, on_saved=None):
+        self.widget = widget
+        self.runner = runner
+        self.interval = interval
+        self.fsync = fsync
+        self.on_state = on_state
+        self.on_error = on_error
+        self.on_edit = on_edit
+        self.can_write = can_write
+        self.on_saved = on_saved
+        self.lock = threading.Lock()
+        self.tree = None
+        self.xml_file = None
+        self.spans = None
+        self.dirty = set()
+        self.write_job = None
+        self._writing = set()
+        self._pending_edits = deque()
+        self._write_operation = instrument.NULL_OPERATION
+        self._timer = None
+        self._flush_requested = False
+
+    @property
+    def state(self):
+        if self.write_job is not None:
+            return STATE_SAVING
+        if self.dirty or self._pending_edits:
+            return STATE_PENDING
+        return STATE_SAVED
+
+    @property
+    def idle(self):
+        # No save running and no edit waiting for the lock, so dirty names
+        # are exactly the unsaved ones.
+        return self.write_job is None and not self._pending_edits
+
+    def _notify(self):
+        if self.on_state is not None:
+            self.on_state(self.state, len(self.dirty) + len(self._writing))
+
+    def attach(self, tree, xml_file, spans=None):
+        # Anything still pending belongs to the previous document.
+        self.close()
+        self.tree = tree
+        self.xml_file = xml_file
+        self.spans = spans
+        self._notify()
+
+    def edit(self, fn):
+        # fn mutates the tree and returns the names of the types it touched.
+        self._pending_edits.append(fn)
+        self._apply_edits()
+
+    def _apply_edits(self, block=False):
+        while self._pending_edits:
+            if not self.lock.acquire(blocking=block):
+                self._notify()
+                self.widget.after(EDIT_RETRY_MS, self._apply_edits)
+                return
+            try:
+                touched = self._pending_edits.popleft()()
+            finally:
+                self.lock.release()
+            self.mark_dirty(touched or ())
+            if self.on_edit is not None and touched:
+                self.on_edit(touched)
+
+    def mark_dirty(self, type_names):
+        self.dirty.update(type_names)
+        if self._timer is None and self.write_job is None:
+            self._timer = self.widget.after(self.interval, self._on_timer)
+        self._notify()
+
+    def _on_timer(self):
+        self._timer = None
+        self.flush()
+
+    def flush(self):
+        if self._timer is not None:
+            self.widget.after_cancel(self._timer)
+            self._timer = None
+        if self.write_job is not None:
+            self._flush_requested = True
+            return
+        if not self.dirty or self.tree is None:
+            self._notify()
+            return
+        if self.can_write is not None and not self.can_write():
+            self._notify()
+            return
+        self._writing = self.dirty
+        self.dirty = set()
+        operation = self._write_operation = instrument.start("autosave", types=len(self._writing))
+        job = self.runner.submit("autosave", _write_document, self.tree, self.xml_file, self.fsync, self.lock, operation, self.spans, self._writing)
+        self.write_job = job
+        watch_job(self.widget, job, on_done=lambda state: self._on_written(job, state), on_error=lambda error: self._on_write_failed(job, error))
+        self._notify()
+
+    def _on_written(self, job, state):
+        if job is self.write_job:
+            if self.on_saved is not None:
+                self.on_saved(self._writing, state)
+            self._finish_write()
+
+    def _on_write_failed(self, job, error):
+        if job is not self.write_job:
+            return
+        self.dirty |= self._writing
+        self._finish_write()
+        if self.on_error is not None:
+            self.on_error(error)
+
+    def _finish_write(self):
+        self._write_operation.finish()
+        self._write_operation = instrument.NULL_OPERATION
+        self.write_job = None
+        self._writing = set()
+        if self._flush_requested:
+            self._flush_requested = False
+            self.flush()
+        elif self.dirty:
+            self._timer = self.widget.after(self.interval, self._on_timer)
+        self._notify()
+
+    def close(self, save=True):
+        # Blocking final flush used when the application exits, save=False
+        # drops whatever was not written yet.
+        self._apply_edits(block=True)
+        if self._timer is not None:
+            self.widget.after_cancel(self._timer)
+            self._timer = None
+        if self.write_job is not None:
+            if self.write_job.future.exception() is None:
+                self._writing = set()
+            self.write_job = None
+            self._write_operation = instrument.NULL_OPERATION
+        self._flush_requested = False
+        self.dirty |= self._writing
+        self._writing = set()
+        if self.dirty and self.tree is not None and save:
+            save_tree(self.tree, self.xml_file, self.spans, self.dirty, self.fsync, self.lock)
+            if self.on_saved is not None:
+                self.on_saved(self.dirty, file_state(self.xml_file))
+        self.dirty = set()
+        self._notify()
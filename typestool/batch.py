@@ -0,0 +1,276 @@
+import json
+import multiprocessing
+import os
+import time
+import traceback
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+
+# Batch generation from a manifest: many types.xml and trader outputs, e.g.
+# one set per map or mod pack, built in parallel worker processes.
+#
+#   {"format": "typestool-batch", "version": 1,
+#    "defaults": {"presets": "presets.json"},
+#    "jobs": [{"name": "chernarus-types", "kind": "types", "names": "chernarus.txt",
+#              "output": "chernarus/types.xml", "append": true},
+#             {"name": "chernarus-trader", "kind": "trader", "types": "chernarus/types.xml",
+#              "output": "chernarus/trader.json", "display_name": "Chernarus"}]}
+#
+# Relative paths are relative to the manifest. "defaults" is merged into
+# every job. A job reading a file another job writes runs after it and is
+# skipped if that job fails; everything else runs at once, one job per
+# process, and a failing job never stops the others.
+
+BATCH_FORMAT = "typestool-batch"
+BATCH_VERSION = 1
+KINDS = ("types", "trader")
+PATH_KEYS = ("names", "output", "presets", "types")
+POLL_SECONDS = 0.2
+
+PENDING = "pending"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+SKIPPED = "skipped"
+CANCELLED = "cancelled"
+
+
+class BatchJob:
+    def __init__(self, name, kind, spec):
+        self.name = name
+        self.kind = kind
+        self.spec = spec
+        # Names of the jobs writing a file this one reads.
+        self.after = []
+        self.state = PENDING
+        self.started = None
+        self.seconds = None
+        self.result = None
+        self.error = None
+        self.traceback = None
+
+    def inputs(self):
+        key = "names" if self.kind == "types" else "types"
+        paths = [self.spec[key]]
+        if self.kind == "types" and self.spec.get("append"):
+            paths.append(self.spec["output"])
+        return paths
+
+    def summary(self):
+        text = f"{self.name}: {self.state}"
+        if self.seconds is not None:
+            text += f" in {self.seconds:.1f}s"
+        if self.result:
+            text += f", {self.result}"
+        if self.error:
+            text += f" ({self.error})"
+        return text
+
+
+def check_job(name, spec):
+    kind = spec.get("kind")
+    if kind not in KINDS:
+        raise ValueError(f"Job '{name}': kind must be one of {', '.join(KINDS)}, not {kind!r}.")
+    required = ("names", "output") if kind == "types" else ("types", "output")
+    missing = [key for key in required if not spec.get(key)]
+    if missing:
+        raise ValueError(f"Job '{name}' is missing {', '.join(missing)}.")
+    if kind == "types" and not spec.get("presets"):
+        from typestool.presets import check_preset
+
+        check_preset(name, job_preset(spec))
+
+
+def job_preset(spec):
+    from typestool.presets import new_preset
+
+    return new_preset(spec.get("fields"), spec.get("flags"), spec.get("category", ()), spec.get("usage", ()), spec.get("value", ()))
+
+
+def parse_manifest(data, base_dir="."):
+    if data.get("format") != BATCH_FORMAT or data.get("version") != BATCH_VERSION:
+        raise ValueError(f"Not a {BATCH_FORMAT} version {BATCH_VERSION} file.")
+    defaults = data.get("defaults", {})
+    jobs = []
+    names = set()
+    writers = {}
+    for number, entry in enumerate(data.get("jobs", []), 1):
+        spec = dict(defaults)
+        spec.update(entry)
+        name = spec.pop("name", None) or f"job {number}"
+        if name in names:
+            raise ValueError(f"Two jobs are named '{name}'.")
+        names.add(name)
+        for key in PATH_KEYS:
+            if spec.get(key):
+                spec[key] = os.path.normpath(os.path.join(base_dir, os.path.expanduser(spec[key])))
+        check_job(name, spec)
+        job = BatchJob(name, spec["kind"], spec)
+        output = spec["output"]
+        if output in writers:
+            raise ValueError(f"Jobs '{writers[output]}' and '{name}' both write {output}.")
+        writers[output] = name
+        jobs.append(job)
+    for job in jobs:
+        job.after = [writers[path] for path in job.inputs() if path in writers and writers[path] != job.name]
+    _check_order(jobs)
+    return jobs
+
+
+def _check_order(jobs):
+    by_name = {job.name: job for job in jobs}
+    done = set()
+    visiting = set()
+
+    def visit(job):
+        if job.name in done:
+            return
+        if job.name in visiting:
+            raise ValueError(f"Job '{job.name}' depends on its own output.")
+        visiting.add(job.name)
+        for name in job.after:
+            visit(by_name[name])
+        visiting.discard(job.name)
+        done.add(job.name)
+
+    for job in jobs:
+        visit(job)
+
+
+def load_manifest(manifest_file):
+    with open(manifest_file, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    return parse_manifest(data, os.path.dirname(os.path.abspath(manifest_file)))
+
+
+def run_job(kind, spec):
+    # Runs in a worker process; returns a one line result.
+    if kind == "types":
+        return _run_types_job(spec)
+    return _run_trader_job(spec)
+
+
+def _run_types_job(spec):
+    from typestool.generate import generate_types_xml
+    from typestool.names import read_new_type_names
+
+    append = bool(spec.get("append"))
+    output = spec["output"]
+    stats = {}
+    type_names = read_new_type_names(spec["names"], output if append else None, stats)
+    if not append:
+        os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    if spec.get("presets"):
+        from typestool.presets import check_preset, generate_preset_types_xml, load_presets
+
+        preset = job_preset(spec)
+        try:
+            fallback = check_preset("fallback", preset)
+        except ValueError:
+            fallback = None
+        written, counts, skipped = generate_preset_types_xml(type_names, output, load_presets(spec["presets"]), fallback, append=append)
+        result = f"{written} types, " + ", ".join(f"{count} {name or 'job values'}" for name, count in counts.most_common())
+        if skipped:
+            result += f", {len(skipped)} unmatched"
+    else:
+        preset = job_preset(spec)
+        written = generate_types_xml(type_names, output, preset["fields"], preset["flags"], preset["category"], preset["usage"], preset["value"], append=append)
+        result = f"{written} types"
+    if stats["duplicate"] or stats["existing"]:
+        result += f" ({stats['duplicate']} duplicate, {stats['existing']} existing names skipped)"
+    return result
+
+
+def _run_trader_job(spec):
+    from typestool.trader import write_split_trader_json, write_trader_json
+
+    icon = spec.get("icon", "Deliver")
+    color = spec.get("color", "FBFCFEFF")
+    percent = int(spec.get("init_stock_percent", 75))
+    if spec.get("split"):
+        files = write_split_trader_json(spec["types"], spec["output"], spec["split"], spec.get("display_name", "{group}"), icon, color, percent)
+        return f"{len(files)} trader files"
+    os.makedirs(os.path.dirname(spec["output"]) or ".", exist_ok=True)
+    write_trader_json(spec["types"], spec["output"], spec.get("display_name", "My Category Title !"), icon, color, percent)
+    return "trader JSON"
+
+
+def _job_error(error):
+    if isinstance(error, BrokenProcessPool):
+        return "worker process died"
+    return f"{type(error).__name__}: {error}"
+
+
+def run_batch(jobs, workers=None, on_status=None, cancel=None):
+    # Runs the jobs in a process pool, each as soon as the jobs it reads from
+    # are done. on_status(job) is called on every state change, from this
+    # thread. cancel, a typestool.jobs.Job, stops jobs that have not started;
+    # running ones finish. Returns the jobs.
+    workers = max(1, min(workers or os.cpu_count() or 1, len(jobs) or 1))
+    by_name = {job.name: job for job in jobs}
+    waiting = list(jobs)
+    running = {}
+    # Spawned rather than forked: the caller may be a threaded GUI.
+    context = multiprocessing.get_context("spawn")
+    executor = ProcessPoolExecutor(max_workers=workers, mp_context=context)
+
+    def report(job, state, error=None):
+        job.state = state
+        if error is not None:
+            job.error = error
+        if on_status is not None:
+            on_status(job)
+
+    try:
+        while waiting or running:
+            if cancel is not None and cancel.cancelled:
+                for job in waiting:
+                    report(job, CANCELLED)
+                waiting = []
+            for job in list(waiting):
+                states = [by_name[name].state for name in job.after]
+                if any(state in (FAILED, SKIPPED, CANCELLED) for state in states):
+                    waiting.remove(job)
+                    report(job, SKIPPED, f"needs {', '.join(name for name in job.after if by_name[name].state != DONE)}")
+                # Only as many jobs as workers are submitted: queued in the
+                # pool is not running yet, and a crashed worker would fail
+                # the queued jobs too.
+                elif all(state == DONE for state in states) and len(running) < workers:
+                    waiting.remove(job)
+                    job.started = time.perf_counter()
+                    running[executor.submit(run_job, job.kind, job.spec)] = job
+                    report(job, RUNNING)
+            if not running:
+                continue
+            finished, _ = wait(running, timeout=POLL_SECONDS, return_when=FIRST_COMPLETED)
+            broken = False
+            for future in finished:
+                job = running.pop(future)
+                job.seconds = time.perf_counter() - job.started
+                error = future.exception()
+                if error is None:
+                    job.result = future.result()
+                    report(job, DONE)
+                else:
+                    broken = broken or isinstance(error, BrokenProcessPool)
+                    job.traceback = "".join(traceback.format_exception(error))
+                    report(job, FAILED, _job_error(error))
+            if broken:
+                # A crashed worker takes the pool down with it; the jobs it
+                # failed are reported, the rest go on in a new pool.
+                for future, job in list(running.items()):
+                    job.seconds = time.perf_counter() - job.started
+                    report(job, FAILED, "worker process died")
+                running = {}
+                executor.shutdown(wait=False, cancel_futures=True)
+                executor = ProcessPoolExecutor(max_workers=workers, mp_context=context)
+    finally:
+        executor.shutdown(wait=True, cancel_futures=True)
+    return jobs
+
+
+def batch_summary(jobs):
+    counts = {}
+    for job in jobs:
+        counts[job.state] = counts.get(job.state, 0) + 1
+    return ", ".join(f"{count} {state}" for state, count in counts.items())
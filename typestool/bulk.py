@@ -0,0 +1,459 @@
+import ast
+import math
+import operator
+import re
+from fnmatch import translate
+
+from typestool.model import FIELDS, FLAGS, TAGS, insert_type_child, record_from_element, update_type_element
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+def select_type_names(type_names, names=None, pattern=None):
+    selected = []
+    if names:
+        wanted = set(names)
+        selected = [type_name for type_name in type_names if type_name in wanted]
+    if pattern:
+        matcher = re.compile(translate(pattern))
+        taken = set(selected)
+        selected += [type_name for type_name in type_names if type_name not in taken and matcher.match(type_name)]
+    return selected
+
+
+def apply_bulk_edit(registry, type_names, fields=None, flags=None, categories=None, usages=None, values=None):
+    edited = []
+    for type_name in type_names:
+        type_elem = registry.get(type_name)
+        if type_elem is not None:
+            update_type_element(type_elem, fields, flags, categories, usages, values)
+            edited.append(type_name)
+    return edited
+
+
+# Rule edits: a selection predicate plus per-field update expressions that
+# are evaluated over whole columns at once, with NumPy when it is installed.
+#
+#   where:  "Military" in usage and value == "Tier4" and nominal > 0
+#   set:    nominal *= 0.7, min = ceil(nominal / 2), usage += "Hunting"
+#
+# Tag names compare by membership, so `usage == "Military"` means the type
+# has that usage. Assignments run in order and see earlier results. Numeric
+# results are rounded to whole numbers; fields that are not numbers are left
+# alone.
+
+_ASSIGNMENT = re.compile(r"^\s*([A-Za-z_]\w*)\s*(\+=|-=|\*=|/=|=(?!=))\s*(.+?)\s*$", re.S)
+_COMPARE_OPS = {
+    ast.Eq: operator.eq, ast.NotEq: operator.ne, ast.Lt: operator.lt,
+    ast.LtE: operator.le, ast.Gt: operator.gt, ast.GtE: operator.ge,
+}
+_BIN_OPS = {
+    ast.Add: operator.add, ast.Sub: operator.sub, ast.Mult: operator.mul,
+    ast.Div: operator.truediv, ast.FloorDiv: operator.floordiv, ast.Mod: operator.mod,
+}
+_FUNCTIONS = ("ceil", "floor", "round", "abs", "min", "max", "int", "match")
+
+
+def _to_number(text):
+    try:
+        return float(text)
+    except (TypeError, ValueError):
+        return math.nan
+
+
+def _format_number(number):
+    # None for anything but a finite number: NaN, infinities and text.
+    if not isinstance(number, (int, float)) or not math.isfinite(number):
+        return None
+    return str(int(math.floor(number + 0.5)))
+
+
+def split_assignments(text):
+    # Splits on commas and semicolons that are not inside brackets or quotes.
+    parts, depth, quote, current = [], 0, None, []
+    for char in text:
+        if quote:
+            if char == quote:
+                quote = None
+        elif char in "\"'":
+            quote = char
+        elif char in "([":
+            depth += 1
+        elif char in ")]":
+            depth -= 1
+        elif char in ",;\n" and depth == 0:
+            parts.append("".join(current))
+            current = []
+            continue
+        current.append(char)
+    parts.append("".join(current))
+    return [part.strip() for part in parts if part.strip()]
+
+
+class _PythonColumns:
+    # Plain-list fallback with the same interface as _NumpyColumns.
+    def column(self, values, numeric):
+        return list(values)
+
+    def constant(self, value, size):
+        return [value] * size
+
+    def _map(self, fn, a, b):
+        if isinstance(a, list):
+            if isinstance(b, list):
+                return [fn(x, y) for x, y in zip(a, b)]
+            return [fn(x, b) for x in a]
+        if isinstance(b, list):
+            return [fn(a, y) for y in b]
+        return fn(a, b)
+
+    def binary(self, op, a, b):
+        def safe(x, y):
+            try:
+                return op(x, y)
+            except (ZeroDivisionError, TypeError):
+                return math.nan
+        return self._map(safe, a, b)
+
+    def compare(self, op, a, b):
+        return self._map(op, a, b)
+
+    def logical_and(self, a, b):
+        return self._map(lambda x, y: bool(x) and bool(y), a, b)
+
+    def logical_or(self, a, b):
+        return self._map(lambda x, y: bool(x) or bool(y), a, b)
+
+    def logical_not(self, a):
+        return [not x for x in a] if isinstance(a, list) else not a
+
+    def negate(self, a):
+        return [-x for x in a] if isinstance(a, list) else -a
+
+    def call(self, name, args):
+        def unary(fn):
+            def safe(x):
+                try:
+                    return float(fn(x))
+                except (ValueError, OverflowError):
+                    return math.nan
+            value = args[0]
+            return [safe(x) for x in value] if isinstance(value, list) else safe(value)
+        if name == "ceil":
+            return unary(math.ceil)
+        if name == "floor":
+            return unary(math.floor)
+        if name == "round":
+            return unary(lambda x: math.floor(x + 0.5))
+        if name == "abs":
+            return unary(abs)
+        if name == "int":
+            return unary(math.trunc)
+        pick = min if name == "min" else max
+        result = args[0]
+        for other in args[1:]:
+            result = self._map(lambda x, y: pick(x, y) if x == x and y == y else math.nan, result, other)
+        return result
+
+    def where(self, mask, new, old):
+        if not isinstance(new, list):
+            new = [new] * len(old)
+        return [n if m else o for m, n, o in zip(mask, new, old)]
+
+    def to_list(self, values):
+        return values
+
+
+class _NumpyColumns:
+    def column(self, values, numeric):
+        return np.array(values, dtype=float if numeric else object)
+
+    def constant(self, value, size):
+        return np.full(size, value, dtype=float if isinstance(value, (int, float)) else object)
+
+    def binary(self, op, a, b):
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return op(np.asarray(a, dtype=float), np.asarray(b, dtype=float))
+
+    def compare(self, op, a, b):
+        with np.errstate(invalid='ignore'):
+            return np.asarray(op(a, b), dtype=bool)
+
+    def logical_and(self, a, b):
+        return np.logical_and(a, b)
+
+    def logical_or(self, a, b):
+        return np.logical_or(a, b)
+
+    def logical_not(self, a):
+        return np.logical_not(a)
+
+    def negate(self, a):
+        return -np.asarray(a, dtype=float)
+
+    def call(self, name, args):
+        values = [np.asarray(arg, dtype=float) for arg in args]
+        if name == "ceil":
+            return np.ceil(values[0])
+        if name == "floor":
+            return np.floor(values[0])
+        if name == "round":
+            return np.floor(values[0] + 0.5)
+        if name == "abs":
+            return np.abs(values[0])
+        if name == "int":
+            return np.trunc(values[0])
+        pick = np.minimum if name == "min" else np.maximum
+        result = values[0]
+        for other in values[1:]:
+            result = pick(result, other)
+        return result
+
+    def where(self, mask, new, old):
+        return np.where(mask, new, old)
+
+    def to_list(self, values):
+        return values.tolist()
+
+
+def _backend(use_numpy=None):
+    if use_numpy is None:
+        use_numpy = np is not None
+    if use_numpy and np is None:
+        raise ValueError("NumPy is not installed.")
+    return _NumpyColumns() if use_numpy else _PythonColumns()
+
+
+class TypeColumns:
+    # Column-oriented snapshot of every type, built once per rule edit.
+    def __init__(self, records):
+        self.records = records
+        self.names = [record["name"] for record in records]
+        self.size = len(records)
+        self.text = {field: [record[field] for record in records] for field in FIELDS}
+        for flag in FLAGS:
+            self.text[flag] = [record["flags"].get(flag, "") for record in records]
+        self.tags = {tag: [record[tag] for record in records] for tag in TAGS}
+
+    @classmethod
+    def from_registry(cls, registry):
+        return cls([record_from_element(registry.get(name)) for name in registry.names()])
+
+    def tag_mask(self, tag, name):
+        return [name in tags for tags in self.tags[tag]]
+
+    def name_mask(self, pattern):
+        matcher = re.compile(translate(pattern))
+        return [matcher.match(name) is not None for name in self.names]
+
+
+class _Evaluator:
+    def __init__(self, columns, backend):
+        self.columns = columns
+        self.backend = backend
+        self.values = {}
+
+    def numeric(self, key):
+        if key not in self.values:
+            self.values[key] = self.backend.column([_to_number(text) for text in self.columns.text[key]], True)
+        return self.values[key]
+
+    def evaluate(self, node):
+        backend = self.backend
+        if isinstance(node, ast.Expression):
+            return self.evaluate(node.body)
+        if isinstance(node, ast.BoolOp):
+            combine = backend.logical_and if isinstance(node.op, ast.And) else backend.logical_or
+            result = self.evaluate(node.values[0])
+            for value in node.values[1:]:
+                result = combine(result, self.evaluate(value))
+            return result
+        if isinstance(node, ast.UnaryOp):
+            if isinstance(node.op, ast.Not):
+                return backend.logical_not(self.evaluate(node.operand))
+            if isinstance(node.op, ast.USub):
+                return backend.negate(self.evaluate(node.operand))
+        if isinstance(node, ast.BinOp) and type(node.op) in _BIN_OPS:
+            return backend.binary(_BIN_OPS[type(node.op)], self.evaluate(node.left), self.evaluate(node.right))
+        if isinstance(node, ast.Compare):
+            return self.compare(node)
+        if isinstance(node, ast.Call) and isinstance(node.func, ast.Name) and node.func.id in _FUNCTIONS and not node.keywords:
+            if node.func.id == "match":
+                if len(node.args) != 2 or not self._is_name(node.args[0], "name") or not self._is_string(node.args[1]):
+                    raise ValueError('match() takes the form match(name, "pattern").')
+                return backend.column(self.columns.name_mask(node.args[1].value), False)
+            return backend.call(node.func.id, [self.evaluate(arg) for arg in node.args])
+        if isinstance(node, ast.Constant) and isinstance(node.value, (int, float)) and not isinstance(node.value, bool):
+            return float(node.value)
+        if isinstance(node, ast.Constant) and isinstance(node.value, str):
+            return node.value
+        if isinstance(node, ast.Name):
+            if node.id == "name":
+                return backend.column(self.columns.names, False)
+            if node.id in self.columns.text:
+                return self.numeric(node.id)
+            if node.id in TAGS:
+                raise ValueError(f"Use {node.id} with ==, != or in, e.g. \"Military\" in {node.id}.")
+            raise ValueError(f"Unknown name '{node.id}'.")
+        raise ValueError(f"Unsupported expression: {ast.unparse(node)}")
+
+    def assigned(self, target, node):
+        # Numeric fields only take numbers, never text or the type names.
+        value = self.evaluate(node)
+        if isinstance(value, str) or getattr(value, 'dtype', None) == object or (isinstance(value, list) and any(isinstance(x, str) for x in value)):
+            raise ValueError(f"{target} needs a number, not {ast.unparse(node)}.")
+        return value
+
+    def _is_name(self, node, name=None):
+        return isinstance(node, ast.Name) and (name is None or node.id == name)
+
+    def _is_string(self, node):
+        return isinstance(node, ast.Constant) and isinstance(node.value, str)
+
+    def tag_test(self, left, op, right):
+        # "X" in tag, tag == "X" and their negations.
+        if isinstance(op, (ast.In, ast.NotIn)) and self._is_string(left) and self._is_name(right) and right.id in TAGS:
+            mask = self.backend.column(self.columns.tag_mask(right.id, left.value), False)
+            return mask if isinstance(op, ast.In) else self.backend.logical_not(mask)
+        if isinstance(op, (ast.Eq, ast.NotEq)) and self._is_name(left) and left.id in TAGS and self._is_string(right):
+            mask = self.backend.column(self.columns.tag_mask(left.id, right.value), False)
+            return mask if isinstance(op, ast.Eq) else self.backend.logical_not(mask)
+        return None
+
+    def compare(self, node):
+        result = None
+        left = node.left
+        for op, right in zip(node.ops, node.comparators):
+            value = self.tag_test(left, op, right)
+            if value is None:
+                if type(op) not in _COMPARE_OPS:
+                    raise ValueError(f"Unsupported comparison: {ast.unparse(node)}")
+                try:
+                    value = self.backend.compare(_COMPARE_OPS[type(op)], self.evaluate(left), self.evaluate(right))
+                except TypeError:
+                    raise ValueError(f"Cannot compare {ast.unparse(left)} with {ast.unparse(right)}, one is a number and the other text.")
+            result = value if result is None else self.backend.logical_and(result, value)
+            left = right
+        return result
+
+
+def parse_assignments(text):
+    assignments = []
+    for part in split_assignments(text):
+        found = _ASSIGNMENT.match(part)
+        if found is None:
+            raise ValueError(f"Cannot read assignment '{part}', expected e.g. nominal *= 0.7")
+        target, op, expression = found.groups()
+        if target not in FIELDS and target not in FLAGS and target not in TAGS:
+            raise ValueError(f"Unknown field '{target}'.")
+        if target in TAGS:
+            if op not in ("=", "+=", "-="):
+                raise ValueError(f"{target} only supports =, += and -=.")
+            try:
+                names = ast.literal_eval(expression)
+            except (ValueError, SyntaxError):
+                names = None
+            if isinstance(names, str):
+                names = [names]
+            if not isinstance(names, (list, tuple)) or not all(isinstance(name, str) for name in names):
+                raise ValueError(f"{target} needs a name or a list of names, e.g. {target} += \"Hunting\".")
+            assignments.append((target, op, list(names)))
+        else:
+            assignments.append((target, op, ast.parse(expression, mode='eval')))
+    return assignments
+
+
+class RuleEditPlan:
+    def __init__(self, selected, changes):
+        self.selected = selected
+        self.changes = changes
+
+    def preview_lines(self, limit=None):
+        for count, (name, change) in enumerate(self.changes.items()):
+            if limit is not None and count >= limit:
+                yield f"... and {len(self.changes) - limit} more types"
+                return
+            parts = []
+            for key, (old, new) in change.items():
+                if key in TAGS:
+                    parts.append(f"{key} [{', '.join(old)}] -> [{', '.join(new)}]")
+                else:
+                    parts.append(f"{key} {old} -> {new}")
+            yield f"{name}: {'; '.join(parts)}"
+
+
+def plan_rule_edit(columns, where, assignments, use_numpy=None):
+    backend = _backend(use_numpy)
+    evaluator = _Evaluator(columns, backend)
+    if isinstance(assignments, str):
+        assignments = parse_assignments(assignments)
+    if where and where.strip():
+        mask = evaluator.evaluate(ast.parse(where, mode='eval'))
+        if not isinstance(mask, (list,)) and not hasattr(mask, 'shape'):
+            mask = backend.constant(bool(mask), columns.size)
+    else:
+        mask = backend.constant(True, columns.size)
+    mask_list = [bool(selected) for selected in backend.to_list(mask)]
+    selected = [index for index, chosen in enumerate(mask_list) if chosen]
+
+    tag_updates = {}
+    numeric_targets = []
+    for target, op, expression in assignments:
+        if target in TAGS:
+            tag_updates.setdefault(target, []).append((op, expression))
+            continue
+        new = evaluator.assigned(target, expression)
+        old = evaluator.numeric(target)
+        if op != "=":
+            new = backend.binary(_BIN_OPS[{"+=": ast.Add, "-=": ast.Sub, "*=": ast.Mult, "/=": ast.Div}[op]], old, new)
+        evaluator.values[target] = backend.where(mask, new, old)
+        if target not in numeric_targets:
+            numeric_targets.append(target)
+
+    results = {target: backend.to_list(evaluator.values[target]) for target in numeric_targets}
+    changes = {}
+    for index in selected:
+        change = {}
+        for target, values in results.items():
+            old_text = columns.text[target][index]
+            new_text = _format_number(values[index])
+            if new_text is not None and new_text != old_text:
+                change[target] = (old_text, new_text)
+        for tag, updates in tag_updates.items():
+            old_names = columns.tags[tag][index]
+            new_names = list(old_names)
+            for op, names in updates:
+                if op == "=":
+                    new_names = list(dict.fromkeys(names))
+                elif op == "+=":
+                    new_names += [name for name in names if name not in new_names]
+                else:
+                    new_names = [name for name in new_names if name not in names]
+            if new_names != old_names:
+                change[tag] = (old_names, new_names)
+        if change:
+            changes[columns.names[index]] = change
+    return RuleEditPlan(selected, changes)
+
+
+def apply_rule_plan(registry, plan):
+    touched = []
+    for name, change in plan.changes.items():
+        type_elem = registry.get(name)
+        if type_elem is None:
+            continue
+        fields = {key: new for key, (old, new) in change.items() if key in FIELDS}
+        flags = {key: new for key, (old, new) in change.items() if key in FLAGS}
+        tags = {key: new for key, (old, new) in change.items() if key in TAGS}
+        before = record_from_element(type_elem)
+        # A field the type lacks is added, as patches do.
+        for field in fields:
+            if type_elem.find(field) is None:
+                insert_type_child(type_elem, field)
+        update_type_element(type_elem, fields, flags, tags.get("category"), tags.get("usage"), tags.get("value"))
+        if record_from_element(type_elem) != before:
+            touched.append(name)
+    return touched
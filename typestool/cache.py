@@ -0,0 +1,270 @@
+import hashlib
+import marshal
+import mmap
+import os
+import struct
+import time
+from array import array
+
+from typestool.loader import iter_type_records
+from typestool.model import pack_record, unpack_record
+from typestool.storage import FSYNC_NEVER, atomic_open
+
+# Parsed snapshots of types.xml files, so reopening an unchanged file skips
+# the XML parse. An entry is only used while the source still has the size,
+# mtime and content hash it was built from.
+#
+# Entry layout: header, marshalled name list, one marshalled packed record
+# per type, then a table of count + 1 record offsets. Entries are read
+# through mmap, so taking the names never touches the records.
+
+CACHE_MAGIC = b"TTCACHE\x01"
+CACHE_VERSION = 1
+CACHE_SUFFIX = ".tcache"
+MAX_CACHE_BYTES = 512 * 1024 * 1024
+MAX_CACHE_AGE = 30 * 24 * 3600
+HASH_CHUNK = 1024 * 1024
+_HEADER = struct.Struct("<8sIQq32sQQQ")
+
+
+def default_cache_dir():
+    # TYPESTOOL_CACHE_DIR overrides the location, set it empty to disable.
+    directory = os.environ.get("TYPESTOOL_CACHE_DIR")
+    if directory is not None:
+        return directory or None
+    base = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(base, "typestool")
+
+
+def file_digest(path):
+    digest = hashlib.blake2b(digest_size=32)
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK), b""):
+            digest.update(chunk)
+    return digest.digest()
+
+
+class CachedTypes:
+    # Read-only view of one cache entry. Records are unpacked on demand.
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        header = _HEADER.unpack_from(self._map)
+        magic, version, self.size, self.mtime_ns, self.digest, self.count, names_offset, index_offset = header
+        if magic != CACHE_MAGIC or version != CACHE_VERSION:
+            self.close()
+            raise ValueError(f"{path} is not a typestool cache entry.")
+        self._names_offset = names_offset
+        self._index_offset = index_offset
+        self._offsets = array('Q')
+        self._offsets.frombytes(self._map[index_offset:index_offset + 8 * (self.count + 1)])
+        self._names = None
+
+    @property
+    def names(self):
+        if self._names is None:
+            self._names = marshal.loads(self._map[self._names_offset:self._offsets[0]])
+        return self._names
+
+    def __len__(self):
+        return self.count
+
+    def packed(self, index):
+        return marshal.loads(self._map[self._offsets[index]:self._offsets[index + 1]])
+
+    def iter_packed(self):
+        for index in range(self.count):
+            yield self.packed(index)
+
+    def record(self, index):
+        return unpack_record(self.packed(index))
+
+    def __iter__(self):
+        for packed in self.iter_packed():
+            yield unpack_record(packed)
+
+    def close(self):
+        self._map.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class ParseCache:
+    def __init__(self, directory=None, max_bytes=MAX_CACHE_BYTES, max_age=MAX_CACHE_AGE):
+        self.directory = directory or default_cache_dir()
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+
+    def entry_path(self, xml_file):
+        key = hashlib.sha1(os.path.abspath(xml_file).encode('utf-8')).hexdigest()
+        return os.path.join(self.directory, key + CACHE_SUFFIX)
+
+    def lookup(self, xml_file):
+        path = self.entry_path(xml_file)
+        try:
+            stat = os.stat(xml_file)
+            entry = CachedTypes(path)
+        except (OSError, ValueError, struct.error):
+            return None
+        if entry.size != stat.st_size:
+            entry.close()
+            return None
+        if entry.mtime_ns != stat.st_mtime_ns:
+            # Touched but maybe not changed (checkouts, copies): the content
+            # hash decides, and a match refreshes the stored mtime.
+            if file_digest(xml_file) != entry.digest:
+                entry.close()
+                return None
+            header = _HEADER.pack(CACHE_MAGIC, CACHE_VERSION, stat.st_size, stat.st_mtime_ns, entry.digest, entry.count, entry._names_offset, entry._index_offset)
+            entry.close()
+            try:
+                with open(path, 'r+b') as f:
+                    f.write(header)
+                entry = CachedTypes(path)
+            except (OSError, ValueError):
+                return None
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return entry
+
+    def source_state(self, xml_file):
+        # Taken before parsing, so a file that changes while it is being read
+        # is never cached as current.
+        return os.stat(xml_file), file_digest(xml_file)
+
+    def store(self, xml_file, packed_records, source=None):
+        stat, digest = source or self.source_state(xml_file)
+        after = os.stat(xml_file)
+        if (after.st_size, after.st_mtime_ns) != (stat.st_size, stat.st_mtime_ns):
+            return None
+        names_blob = marshal.dumps([packed[0] for packed in packed_records])
+        os.makedirs(self.directory, exist_ok=True)
+        path = self.entry_path(xml_file)
+        with atomic_open(path, FSYNC_NEVER) as f:
+            f.write(b"\0" * _HEADER.size)
+            f.write(names_blob)
+            offsets = array('Q', [_HEADER.size + len(names_blob)])
+            position = offsets[0]
+            for packed in packed_records:
+                blob = marshal.dumps(packed)
+                f.write(blob)
+                position += len(blob)
+                offsets.append(position)
+            f.write(offsets.tobytes())
+            f.seek(0)
+            f.write(_HEADER.pack(CACHE_MAGIC, CACHE_VERSION, stat.st_size, stat.st_mtime_ns, digest, len(packed_records), _HEADER.size, position))
+        self.evict()
+        return path
+
+    def load(self, xml_file):
+        # Cached view of the file, parsing and caching it on a miss. When the
+        # cache directory cannot be written the parse result is still returned.
+        entry = self.lookup(xml_file)
+        if entry is not None:
+            return entry
+        source = self.source_state(xml_file)
+        packed_records = [pack_record(record) for record in iter_type_records(xml_file)]
+        try:
+            if self.store(xml_file, packed_records, source):
+                entry = self.lookup(xml_file)
+        except OSError:
+            entry = None
+        return entry if entry is not None else _ParsedTypes(packed_records)
+
+    def entries(self):
+        try:
+            names = os.listdir(self.directory)
+        except OSError:
+            return []
+        entries = []
+        for name in names:
+            if name.endswith(CACHE_SUFFIX):
+                path = os.path.join(self.directory, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+        return entries
+
+    def evict(self, max_bytes=None, max_age=None):
+        # Drops entries unused for max_age seconds, then the least recently
+        # used ones until the total size fits in max_bytes.
+        max_bytes = self.max_bytes if max_bytes is None else max_bytes
+        max_age = self.max_age if max_age is None else max_age
+        entries = sorted(self.entries())
+        cutoff = time.time() - max_age
+        total = sum(size for _, size, _ in entries)
+        removed = 0
+        for used, size, path in entries:
+            if used >= cutoff and total <= max_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+            removed += 1
+        return removed
+
+    def clear(self):
+        return self.evict(max_bytes=0, max_age=0)
+
+
+class _ParsedTypes:
+    # Same interface as CachedTypes for a parse that could not be cached.
+    def __init__(self, packed_records):
+        self._packed = packed_records
+        self.count = len(packed_records)
+        self.names = [packed[0] for packed in packed_records]
+
+    def __len__(self):
+        return self.count
+
+    def packed(self, index):
+        return self._packed[index]
+
+    def iter_packed(self):
+        return iter(self._packed)
+
+    def record(self, index):
+        return unpack_record(self._packed[index])
+
+    def __iter__(self):
+        for packed in self._packed:
+            yield unpack_record(packed)
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        pass
+
+
+_default_cache = None
+
+
+def default_cache():
+    global _default_cache
+    if _default_cache is None:
+        _default_cache = ParseCache()
+    return _default_cache
+
+
+def load_cached_types(xml_file, cache=None):
+    # Uses the default cache unless caching is disabled by an empty
+    # TYPESTOOL_CACHE_DIR, in which case the file is simply parsed.
+    if cache is None:
+        if default_cache_dir() is None:
+            return _ParsedTypes([pack_record(record) for record in iter_type_records(xml_file)])
+        cache = default_cache()
+    return cache.load(xml_file)
@@ -0,0 +1,465 @@
+import argparse
+import os
+import sys
+
+from typestool.model import FIELDS
+
+# Subcommands import their modules lazily so "python -m typestool" starts
+# fast enough to be called many times from deploy scripts.
+
+FIELD_DEFAULTS = {"quantmin": "-1", "quantmax": "-1", "cost": "100"}
+GENERATE_REQUIRED = ("nominal", "lifetime", "restock", "min")
+FLAG_DEFAULTS = {"count_in_cargo": "0", "count_in_hoarder": "0", "count_in_map": "1", "count_in_player": "0", "crafted": "0", "deloot": "0"}
+TRADER_OPTIONS = {
+    "max_price": "MaxPriceThreshold",
+    "min_price": "MinPriceThreshold",
+    "sell_percent": "SellPricePercent",
+    "max_stock": "MaxStockThreshold",
+    "min_stock": "MinStockThreshold",
+    "quantity_percent": "QuantityPercent",
+}
+
+
+class CommandError(Exception):
+    pass
+
+
+def count_value(text):
+    try:
+        number = int(text)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"{text!r} is not a number")
+    if number < -1:
+        raise argparse.ArgumentTypeError(f"{text!r} must be >= -1")
+    return text
+
+
+def flag_value(text):
+    flag, sep, value = text.partition("=")
+    if not sep or flag not in FLAG_DEFAULTS:
+        raise argparse.ArgumentTypeError(f"expected one of {', '.join(FLAG_DEFAULTS)} as NAME=VALUE, got {text!r}")
+    count_value(value)
+    return flag, value
+
+
+def split_list(text):
+    return [name for name in text.replace(",", " ").split() if name]
+
+
+def add_field_options(parser, required=()):
+    for field in FIELDS:
+        parser.add_argument(f"--{field}", type=count_value, required=field in required, default=None)
+    parser.add_argument("--flag", type=flag_value, action="append", default=[], metavar="NAME=VALUE", help="set a flag, may be repeated")
+
+
+def add_tag_options(parser):
+    parser.add_argument("--category", type=split_list, action="extend", default=None, help="category names, comma separated or repeated")
+    parser.add_argument("--usage", type=split_list, action="extend", default=None, help="usage names, comma separated or repeated")
+    parser.add_argument("--value", type=split_list, action="extend", default=None, help="value (tier) names, comma separated or repeated")
+
+
+def collect_fields(args):
+    return {field: getattr(args, field) for field in FIELDS if getattr(args, field) is not None}
+
+
+def cmd_generate(args):
+    from typestool.generate import generate_types_xml
+    from typestool.names import read_new_type_names
+
+    fields = dict(FIELD_DEFAULTS)
+    fields.update(collect_fields(args))
+    flags = dict(FLAG_DEFAULTS)
+    flags.update(args.flag)
+    missing = [field for field in GENERATE_REQUIRED if field not in fields]
+    if missing and not args.presets:
+        raise CommandError(f"--{', --'.join(missing)} required without --presets")
+    # Every name once; with --append only those the output does not define yet.
+    stats = {}
+    type_names = read_new_type_names(args.names_file, args.output if args.append else None, stats)
+    if stats["duplicate"] or stats["existing"]:
+        print(f"Skipped {stats['duplicate']} duplicate and {stats['existing']} existing names", file=sys.stderr)
+    verb = "Appended" if args.append else "Generated"
+    if args.presets:
+        from typestool.presets import generate_preset_types_xml, load_presets, new_preset
+
+        # Field options, when all given, are the fallback for names no rule
+        # matches in a library without a default.
+        fallback = None if missing else new_preset(fields, flags, args.category or (), args.usage or (), args.value or ())
+        count, counts, skipped = generate_preset_types_xml(type_names, args.output, load_presets(args.presets), fallback, append=args.append)
+        for preset, preset_count in counts.most_common():
+            print(f"  {preset or '(command line values)'}: {preset_count}")
+        if skipped:
+            print(f"Skipped {len(skipped)} names no rule matched, e.g. {', '.join(skipped[:5])}", file=sys.stderr)
+        print(f"{verb} {count} types in {args.output}")
+        return
+    count = generate_types_xml(type_names, args.output, fields, flags, args.category or (), args.usage or (), args.value or (), append=args.append)
+    print(f"{verb} {count} types in {args.output}")
+
+
+def cmd_presets(args):
+    from typestool.presets import PresetLibrary, format_rules, import_settings_file, load_presets, save_presets
+
+    if args.action == "import-settings":
+        if not args.output:
+            raise CommandError("import-settings needs -o/--output for the presets file")
+        try:
+            library = load_presets(args.output)
+        except FileNotFoundError:
+            library = PresetLibrary()
+        library.set_preset(args.name, import_settings_file(args.file))
+        if library.default is None:
+            library.default = args.name
+        save_presets(args.output, library)
+        print(f"Imported {args.file} as preset '{args.name}' into {args.output}")
+        return
+    library = load_presets(args.file)
+    if args.action == "show":
+        for name in library.presets:
+            print(f"preset {name}{' (default)' if name == library.default else ''}")
+        sys.stdout.write(format_rules(library.rules))
+        return
+    # resolve
+    from collections import Counter
+    from typestool.names import read_type_names
+
+    if not args.names_file:
+        raise CommandError("resolve needs --names-file")
+    matcher = library.matcher()
+    counts = Counter()
+    for type_name in read_type_names(args.names_file):
+        preset = library.resolve(type_name, matcher)
+        counts[preset] += 1
+        if args.verbose:
+            print(f"{type_name} {preset or '-'}")
+    for preset, count in counts.most_common():
+        print(f"{preset or '(no preset)'}: {count}", file=sys.stderr)
+
+
+def input_spans(loader, output_file):
+    # Edits written back over the input keep its formatting; the spans are
+    # found before editing, while the types still match the file.
+    if output_file and os.path.abspath(output_file) != os.path.abspath(loader.xml_file):
+        return None
+    from typestool.spans import TypeSpans
+
+    spans = TypeSpans(loader.xml_file)
+    spans.scan(loader.root_element)
+    return spans
+
+
+def save_edited(loader, output_file, spans, edited, fsync):
+    from typestool.spans import save_tree
+
+    if spans is not None:
+        output_file = loader.xml_file
+    save_tree(loader.tree, output_file, spans, edited, fsync)
+    return output_file
+
+
+def cmd_bulk_edit(args):
+    from typestool.bulk import apply_bulk_edit, select_type_names
+    from typestool.loader import load_types
+    from typestool.names import read_type_names
+
+    names = list(args.names or [])
+    if args.names_file:
+        names += read_type_names(args.names_file)
+    if not names and not args.pattern:
+        raise CommandError("select types with --names, --names-file or --pattern")
+    fields = collect_fields(args)
+    flags = dict(args.flag)
+    if not fields and not flags and args.category is None and args.usage is None and args.value is None:
+        raise CommandError("nothing to change, pass at least one field, --flag or tag option")
+
+    loader = load_types(args.types_xml)
+    selected = select_type_names(loader.registry.names(), names, args.pattern)
+    if args.dry_run:
+        for type_name in selected:
+            print(type_name)
+        print(f"{len(selected)} types would be edited", file=sys.stderr)
+        return
+    spans = input_spans(loader, args.output)
+    edited = apply_bulk_edit(loader.registry, selected, fields, flags, args.category, args.usage, args.value)
+    output_file = save_edited(loader, args.output, spans, edited, args.fsync)
+    print(f"Edited {len(edited)} types in {output_file}")
+
+
+def cmd_rule_edit(args):
+    from typestool.bulk import TypeColumns, apply_rule_plan, plan_rule_edit
+    from typestool.loader import load_types
+
+    loader = load_types(args.types_xml)
+    plan = plan_rule_edit(TypeColumns.from_registry(loader.registry), args.where, args.set)
+    if args.dry_run:
+        out = sys.stdout
+        for line in plan.preview_lines(args.limit):
+            out.write(line + "\n")
+        print(f"{len(plan.selected)} types match, {len(plan.changes)} would change", file=sys.stderr)
+        return
+    spans = input_spans(loader, args.output)
+    edited = apply_rule_plan(loader.registry, plan)
+    output_file = save_edited(loader, args.output, spans, edited, args.fsync)
+    print(f"{len(plan.selected)} types matched, changed {len(edited)} in {output_file}")
+
+
+def cmd_validate(args):
+    from typestool.validate import ERROR, load_limits_definition, save_report, validate_types_file
+
+    known = load_limits_definition(args.limits) if args.limits else None
+    report = validate_types_file(args.types_xml, known)
+    if not args.quiet:
+        out = sys.stdout
+        for line in report.lines(args.limit):
+            out.write(line + "\n")
+    if args.report:
+        save_report(args.report, report)
+    print(report.summary(), file=sys.stderr)
+    return 1 if report.count(ERROR) or (args.strict and report) else 0
+
+
+def cmd_names(args):
+    from typestool.cache import load_cached_types
+
+    with load_cached_types(args.types_xml) as types:
+        type_names = types.names
+    out = sys.stdout
+    for type_name in type_names:
+        out.write(type_name + "\n")
+
+
+def cmd_cache(args):
+    from typestool.cache import ParseCache
+
+    cache = ParseCache(args.dir)
+    if cache.directory is None:
+        raise CommandError("the parse cache is disabled (TYPESTOOL_CACHE_DIR is empty)")
+    if args.action == "clear":
+        print(f"Removed {cache.clear()} cache entries from {cache.directory}")
+    elif args.action == "prune":
+        max_bytes = None if args.max_mb is None else args.max_mb * 1024 * 1024
+        max_age = None if args.max_days is None else args.max_days * 24 * 3600
+        print(f"Removed {cache.evict(max_bytes, max_age)} cache entries from {cache.directory}")
+    else:
+        entries = cache.entries()
+        print(f"{len(entries)} entries, {sum(size for _, size, _ in entries) / 1024 / 1024:.1f} MiB in {cache.directory}")
+
+
+def cmd_trader(args):
+    from typestool.trader import write_split_trader_json, write_trader_json
+
+    if args.split:
+        display_name = args.display_name if args.display_name is not None else "{group}"
+        files = write_split_trader_json(args.types_xml, args.output, args.split, display_name, args.icon, args.color, args.init_stock_percent)
+        for group, (path, count) in files.items():
+            print(f"{count:8d}  {path}")
+        print(f"Generated {len(files)} trader JSON files in {args.output}")
+        return
+    display_name = args.display_name if args.display_name is not None else "My Category Title !"
+    write_trader_json(args.types_xml, args.output, display_name, args.icon, args.color, args.init_stock_percent)
+    print(f"Generated trader JSON in {args.output}")
+
+
+def cmd_batch(args):
+    from typestool.batch import DONE, FAILED, RUNNING, batch_summary, load_manifest, run_batch
+
+    jobs = load_manifest(args.manifest)
+    if args.dry_run:
+        for job in jobs:
+            after = f" after {', '.join(job.after)}" if job.after else ""
+            print(f"{job.name}: {job.kind} -> {job.spec['output']}{after}")
+        return
+
+    def on_status(job):
+        if job.state != RUNNING or args.verbose:
+            print(job.summary(), flush=True)
+        if job.state == FAILED and args.verbose and job.traceback:
+            print(job.traceback, file=sys.stderr)
+
+    run_batch(jobs, args.workers, on_status)
+    print(batch_summary(jobs))
+    return 1 if any(job.state != DONE for job in jobs) else 0
+
+
+def cmd_json_edit(args):
+    from typestool.trader import TraderDocument
+
+    document = TraderDocument(args.trader_json)
+    for option, key in (("display_name", "DisplayName"), ("icon", "Icon"), ("color", "Color"), ("init_stock_percent", "InitStockPercent")):
+        if getattr(args, option) is not None:
+            document.set_header(key, getattr(args, option))
+    changes = {key: getattr(args, option) for option, key in TRADER_OPTIONS.items() if getattr(args, option) is not None}
+    updated = 0
+    if changes:
+        if not args.all and not args.class_name:
+            raise CommandError("item changes need --class or --all")
+        updated = document.update_items(document.class_names() if args.all else args.class_name, changes)
+    if args.output:
+        document.json_file = args.output
+    if document.save(force=bool(args.output)):
+        print(f"Updated {updated} items in {document.json_file}")
+    else:
+        print(f"No changes, {document.json_file} left untouched")
+
+
+def cmd_merge(args):
+    from typestool.merge import MergePolicy, merge_types_files, parse_field_rules
+
+    policy = MergePolicy(args.strategy, parse_field_rules(args.field_rules or ""))
+    count, conflicts = merge_types_files(args.types_xml, args.output, policy, args.report, args.workers)
+    print(f"Merged {len(args.types_xml)} files into {count} types in {args.output}, {len(conflicts)} conflicting types")
+
+
+def cmd_diff(args):
+    from typestool.diff import diff_types_files, save_patch
+
+    diff = diff_types_files(args.old_xml, args.new_xml)
+    if not args.quiet:
+        out = sys.stdout
+        for line in diff.summary_lines():
+            out.write(line + "\n")
+    if args.patch:
+        save_patch(args.patch, diff.to_patch())
+    print(f"{len(diff.added)} added, {len(diff.removed)} removed, {len(diff.changed)} changed", file=sys.stderr)
+    return 1 if diff and args.exit_code else 0
+
+
+def cmd_patch(args):
+    from typestool.diff import apply_patch_file, load_patch
+
+    output_file = args.output or args.types_xml
+    count = apply_patch_file(args.types_xml, load_patch(args.patch), output_file)
+    print(f"Wrote {count} types to {output_file}")
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="typestool", description="Generate and edit DayZ types.xml and Expansion trader files without the GUI.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    generate = commands.add_parser("generate", help="generate types.xml from a names file")
+    generate.add_argument("names_file")
+    generate.add_argument("-o", "--output", required=True)
+    generate.add_argument("--presets", help="preset library (JSON) whose name-pattern rules pick the values per type")
+    generate.add_argument("--append", action="store_true", help="add the names OUTPUT does not define yet to it instead of writing a new file")
+    add_field_options(generate)
+    add_tag_options(generate)
+    generate.set_defaults(func=cmd_generate)
+
+    presets = commands.add_parser("presets", help="inspect preset libraries and import old settings.txt files")
+    presets.add_argument("action", choices=("show", "resolve", "import-settings"))
+    presets.add_argument("file", help="presets JSON, or settings.txt for import-settings")
+    presets.add_argument("--names-file", help="names to resolve against the rules")
+    presets.add_argument("--name", default="default", help="preset name for import-settings (default: default)")
+    presets.add_argument("-o", "--output", help="presets JSON to add the imported preset to")
+    presets.add_argument("-v", "--verbose", action="store_true", help="print the preset chosen for every name")
+    presets.set_defaults(func=cmd_presets)
+
+    bulk_edit = commands.add_parser("bulk-edit", help="edit many types in an existing types.xml")
+    bulk_edit.add_argument("types_xml")
+    bulk_edit.add_argument("--names", type=split_list, action="extend", help="type names, comma separated or repeated")
+    bulk_edit.add_argument("--names-file", help="file of type names separated by spaces, commas or new lines")
+    bulk_edit.add_argument("--pattern", help="glob pattern matched against type names, e.g. '*_Mag_*'")
+    bulk_edit.add_argument("-o", "--output", help="write here instead of overwriting the input")
+    bulk_edit.add_argument("--dry-run", action="store_true", help="list the selected types without writing")
+    bulk_edit.add_argument("--fsync", choices=("never", "file", "full"), default="file", help="durability of the atomic rewrite (default: file)")
+    add_field_options(bulk_edit)
+    add_tag_options(bulk_edit)
+    bulk_edit.set_defaults(func=cmd_bulk_edit)
+
+    rule_edit = commands.add_parser("rule-edit", help="select types by a condition and update them with expressions")
+    rule_edit.add_argument("types_xml")
+    rule_edit.add_argument("--where", default="", help='condition, e.g. \'"Military" in usage and value == "Tier4"\' (default: all types)')
+    rule_edit.add_argument("--set", required=True, help='assignments, e.g. \'nominal *= 0.7, min = ceil(nominal / 2), usage += "Hunting"\'')
+    rule_edit.add_argument("-o", "--output", help="write here instead of overwriting the input")
+    rule_edit.add_argument("--dry-run", action="store_true", help="show the changes without writing")
+    rule_edit.add_argument("--limit", type=int, default=None, help="show at most this many types in --dry-run")
+    rule_edit.add_argument("--fsync", choices=("never", "file", "full"), default="file", help="durability of the atomic rewrite (default: file)")
+    rule_edit.set_defaults(func=cmd_rule_edit)
+
+    merge = commands.add_parser("merge", help="merge several types.xml files into one")
+    merge.add_argument("types_xml", nargs="+", help="input files, later files take precedence under 'last'")
+    merge.add_argument("-o", "--output", required=True)
+    merge.add_argument("--strategy", choices=("last", "first", "max-nominal"), default="last", help="which version of a duplicated type wins (default: last)")
+    merge.add_argument("--field-rules", help="per-field overrides, e.g. 'nominal=max,min=max,usage=union'")
+    merge.add_argument("--report", help="write a JSON conflict report here")
+    merge.add_argument("--workers", type=int, help="parser processes (default: CPU count)")
+    merge.set_defaults(func=cmd_merge)
+
+    diff = commands.add_parser("diff", help="compare two types.xml files by class name")
+    diff.add_argument("old_xml")
+    diff.add_argument("new_xml")
+    diff.add_argument("--patch", help="write a patch that turns old_xml into new_xml")
+    diff.add_argument("-q", "--quiet", action="store_true", help="only print the totals")
+    diff.add_argument("--exit-code", action="store_true", help="exit with 1 when the files differ")
+    diff.set_defaults(func=cmd_diff)
+
+    patch = commands.add_parser("patch", help="apply a patch written by 'diff --patch'")
+    patch.add_argument("types_xml")
+    patch.add_argument("patch")
+    patch.add_argument("-o", "--output", help="write here instead of overwriting the input")
+    patch.set_defaults(func=cmd_patch)
+
+    validate = commands.add_parser("validate", help="check a types.xml for duplicates, bad numbers, missing flags and unknown names")
+    validate.add_argument("types_xml")
+    validate.add_argument("--limits", help="cfglimitsdefinition.xml with the known category, usage and value names")
+    validate.add_argument("--report", help="write the full report as JSON here")
+    validate.add_argument("--limit", type=int, help="print at most this many problems")
+    validate.add_argument("-q", "--quiet", action="store_true", help="only print the summary")
+    validate.add_argument("--strict", action="store_true", help="exit with status 1 on warnings too")
+    validate.set_defaults(func=cmd_validate)
+
+    names = commands.add_parser("names", help="list the type names in a types.xml")
+    names.add_argument("types_xml")
+    names.set_defaults(func=cmd_names)
+
+    cache = commands.add_parser("cache", help="inspect or prune the parse cache")
+    cache.add_argument("action", choices=("info", "prune", "clear"))
+    cache.add_argument("--dir", help="cache directory (default: $TYPESTOOL_CACHE_DIR or ~/.cache/typestool)")
+    cache.add_argument("--max-mb", type=int, help="prune down to this many MiB")
+    cache.add_argument("--max-days", type=float, help="prune entries unused for this many days")
+    cache.set_defaults(func=cmd_cache)
+
+    trader = commands.add_parser("trader", help="generate an Expansion trader category JSON from types.xml")
+    trader.add_argument("types_xml")
+    trader.add_argument("-o", "--output", required=True, help="output file, or output directory with --split")
+    trader.add_argument("--split", choices=("category", "value", "category-value"), help="write one trader file per category and/or value tier")
+    trader.add_argument("--display-name", help="category title, {group} is replaced by the group name with --split")
+    trader.add_argument("--icon", default="Deliver")
+    trader.add_argument("--color", default="FBFCFEFF")
+    trader.add_argument("--init-stock-percent", type=int, default=75)
+    trader.set_defaults(func=cmd_trader)
+
+    batch = commands.add_parser("batch", help="run the generate and trader jobs of a batch manifest in parallel processes")
+    batch.add_argument("manifest", help="typestool-batch JSON listing the jobs")
+    batch.add_argument("--workers", type=int, help="worker processes, default one per CPU")
+    batch.add_argument("--dry-run", action="store_true", help="list the jobs and their order without running them")
+    batch.add_argument("-v", "--verbose", action="store_true", help="also report started jobs and failure tracebacks")
+    batch.set_defaults(func=cmd_batch)
+
+    json_edit = commands.add_parser("json-edit", help="edit an Expansion trader category JSON")
+    json_edit.add_argument("trader_json")
+    json_edit.add_argument("-o", "--output", help="write here instead of overwriting the input")
+    json_edit.add_argument("--display-name")
+    json_edit.add_argument("--icon")
+    json_edit.add_argument("--color")
+    json_edit.add_argument("--init-stock-percent", type=int)
+    json_edit.add_argument("--class", dest="class_name", type=split_list, action="extend", help="item class names to change")
+    json_edit.add_argument("--all", action="store_true", help="change every item")
+    for option in TRADER_OPTIONS:
+        json_edit.add_argument(f"--{option.replace('_', '-')}", dest=option, type=int)
+    json_edit.set_defaults(func=cmd_json_edit)
+
+    return parser
+
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    try:
+        status = args.func(args)
+    except CommandError as e:
+        parser.error(str(e))
+    # ET.ParseError is a SyntaxError subclass.
+    except (OSError, ValueError, KeyError, SyntaxError) as e:
+        print(f"typestool: error: {e}", file=sys.stderr)
+        return 1
+    return status or 0
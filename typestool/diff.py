@@ -0,0 +1,171 @@
+import json
+import xml.etree.ElementTree as ET
+
+from typestool.generate import render_record, write_records_xml
+from typestool.cache import load_cached_types
+from typestool.model import FIELDS, TAGS, insert_type_child, unpack_record, update_type_element
+from typestool.storage import FSYNC_FILE, atomic_open
+
+PATCH_FORMAT = "typestool-patch"
+PATCH_VERSION = 1
+
+
+def fingerprint_map(xml_file):
+    # The packed tuple is both the fingerprint and the data: equal tuples mean
+    # an unchanged type, and only changed ones are unpacked for detail.
+    fingerprints = {}
+    with load_cached_types(xml_file) as types:
+        for packed in types.iter_packed():
+            fingerprints.setdefault(packed[0], packed)
+    return fingerprints
+
+
+def diff_records(old_record, new_record):
+    changes = {}
+    for field in FIELDS:
+        if old_record[field] != new_record[field]:
+            changes[field] = (old_record[field], new_record[field])
+    old_flags, new_flags = old_record["flags"], new_record["flags"]
+    if old_flags != new_flags:
+        changes["flags"] = {flag: (old_flags.get(flag), new_flags.get(flag)) for flag in dict.fromkeys(list(old_flags) + list(new_flags)) if old_flags.get(flag) != new_flags.get(flag)}
+    for tag in TAGS:
+        if old_record[tag] != new_record[tag]:
+            changes[tag] = (old_record[tag], new_record[tag])
+    return changes
+
+
+class TypesDiff:
+    def __init__(self, added, removed, changed):
+        self.added = added
+        self.removed = removed
+        self.changed = changed
+
+    def __bool__(self):
+        return bool(self.added or self.removed or self.changed)
+
+    def to_patch(self):
+        changed = {}
+        for name, changes in self.changed.items():
+            update = {}
+            for field, change in changes.items():
+                if field == "flags":
+                    update["flags"] = {flag: new for flag, (old, new) in change.items()}
+                else:
+                    update[field] = change[1]
+            changed[name] = update
+        return {
+            "format": PATCH_FORMAT,
+            "version": PATCH_VERSION,
+            "added": self.added,
+            "removed": self.removed,
+            "changed": changed,
+        }
+
+    def summary_lines(self):
+        for record in self.added:
+            yield f"+ {record['name']}"
+        for name in self.removed:
+            yield f"- {name}"
+        for name, changes in self.changed.items():
+            parts = []
+            for field, change in changes.items():
+                if field == "flags":
+                    parts += [f"flags.{flag} {old} -> {new}" for flag, (old, new) in change.items()]
+                elif field in TAGS:
+                    parts.append(f"{field} [{', '.join(change[0])}] -> [{', '.join(change[1])}]")
+                else:
+                    parts.append(f"{field} {change[0]} -> {change[1]}")
+            yield f"~ {name}: {'; '.join(parts)}"
+
+
+def diff_fingerprints(old_map, new_map):
+    removed = [name for name in old_map if name not in new_map]
+    added = [unpack_record(packed) for name, packed in new_map.items() if name not in old_map]
+    changed = {}
+    for name, packed in new_map.items():
+        old_packed = old_map.get(name)
+        if old_packed is not None and old_packed != packed:
+            changed[name] = diff_records(unpack_record(old_packed), unpack_record(packed))
+    return TypesDiff(added, removed, changed)
+
+
+def diff_types_files(old_file, new_file):
+    return diff_fingerprints(fingerprint_map(old_file), fingerprint_map(new_file))
+
+
+def save_patch(patch_file, patch, fsync=FSYNC_FILE):
+    with atomic_open(patch_file, fsync) as f:
+        f.write(json.dumps(patch, separators=(",", ":")).encode('utf-8'))
+    return patch_file
+
+
+def load_patch(patch_file):
+    with open(patch_file, 'r', encoding='utf-8') as f:
+        patch = json.load(f)
+    if patch.get("format") != PATCH_FORMAT or patch.get("version") != PATCH_VERSION:
+        raise ValueError(f"{patch_file} is not a {PATCH_FORMAT} version {PATCH_VERSION} file.")
+    return patch
+
+
+def _apply_record_update(record, update):
+    for field, value in update.items():
+        if field == "flags":
+            flags = dict(record["flags"])
+            for flag, flag_value in value.items():
+                if flag_value is None:
+                    flags.pop(flag, None)
+                else:
+                    flags[flag] = flag_value
+            record["flags"] = flags
+        else:
+            record[field] = value
+    return record
+
+
+def iter_patched_records(records, patch):
+    removed = set(patch["removed"])
+    changed = patch["changed"]
+    added = {record["name"]: record for record in patch["added"]}
+    for record in records:
+        name = record["name"]
+        if name in removed:
+            continue
+        added.pop(name, None)
+        update = changed.get(name)
+        yield _apply_record_update(record, update) if update else record
+    yield from added.values()
+
+
+def apply_patch_file(xml_file, patch, output_file, fsync=FSYNC_FILE):
+    # One streaming pass over the source, so the cost is linear in its size.
+    with load_cached_types(xml_file) as types:
+        return write_records_xml(iter_patched_records(iter(types), patch), output_file, fsync)
+
+
+def apply_patch_to_registry(registry, patch):
+    # In-memory variant for a loaded document; cost is linear in the patch.
+    touched = []
+    for name in patch["removed"]:
+        if name in registry:
+            registry.remove(name)
+            touched.append(name)
+    for name, update in patch["changed"].items():
+        type_elem = registry.get(name)
+        if type_elem is None:
+            continue
+        fields = {field: value for field, value in update.items() if field in FIELDS}
+        for field in fields:
+            if type_elem.find(field) is None:
+                insert_type_child(type_elem, field)
+        flags = {flag: value for flag, value in update.get("flags", {}).items() if value is not None}
+        update_type_element(type_elem, fields, flags, update.get("category"), update.get("usage"), update.get("value"))
+        flags_elem = type_elem.find('flags')
+        for flag, value in update.get("flags", {}).items():
+            if value is None and flags_elem is not None:
+                flags_elem.attrib.pop(flag, None)
+        touched.append(name)
+    for record in patch["added"]:
+        if record["name"] not in registry:
+            registry.add(ET.fromstring(render_record(record)))
+            touched.append(record["name"])
+    return touched
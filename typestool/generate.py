@@ -0,0 +1,186 @@
+import itertools
+import os
+
+from typestool.jobs import JobCancelled
+from typestool.model import FIELDS, FLAGS
+from typestool.storage import FSYNC_FILE, atomic_open
+
+CHUNK_TYPES = 8192
+WRITE_BUFFER = 1 << 20
+# How far from the end of a types.xml the closing tag is looked for.
+FOOTER_SEARCH = 1 << 16
+COPY_BLOCK = 1 << 20
+
+XML_HEADER = '<?xml version="1.0" encoding="UTF-8"?>\n<types>\n'
+XML_FOOTER = '</types>\n'
+
+_ESCAPE = str.maketrans({"&": "&amp;", "<": "&lt;", ">": "&gt;", '"': "&quot;"})
+
+
+def escape_xml(text):
+    return str(text).translate(_ESCAPE)
+
+
+def render_type_body(fields, flags, categories, usages, values):
+    # Everything after the opening <type> tag is the same for every generated
+    # type, so it is rendered once and reused for each name.
+    lines = [f'        <{field}>{escape_xml(fields[field])}</{field}>\n' for field in FIELDS]
+    flag_attrs = " ".join(f'{flag}="{escape_xml(flags[flag])}"' for flag in FLAGS if flag in flags)
+    lines.append(f'        <flags {flag_attrs}/>\n')
+    for category in categories:
+        lines.append(f'        <category name="{escape_xml(category)}"/>\n')
+    for usage in usages:
+        lines.append(f'        <usage name="{escape_xml(usage)}"/>\n')
+    for value in values:
+        lines.append(f'        <value name="{escape_xml(value)}"/>\n')
+    lines.append('    </type>\n')
+    return "".join(lines)
+
+
+def iter_type_chunks(type_names, body, chunk_size=CHUNK_TYPES):
+    suffix = '">\n' + body
+    chunk = []
+    for type_name in type_names:
+        chunk.append('    <type name="' + type_name.translate(_ESCAPE) + suffix)
+        if len(chunk) >= chunk_size:
+            yield len(chunk), "".join(chunk)
+            chunk = []
+    if chunk:
+        yield len(chunk), "".join(chunk)
+
+
+def iter_named_body_chunks(named_bodies, chunk_size=CHUNK_TYPES):
+    # Like iter_type_chunks with a body per type, from (name, body) pairs.
+    chunk = []
+    for type_name, body in named_bodies:
+        chunk.append('    <type name="' + type_name.translate(_ESCAPE) + '">\n' + body)
+        if len(chunk) >= chunk_size:
+            yield len(chunk), "".join(chunk)
+            chunk = []
+    if chunk:
+        yield len(chunk), "".join(chunk)
+
+
+def write_types_xml(type_names, body, output_file, job=None, chunk_size=CHUNK_TYPES):
+    total = len(type_names) if hasattr(type_names, '__len__') else 0
+    return _write_chunks(iter_type_chunks(type_names, body, chunk_size), total, output_file, job)
+
+
+def write_named_types_xml(named_bodies, output_file, total=0, job=None, chunk_size=CHUNK_TYPES):
+    return _write_chunks(iter_named_body_chunks(named_bodies, chunk_size), total, output_file, job)
+
+
+def _write_chunks(chunks, total, output_file, job):
+    written = 0
+    try:
+        with open(output_file, 'w', encoding='utf-8', buffering=WRITE_BUFFER) as f:
+            f.write(XML_HEADER)
+            for count, text in chunks:
+                if job is not None:
+                    job.check_cancelled()
+                f.write(text)
+                written += count
+                if job is not None:
+                    job.progress(written, total)
+            f.write(XML_FOOTER)
+    except JobCancelled:
+        os.remove(output_file)
+        raise
+    return written
+
+
+def find_types_footer(xml_file):
+    # Byte offset of the closing </types> tag, new types go right before it.
+    size = os.path.getsize(xml_file)
+    with open(xml_file, 'rb') as f:
+        f.seek(max(0, size - FOOTER_SEARCH))
+        tail = f.read()
+    offset = tail.rfind(b'</types>')
+    if offset < 0:
+        raise ValueError(f"{xml_file} does not end with </types>, new types cannot be appended to it.")
+    return size - len(tail) + offset
+
+
+def append_chunks(chunks, total, xml_file, job=None, fsync=FSYNC_FILE):
+    # Copies the file up to its closing tag, adds the new types and the rest
+    # of the file, and replaces it atomically. The existing types are copied
+    # as bytes, never parsed, so their formatting and comments stay as is.
+    footer = find_types_footer(xml_file)
+    chunks = iter(chunks)
+    first = next(chunks, None)
+    if first is None:
+        # Nothing new, the file is left alone.
+        return 0
+    written = 0
+    with open(xml_file, 'rb') as src, atomic_open(xml_file, fsync) as f:
+        remaining = footer
+        while remaining:
+            block = src.read(min(COPY_BLOCK, remaining))
+            if not block:
+                break
+            f.write(block)
+            remaining -= len(block)
+        for count, text in itertools.chain((first,), chunks):
+            if job is not None:
+                job.check_cancelled()
+            f.write(text.encode('utf-8'))
+            written += count
+            if job is not None:
+                job.progress(written, total)
+        while True:
+            block = src.read(COPY_BLOCK)
+            if not block:
+                break
+            f.write(block)
+    return written
+
+
+def generate_types_xml(type_names, output_file, fields, flags, categories=(), usages=(), values=(), job=None, append=False):
+    # append adds the types to the existing output_file instead of writing a
+    # new one.
+    body = render_type_body(fields, flags, categories, usages, values)
+    if append:
+        total = len(type_names) if hasattr(type_names, '__len__') else 0
+        return append_chunks(iter_type_chunks(type_names, body), total, output_file, job)
+    return write_types_xml(type_names, body, output_file, job=job)
+
+
+def render_record(record):
+    # Unlike render_type_body this keeps the record's own shape: empty fields,
+    # missing flags and extra flag attributes are written as they were read.
+    lines = ['    <type name="' + escape_xml(record["name"]) + '">\n']
+    for field in FIELDS:
+        if record[field] != "":
+            lines.append(f'        <{field}>{escape_xml(record[field])}</{field}>\n')
+    flags = record["flags"]
+    if flags:
+        ordered = [flag for flag in FLAGS if flag in flags] + [flag for flag in flags if flag not in FLAGS]
+        flag_attrs = " ".join(f'{flag}="{escape_xml(flags[flag])}"' for flag in ordered)
+        lines.append(f'        <flags {flag_attrs}/>\n')
+    for tag in ("category", "usage", "value"):
+        for name in record[tag]:
+            lines.append(f'        <{tag} name="{escape_xml(name)}"/>\n')
+    lines.append('    </type>\n')
+    return "".join(lines)
+
+
+def write_records_xml(records, output_file, fsync=FSYNC_FILE, job=None, chunk_size=CHUNK_TYPES):
+    total = len(records) if hasattr(records, '__len__') else 0
+    written = 0
+    chunk = []
+    with atomic_open(output_file, fsync) as f:
+        f.write(XML_HEADER.encode('utf-8'))
+        for record in records:
+            chunk.append(render_record(record))
+            if len(chunk) >= chunk_size:
+                if job is not None:
+                    job.check_cancelled()
+                f.write("".join(chunk).encode('utf-8'))
+                written += len(chunk)
+                chunk = []
+                if job is not None:
+                    job.progress(written, total)
+        f.write("".join(chunk).encode('utf-8'))
+        written += len(chunk)
+        f.write(XML_FOOTER.encode('utf-8'))
+    return written
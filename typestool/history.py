@@ -0,0 +1,145 @@
+from collections import deque
+
+UNDO_LIMIT = 100
+MAX_CHANGES = 500000
+
+
+def snapshot_element(type_elem):
+    # A <type> is one level deep, so its whole state is a small tuple of
+    # immutable parts; children keep their order and whitespace.
+    return (
+        tuple(type_elem.attrib.items()),
+        type_elem.text,
+        tuple((child.tag, tuple(child.attrib.items()), child.text, child.tail) for child in type_elem),
+    )
+
+
+def element_delta(before, after):
+    # What a step keeps per type: the <type> attributes and text only when
+    # they changed, and the changed children by position, or every child
+    # when children were added or removed.
+    head = ((before[0], before[1]), (after[0], after[1])) if before[:2] != after[:2] else None
+    old_children, new_children = before[2], after[2]
+    if len(old_children) == len(new_children):
+        children = tuple((index, old, new) for index, (old, new) in enumerate(zip(old_children, new_children)) if old != new)
+        return head, children, None
+    return head, None, (old_children, new_children)
+
+
+def _set_child(child, state):
+    tag, attrib, text, tail = state
+    child.tag = tag
+    child.attrib.clear()
+    child.attrib.update(attrib)
+    child.text = text
+    child.tail = tail
+
+
+def apply_delta(type_elem, delta, undo):
+    side = 0 if undo else 1
+    head, children, all_children = delta
+    if head is not None:
+        attrib, text = head[side]
+        type_elem.attrib.clear()
+        type_elem.attrib.update(attrib)
+        type_elem.text = text
+    if children is not None:
+        for change in children:
+            _set_child(type_elem[change[0]], change[1 + side])
+    else:
+        for child in list(type_elem):
+            type_elem.remove(child)
+        for state in all_children[side]:
+            child = type_elem.makeelement(state[0], {})
+            _set_child(child, state)
+            type_elem.append(child)
+
+
+class EditStep:
+    def __init__(self, label, changes):
+        self.label = label
+        self.changes = changes
+
+    def names(self):
+        return [type_elem.get('name') for type_elem, _ in self.changes]
+
+
+class EditHistory:
+    # Undo/redo over the loaded tree. A step keeps a delta for each type it
+    # changed, so its memory and the cost of undoing or redoing it grow with
+    # the changes, not the file.
+    def __init__(self, limit=UNDO_LIMIT, max_changes=MAX_CHANGES):
+        self.limit = limit
+        self.max_changes = max_changes
+        self.undo_steps = deque()
+        self.redo_steps = []
+        self._changes = 0
+
+    def clear(self):
+        self.undo_steps.clear()
+        self.redo_steps = []
+        self._changes = 0
+
+    def apply(self, label, type_elems, fn):
+        # Runs fn, which may only change the given elements, and records it
+        # as one step. Returns the names of the types that really changed.
+        before = {}
+        for type_elem in type_elems:
+            if id(type_elem) not in before:
+                before[id(type_elem)] = (type_elem, snapshot_element(type_elem))
+        changes = []
+        try:
+            fn()
+        finally:
+            for type_elem, snapshot in before.values():
+                after = snapshot_element(type_elem)
+                if after != snapshot:
+                    changes.append((type_elem, element_delta(snapshot, after)))
+            if changes:
+                self._push(EditStep(label, changes))
+        return [type_elem.get('name') for type_elem, _ in changes]
+
+    def _push(self, step):
+        for redo_step in self.redo_steps:
+            self._changes -= len(redo_step.changes)
+        self.redo_steps = []
+        self.undo_steps.append(step)
+        self._changes += len(step.changes)
+        while self.undo_steps and (len(self.undo_steps) > self.limit or self._changes > self.max_changes):
+            self._changes -= len(self.undo_steps.popleft().changes)
+
+    def forget(self, type_elems):
+        # Drops every step touching one of these elements, used when they
+        # were replaced in the tree and undoing them would edit a detached copy.
+        ids = {id(type_elem) for type_elem in type_elems}
+        if not ids:
+            return
+        for steps in (self.undo_steps, self.redo_steps):
+            kept = [step for step in steps if not any(id(type_elem) in ids for type_elem, _ in step.changes)]
+            self._changes -= sum(len(step.changes) for step in steps) - sum(len(step.changes) for step in kept)
+            steps.clear()
+            steps.extend(kept)
+
+    def can_undo(self):
+        return bool(self.undo_steps)
+
+    def can_redo(self):
+        return bool(self.redo_steps)
+
+    def undo(self):
+        if not self.undo_steps:
+            return None
+        step = self.undo_steps.pop()
+        for type_elem, delta in reversed(step.changes):
+            apply_delta(type_elem, delta, undo=True)
+        self.redo_steps.append(step)
+        return step
+
+    def redo(self):
+        if not self.redo_steps:
+            return None
+        step = self.redo_steps.pop()
+        for type_elem, delta in step.changes:
+            apply_delta(type_elem, delta, undo=False)
+        self.undo_steps.append(step)
+        return step
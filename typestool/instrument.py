@@ -0,0 +1,258 @@
+import cProfile
+import json
+import os
+import pstats
+import threading
+import time
+from collections import deque
+
+from typestool.storage import FSYNC_NEVER, atomic_open
+
+# Opt-in timing of user-facing operations and their phases.
+#
+#   op = instrument.start("load", file=path)
+#   with op.phase("parse"):
+#       ...
+#   op.count("types", n)
+#   op.finish()
+#
+# Phases may run on any thread, an operation started on the Tk thread can
+# time work done in a background job. While recording is off start() hands
+# out one shared do-nothing operation, so instrumented code pays a function
+# call per phase and nothing else. TYPESTOOL_INSTRUMENT=1 turns recording
+# on from the start.
+
+PHASES = ("parse", "cache", "validate", "index", "lookup", "mutate", "serialize", "widget fill")
+MAX_OPERATIONS = 1000
+MAX_SPANS = 200000
+
+_enabled = bool(os.environ.get("TYPESTOOL_INSTRUMENT"))
+_lock = threading.Lock()
+_origin = time.perf_counter_ns()
+operations = deque(maxlen=MAX_OPERATIONS)
+spans = deque(maxlen=MAX_SPANS)
+listeners = []
+_profile_next = None
+
+
+class _NullPhase:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+_NULL_PHASE = _NullPhase()
+
+
+class _NullOperation:
+    name = None
+
+    def phase(self, name):
+        return _NULL_PHASE
+
+    def count(self, name, amount=1):
+        pass
+
+    def finish(self):
+        pass
+
+
+NULL_OPERATION = _NullOperation()
+
+
+class _Phase:
+    def __init__(self, operation, name):
+        self.operation = operation
+        self.name = name
+
+    def __enter__(self):
+        self.thread = threading.get_ident()
+        self.start = time.perf_counter_ns()
+        if self.operation.profile_file is not None:
+            self.operation._profile_enter(self.thread)
+        return self
+
+    def __exit__(self, *exc_info):
+        end = time.perf_counter_ns()
+        if self.operation.profile_file is not None:
+            self.operation._profile_exit(self.thread)
+        self.operation._record(self.name, self.start, end - self.start, self.thread)
+        return False
+
+
+class Operation:
+    def __init__(self, name, args, profile_file=None):
+        self.name = name
+        self.args = args
+        self.start_ns = time.perf_counter_ns()
+        self.end_ns = None
+        self.thread = threading.get_ident()
+        self.phases = {}
+        self.counters = {}
+        self.profile_file = profile_file
+        self._profilers = {}
+        self._depth = {}
+
+    def phase(self, name):
+        return _Phase(self, name)
+
+    def count(self, name, amount=1):
+        with _lock:
+            self.counters[name] = self.counters.get(name, 0) + amount
+
+    def _record(self, name, start, duration, thread):
+        with _lock:
+            calls, total = self.phases.get(name, (0, 0))
+            self.phases[name] = (calls + 1, total + duration)
+            spans.append((self.name, name, start, duration, thread))
+
+    def _profile_enter(self, thread):
+        # One profiler per thread, only the outermost phase turns it on.
+        depth = self._depth.get(thread, 0)
+        self._depth[thread] = depth + 1
+        if depth == 0:
+            profiler = self._profilers.get(thread)
+            if profiler is None:
+                profiler = self._profilers[thread] = cProfile.Profile()
+            profiler.enable()
+
+    def _profile_exit(self, thread):
+        self._depth[thread] -= 1
+        if self._depth[thread] == 0:
+            self._profilers[thread].disable()
+
+    @property
+    def duration_ms(self):
+        end = self.end_ns if self.end_ns is not None else time.perf_counter_ns()
+        return (end - self.start_ns) / 1e6
+
+    def finish(self):
+        if self.end_ns is not None:
+            return
+        self.end_ns = time.perf_counter_ns()
+        with _lock:
+            operations.append(self)
+            spans.append((self.name, None, self.start_ns, self.end_ns - self.start_ns, self.thread))
+        if self._profilers:
+            stats = None
+            for profiler in self._profilers.values():
+                if stats is None:
+                    stats = pstats.Stats(profiler)
+                else:
+                    stats.add(profiler)
+            stats.dump_stats(self.profile_file)
+        for listener in list(listeners):
+            listener(self)
+
+    def summary(self):
+        # "load 812 ms: parse 640 ms, index 90 ms; 12000 types"
+        phases = ", ".join(f"{name} {total / 1e6:.0f} ms" for name, (_, total) in sorted(self.phases.items(), key=lambda item: -item[1][1]))
+        counters = ", ".join(f"{amount} {name}" for name, amount in self.counters.items())
+        text = f"{self.name} {self.duration_ms:.0f} ms"
+        if phases:
+            text += f": {phases}"
+        if counters:
+            text += f"; {counters}"
+        return text
+
+    def to_dict(self):
+        return {
+            "name": self.name,
+            "args": self.args,
+            "start_ms": (self.start_ns - _origin) / 1e6,
+            "duration_ms": self.duration_ms,
+            "phases": {name: {"calls": calls, "total_ms": total / 1e6} for name, (calls, total) in self.phases.items()},
+            "counters": dict(self.counters),
+            "profile": self.profile_file,
+        }
+
+
+def enabled():
+    return _enabled
+
+
+def set_enabled(value):
+    global _enabled
+    _enabled = bool(value)
+
+
+def clear():
+    with _lock:
+        operations.clear()
+        spans.clear()
+
+
+def start(name, **args):
+    global _profile_next
+    if not _enabled:
+        return NULL_OPERATION
+    profile_file, _profile_next = _profile_next, None
+    return Operation(name, args, profile_file)
+
+
+def profile_next(profile_file):
+    # The next operation also runs its phases under cProfile and writes the
+    # combined stats of all its threads to profile_file (pstats format, e.g.
+    # for snakeviz or python -m pstats). Turns recording on.
+    global _profile_next
+    _profile_next = profile_file
+    set_enabled(True)
+
+
+def add_listener(listener):
+    listeners.append(listener)
+
+
+def totals():
+    # Per operation name: how often it ran, total and worst time, and the
+    # time spent in each phase.
+    by_name = {}
+    with _lock:
+        finished = list(operations)
+    for operation in finished:
+        entry = by_name.setdefault(operation.name, {"calls": 0, "total_ms": 0.0, "max_ms": 0.0, "phases": {}, "counters": {}})
+        duration = operation.duration_ms
+        entry["calls"] += 1
+        entry["total_ms"] += duration
+        entry["max_ms"] = max(entry["max_ms"], duration)
+        for name, (calls, total) in operation.phases.items():
+            phase = entry["phases"].setdefault(name, {"calls": 0, "total_ms": 0.0})
+            phase["calls"] += calls
+            phase["total_ms"] += total / 1e6
+        for name, amount in operation.counters.items():
+            entry["counters"][name] = entry["counters"].get(name, 0) + amount
+    return by_name
+
+
+def save_json(output_file):
+    with _lock:
+        finished = list(operations)
+    report = {"totals": totals(), "operations": [operation.to_dict() for operation in finished]}
+    with atomic_open(output_file, FSYNC_NEVER) as f:
+        f.write(json.dumps(report, indent=2).encode('utf-8'))
+    return output_file
+
+
+def save_chrome_trace(output_file):
+    # Trace Event Format, opens in chrome://tracing and Perfetto. Operations
+    # and phases are complete ("X") events on the thread they ran on.
+    pid = os.getpid()
+    with _lock:
+        recorded = list(spans)
+    events = []
+    for operation, phase, start, duration, thread in recorded:
+        events.append({
+            "name": phase or operation,
+            "cat": "phase" if phase else "operation",
+            "ph": "X",
+            "ts": (start - _origin) / 1000,
+            "dur": duration / 1000,
+            "pid": pid,
+            "tid": thread,
+            "args": {"operation": operation} if phase else {},
+        })
+    with atomic_open(output_file, FSYNC_NEVER) as f:
+        f.write(json.dumps({"traceEvents": events, "displayTimeUnit": "ms"}).encode('utf-8'))
+    return output_file
@@ -0,0 +1,95 @@
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+POLL_INTERVAL_MS = 50
+MAX_WORKERS = 4
+
+
+class JobCancelled(Exception):
+    pass
+
+
+class Job:
+    def __init__(self, name):
+        self.name = name
+        self.events = queue.Queue()
+        self.future = None
+        self._cancel_event = threading.Event()
+        self._last_percent = None
+
+    def cancel(self):
+        self._cancel_event.set()
+
+    @property
+    def cancelled(self):
+        return self._cancel_event.is_set()
+
+    def check_cancelled(self):
+        if self._cancel_event.is_set():
+            raise JobCancelled(self.name)
+
+    def post(self, event, value=None):
+        self.events.put((event, value))
+
+    def progress(self, done, total):
+        # Only whole-percent changes are queued, so a worker can report every
+        # row without flooding the UI thread.
+        percent = done * 100 // total if total else 100
+        if percent != self._last_percent:
+            self._last_percent = percent
+            self.events.put(("progress", (done, total)))
+
+    def done(self):
+        return self.future is not None and self.future.done()
+
+    def result(self, timeout=None):
+        return self.future.result(timeout)
+
+
+class JobRunner:
+    def __init__(self, max_workers=MAX_WORKERS):
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="typestool")
+
+    def submit(self, name, fn, *args, **kwargs):
+        job = Job(name)
+        job.future = self.executor.submit(fn, job, *args, **kwargs)
+        return job
+
+    def shutdown(self, cancel=True):
+        self.executor.shutdown(wait=False, cancel_futures=cancel)
+
+
+def watch_job(widget, job, on_event=None, on_progress=None, on_done=None, on_error=None, on_cancel=None, interval=POLL_INTERVAL_MS):
+    # Polls the job from the Tk event loop at a fixed rate. Only the latest
+    # progress update per tick is delivered, other events are passed through
+    # in order and the outcome is reported once the worker has finished.
+    def poll():
+        finished = job.future.done()
+        latest = None
+        while True:
+            try:
+                event, value = job.events.get_nowait()
+            except queue.Empty:
+                break
+            if event == "progress":
+                latest = value
+            elif on_event is not None:
+                on_event(event, value)
+        if latest is not None and on_progress is not None:
+            on_progress(*latest)
+        if not finished:
+            widget.after(interval, poll)
+            return
+        error = job.future.exception()
+        if isinstance(error, JobCancelled):
+            if on_cancel is not None:
+                on_cancel()
+        elif error is not None:
+            if on_error is not None:
+                on_error(error)
+        elif on_done is not None:
+            on_done(job.future.result())
+
+    widget.after(interval, poll)
+    return job
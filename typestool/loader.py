@@ -0,0 +1,88 @@
+import xml.etree.ElementTree as ET
+
+from typestool.model import record_from_element
+from typestool.registry import TypeRegistry
+
+BATCH_SIZE = 2000
+
+
+def _iter_type_elements(xml_file):
+    # Yields each top-level <type> once it is complete, then drops it from the
+    # root so memory stays bounded by the size of a single type block.
+    context = ET.iterparse(xml_file, events=("start", "end"))
+    depth = 0
+    root_element = None
+    for event, elem in context:
+        if event == "start":
+            if root_element is None:
+                root_element = elem
+            depth += 1
+            continue
+        depth -= 1
+        if depth == 1 and elem.tag == 'type':
+            yield elem
+            root_element.remove(elem)
+
+
+def iter_type_records(xml_file):
+    for type_elem in _iter_type_elements(xml_file):
+        yield record_from_element(type_elem)
+
+
+def iter_type_names(xml_file):
+    for type_elem in _iter_type_elements(xml_file):
+        name = type_elem.get('name')
+        if name is not None:
+            yield name
+
+
+def list_type_names(xml_file):
+    return list(iter_type_names(xml_file))
+
+
+class TypesLoader:
+    # Builds the full editable tree with iterparse, handing out the names
+    # parsed so far in batches so the UI can fill in while the file loads.
+    def __init__(self, xml_file, batch_size=BATCH_SIZE):
+        self.xml_file = xml_file
+        self.batch_size = batch_size
+        self.tree = None
+        self.root_element = None
+        self.registry = None
+        self.count = 0
+
+    def batches(self):
+        context = ET.iterparse(self.xml_file, events=("start", "end"))
+        depth = 0
+        pending = []
+        for event, elem in context:
+            if event == "start":
+                if self.root_element is None:
+                    self.root_element = elem
+                    self.registry = TypeRegistry(elem)
+                depth += 1
+                continue
+            depth -= 1
+            if depth == 1 and elem.tag == 'type':
+                self.registry.register(elem)
+                name = elem.get('name')
+                if name is not None:
+                    pending.append(name)
+                    self.count += 1
+                if len(pending) >= self.batch_size:
+                    yield pending
+                    pending = []
+        if pending:
+            yield pending
+        self.tree = ET.ElementTree(self.root_element)
+
+    def load(self):
+        for _ in self.batches():
+            pass
+        return self.tree
+
+
+def load_types(xml_file):
+    loader = TypesLoader(xml_file)
+    loader.load()
+    return loader
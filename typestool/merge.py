@@ -0,0 +1,181 @@
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from typestool.cache import load_cached_types
+from typestool.generate import write_records_xml
+from typestool.model import FIELDS, TAGS, unpack_record
+from typestool.storage import FSYNC_FILE, atomic_open
+
+STRATEGIES = ("last", "first", "max-nominal")
+FIELD_RULES = ("first", "last", "max", "min", "union")
+NUMERIC_RULES = ("max", "min")
+
+
+def parse_types_file(xml_file):
+    with load_cached_types(xml_file) as types:
+        return list(types)
+
+
+def parse_types_file_packed(xml_file):
+    # Workers hand back the packed form straight from the parse cache.
+    with load_cached_types(xml_file) as types:
+        return list(types.iter_packed())
+
+
+def parse_field_rules(text):
+    # "nominal=max, usage=union" -> {"nominal": "max", "usage": "union"}
+    rules = {}
+    for part in text.replace(";", ",").split(","):
+        if not part.strip():
+            continue
+        field, sep, rule = part.partition("=")
+        field, rule = field.strip(), rule.strip()
+        if not sep or (field not in FIELDS and field not in TAGS and field != "flags"):
+            raise ValueError(f"Unknown field rule '{part.strip()}'.")
+        if rule not in FIELD_RULES:
+            raise ValueError(f"Unknown rule '{rule}' for {field}, expected one of {', '.join(FIELD_RULES)}.")
+        if rule in NUMERIC_RULES and field not in FIELDS:
+            raise ValueError(f"Rule '{rule}' only applies to numeric fields, not {field}.")
+        if rule == "union" and field not in TAGS and field != "flags":
+            raise ValueError(f"Rule 'union' only applies to category, usage, value and flags, not {field}.")
+        rules[field] = rule
+    return rules
+
+
+def _as_number(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return float("-inf")
+
+
+class MergePolicy:
+    def __init__(self, strategy="last", field_rules=None):
+        if strategy not in STRATEGIES:
+            raise ValueError(f"Unknown merge strategy '{strategy}', expected one of {', '.join(STRATEGIES)}.")
+        self.strategy = strategy
+        self.field_rules = field_rules or {}
+
+    def pick(self, versions):
+        if self.strategy == "first":
+            return 0
+        if self.strategy == "max-nominal":
+            best = 0
+            for index in range(1, len(versions)):
+                # Ties go to the later file, same as "last".
+                if _as_number(versions[index][1]["nominal"]) >= _as_number(versions[best][1]["nominal"]):
+                    best = index
+            return best
+        return len(versions) - 1
+
+    def resolve(self, versions):
+        winner = self.pick(versions)
+        record = versions[winner][1]
+        if not self.field_rules:
+            return winner, record
+        records = [version[1] for version in versions]
+        record = dict(record, flags=dict(record["flags"]))
+        for field, rule in self.field_rules.items():
+            if rule == "first":
+                record[field] = records[0][field]
+            elif rule == "last":
+                record[field] = records[-1][field]
+            elif rule == "max":
+                record[field] = max((r[field] for r in records), key=_as_number)
+            elif rule == "min":
+                record[field] = min((r[field] for r in records if r[field] != ""), key=_as_number, default="")
+            elif field == "flags":
+                merged_flags = {}
+                for r in records:
+                    merged_flags.update(r["flags"])
+                record["flags"] = merged_flags
+            else:
+                record[field] = list(dict.fromkeys(name for r in records for name in r[field]))
+        return winner, record
+
+
+def _differing_fields(versions):
+    fields = {}
+    first = versions[0][1]
+    for key in FIELDS + ("flags",) + TAGS:
+        if any(record[key] != first[key] for _, record in versions[1:]):
+            fields[key] = {label: record[key] for label, record in versions}
+    return fields
+
+
+def merge_records(sources, policy):
+    # sources is a list of (label, records) in precedence order. Every record
+    # is bucketed by class name in one pass, then each name is resolved once.
+    grouped = {}
+    for label, records in sources:
+        for record in records:
+            versions = grouped.get(record["name"])
+            if versions is None:
+                grouped[record["name"]] = [(label, record)]
+            else:
+                versions.append((label, record))
+
+    merged = []
+    conflicts = []
+    for name, versions in grouped.items():
+        if len(versions) == 1:
+            merged.append(versions[0][1])
+            continue
+        winner, record = policy.resolve(versions)
+        merged.append(record)
+        fields = _differing_fields(versions)
+        if fields:
+            conflicts.append({
+                "name": name,
+                "sources": [label for label, _ in versions],
+                "winner": versions[winner][0],
+                "fields": fields,
+            })
+    return merged, conflicts
+
+
+def parse_files(xml_files, max_workers=None, job=None):
+    max_workers = max_workers or os.cpu_count() or 1
+    if len(xml_files) == 1 or max_workers == 1:
+        sources = []
+        for done, xml_file in enumerate(xml_files, 1):
+            if job is not None:
+                job.check_cancelled()
+            sources.append((xml_file, parse_types_file(xml_file)))
+            if job is not None:
+                job.progress(done, len(xml_files) + 1)
+        return sources
+    sources = []
+    with ProcessPoolExecutor(max_workers=min(max_workers, len(xml_files))) as pool:
+        futures = [pool.submit(parse_types_file_packed, xml_file) for xml_file in xml_files]
+        for done, (xml_file, future) in enumerate(zip(xml_files, futures), 1):
+            if job is not None and job.cancelled:
+                for pending in futures:
+                    pending.cancel()
+                job.check_cancelled()
+            sources.append((xml_file, [unpack_record(packed) for packed in future.result()]))
+            if job is not None:
+                job.progress(done, len(xml_files) + 1)
+    return sources
+
+
+def write_conflict_report(report_file, conflicts, fsync=FSYNC_FILE):
+    with atomic_open(report_file, fsync) as f:
+        f.write(json.dumps({"conflicts": conflicts}, indent=4).encode('utf-8'))
+    return report_file
+
+
+def merge_types_files(xml_files, output_file, policy=None, report_file=None, max_workers=None, job=None):
+    policy = policy or MergePolicy()
+    sources = parse_files(xml_files, max_workers, job)
+    labels = {xml_file: os.path.basename(xml_file) for xml_file in xml_files}
+    if len(set(labels.values())) != len(labels):
+        labels = {xml_file: xml_file for xml_file in xml_files}
+    merged, conflicts = merge_records([(labels[xml_file], records) for xml_file, records in sources], policy)
+    write_records_xml(merged, output_file)
+    if report_file:
+        write_conflict_report(report_file, conflicts)
+    if job is not None:
+        job.progress(1, 1)
+    return len(merged), conflicts
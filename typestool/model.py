@@ -0,0 +1,122 @@
+FIELDS = ("nominal", "lifetime", "restock", "min", "quantmin", "quantmax", "cost")
+FLAGS = ("count_in_cargo", "count_in_hoarder", "count_in_map", "count_in_player", "crafted", "deloot")
+TAGS = ("category", "usage", "value")
+
+CATEGORIES = ["Clothes", "Containers", "Explosives", "Food", "Tools", "Vehicle Parts", "Weapons"]
+USAGES = ["Coast", "Farm", "Firefighter", "Hunting", "Industrial", "Medic", "Military", "Office", "Police", "Prison", "School", "Town", "Village"]
+VALUES = ["Tier1", "Tier2", "Tier3", "Tier4"]
+
+
+def new_record(name):
+    record = {"name": name}
+    for field in FIELDS:
+        record[field] = ""
+    record["flags"] = {}
+    for tag in TAGS:
+        record[tag] = []
+    return record
+
+
+def record_from_element(type_elem):
+    record = new_record(type_elem.get('name'))
+    for child in type_elem:
+        tag = child.tag
+        if tag in TAGS:
+            record[tag].append(child.get('name'))
+        elif tag == 'flags':
+            record["flags"] = dict(child.attrib)
+        elif tag in record and not record[tag]:
+            record[tag] = child.text or ""
+    return record
+
+
+# Where each kind of child goes in a <type>: fields, flags, then tags.
+CHILD_ORDER = {tag: rank for rank, tag in enumerate(FIELDS + ("flags",) + TAGS)}
+
+
+def insert_type_child(type_elem, tag):
+    # A new child placed after the last one that comes before it in
+    # CHILD_ORDER, laid out like its neighbours: it takes over the tail of
+    # the child before it, which gets the indentation children have.
+    rank = CHILD_ORDER[tag]
+    children = list(type_elem)
+    position = 0
+    for index, child in enumerate(children):
+        child_rank = CHILD_ORDER.get(child.tag)
+        if child_rank is not None and child_rank <= rank:
+            position = index + 1
+    child = type_elem.makeelement(tag, {})
+    if position == 0:
+        child.tail = type_elem.text
+    else:
+        before = children[position - 1]
+        child.tail = before.tail
+        before.tail = type_elem.text
+    type_elem.insert(position, child)
+    return child
+
+
+def remove_type_child(type_elem, child):
+    # The whitespace before </type> stays when the last child goes.
+    children = list(type_elem)
+    index = children.index(child)
+    if index == len(children) - 1:
+        if index:
+            children[index - 1].tail = child.tail
+        else:
+            type_elem.text = child.tail
+    type_elem.remove(child)
+
+
+def update_type_element(type_elem, fields=None, flags=None, categories=None, usages=None, values=None):
+    # Fields and flags only touch the keys given; tag lists replace every
+    # existing tag of that kind, and None leaves them alone. Children are
+    # edited in place and new ones go next to their kind, so the layout of
+    # the type is kept.
+    if fields:
+        for field, value in fields.items():
+            elem = type_elem.find(field)
+            if elem is not None:
+                elem.text = value
+    if flags:
+        flags_elem = type_elem.find('flags')
+        if flags_elem is None:
+            flags_elem = insert_type_child(type_elem, 'flags')
+        for flag, value in flags.items():
+            flags_elem.set(flag, value)
+    for tag, names in (("category", categories), ("usage", usages), ("value", values)):
+        if names is None:
+            continue
+        names = [name for name in names if name]
+        existing = type_elem.findall(tag)
+        for tag_elem, name in zip(existing, names):
+            if tag_elem.get('name') != name:
+                tag_elem.set('name', name)
+        for tag_elem in existing[len(names):]:
+            remove_type_child(type_elem, tag_elem)
+        for name in names[len(existing):]:
+            insert_type_child(type_elem, tag).set('name', name)
+
+
+def parse_count(value):
+    number = int(value)
+    if number < -1:
+        raise ValueError(f"{value} is below -1")
+    return number
+
+
+def pack_record(record):
+    # Flat tuple form of a record, much cheaper to pickle or marshal than the
+    # dict when records cross a process boundary or go to disk.
+    return (record["name"],) + tuple(record[field] for field in FIELDS) + (tuple(record["flags"].items()),) + tuple(tuple(record[tag]) for tag in TAGS)
+
+
+def unpack_record(packed):
+    record = {"name": packed[0]}
+    for index, field in enumerate(FIELDS, 1):
+        record[field] = packed[index]
+    offset = len(FIELDS) + 1
+    record["flags"] = dict(packed[offset])
+    for index, tag in enumerate(TAGS, offset + 1):
+        record[tag] = list(packed[index])
+    return record
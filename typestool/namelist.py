@@ -0,0 +1,86 @@
+import re
+from fnmatch import translate
+
+
+class FilteredNameList:
+    # Backing model for a virtual list: every name, the subset matching the
+    # filter and a selection of names that survives filtering and reloads.
+    # A filter with *, ? or [ is a glob, anything else a case-insensitive
+    # substring.
+    def __init__(self, names=()):
+        self.names = []
+        self._lower = []
+        self.visible = self.names
+        self.query = ""
+        self.selected = set()
+        self.extend(names)
+
+    def __len__(self):
+        return len(self.visible)
+
+    def set_names(self, names):
+        self.names = list(names)
+        self._lower = [name.lower() for name in self.names]
+        self.selected.intersection_update(self.names)
+        self._refilter(self.query)
+
+    def extend(self, names):
+        names = list(names)
+        lower = [name.lower() for name in names]
+        self.names.extend(names)
+        self._lower.extend(lower)
+        if self.visible is not self.names:
+            self.visible.extend(self._matching(self.query, names, lower))
+
+    def set_filter(self, query):
+        query = query.strip()
+        if query == self.query:
+            return
+        if self.query and not _is_glob(query) and not _is_glob(self.query) and self.query.lower() in query.lower():
+            # A longer substring only narrows the current matches.
+            needle = query.lower()
+            self.visible = [name for name in self.visible if needle in name.lower()]
+            self.query = query
+            return
+        self._refilter(query)
+
+    def _refilter(self, query):
+        self.query = query
+        self.visible = self.names if not query else self._matching(query, self.names, self._lower)
+
+    def _matching(self, query, names, lower):
+        if not query:
+            return list(names)
+        if _is_glob(query):
+            matcher = re.compile(translate(query.lower()))
+            return [name for name, key in zip(names, lower) if matcher.match(key)]
+        needle = query.lower()
+        return [name for name, key in zip(names, lower) if needle in key]
+
+    def rows(self, start, count):
+        return self.visible[start:start + count]
+
+    def is_selected(self, name):
+        return name in self.selected
+
+    def set_selected(self, name, selected):
+        if selected:
+            self.selected.add(name)
+        else:
+            self.selected.discard(name)
+
+    def select_all_matching(self):
+        self.selected.update(self.visible)
+
+    def clear_selection(self):
+        self.selected.clear()
+
+    def selected_names(self):
+        # Document order, so edits and reports follow the file.
+        if not self.selected:
+            return []
+        return [name for name in self.names if name in self.selected]
+
+
+def _is_glob(query):
+    return any(char in query for char in "*?[")
@@ -0,0 +1,62 @@
+from typestool.loader import iter_type_names
+
+# Names files are read in blocks of this many characters, a token cut at the
+# end of a block is carried over to the next one.
+READ_BLOCK = 1 << 20
+
+
+def split_type_names(content):
+    return content.replace(",", " ").split()
+
+
+def iter_names_file(names_file, block_size=READ_BLOCK):
+    # Same tokens as split_type_names over the whole file, in memory bounded
+    # by the block size.
+    with open(names_file, 'r', encoding='utf-8') as f:
+        tail = ""
+        while True:
+            block = f.read(block_size)
+            if not block:
+                break
+            tokens = split_type_names(tail + block)
+            # The last token may continue in the next block unless the block
+            # ended on a separator.
+            tail = tokens.pop() if tokens and not block[-1].isspace() and block[-1] != "," else ""
+            yield from tokens
+        if tail:
+            yield tail
+
+
+def read_type_names(names_file):
+    return list(iter_names_file(names_file))
+
+
+def unique_type_names(type_names, existing=(), stats=None):
+    # The first occurrence of every name not in existing, in input order.
+    # stats, a dict, gets the number of "duplicate" and "existing" names
+    # dropped.
+    seen = set()
+    duplicates = skipped = 0
+    for type_name in type_names:
+        if type_name in seen:
+            duplicates += 1
+            continue
+        seen.add(type_name)
+        if type_name in existing:
+            skipped += 1
+            continue
+        yield type_name
+    if stats is not None:
+        stats["duplicate"] = duplicates
+        stats["existing"] = skipped
+
+
+def existing_type_names(xml_file):
+    # Name index of a types.xml, streamed so only the names stay in memory.
+    return set(iter_type_names(xml_file))
+
+
+def read_new_type_names(names_file, target_file=None, stats=None):
+    # Distinct names from names_file, minus those target_file already defines.
+    existing = existing_type_names(target_file) if target_file is not None else ()
+    return list(unique_type_names(iter_names_file(names_file), existing, stats))
@@ -0,0 +1,264 @@
+import ast
+import json
+import re
+from collections import Counter
+from fnmatch import translate
+
+from typestool.generate import append_chunks, iter_named_body_chunks, render_type_body, write_named_types_xml
+from typestool.model import FIELDS, FLAGS, TAGS, parse_count
+from typestool.storage import FSYNC_FILE, atomic_open
+
+# Preset library: named sets of generation values plus ordered name-pattern
+# rules choosing a preset per class name. Stored as JSON:
+#
+#   {"format": "typestool-presets", "version": 1,
+#    "presets": {"magazines": {"fields": {"nominal": "20", ...},
+#                              "flags": {"count_in_map": "1", ...},
+#                              "category": ["weapons"], "usage": ["Military"], "value": []}},
+#    "rules": [{"pattern": "*_Mag_*", "preset": "magazines"}, ...],
+#    "default": "magazines"}
+#
+# Patterns are case-insensitive globs over the whole class name, the first
+# matching rule wins and names no rule matches use the default preset.
+
+PRESETS_FORMAT = "typestool-presets"
+PRESETS_VERSION = 1
+# Length of the literal substrings patterns are indexed by, see RuleMatcher.
+GRAM = 3
+_WILDCARD = re.compile(r"\*|\?|\[[^\]]*\]")
+
+# Keys of the old settings.txt, the generator's entry labels.
+LEGACY_FIELD_KEYS = {"Nominal": "nominal", "Lifetime": "lifetime", "Restock": "restock", "Min": "min", "Quantmin": "quantmin", "Quantmax": "quantmax", "Cost": "cost"}
+
+
+def new_preset(fields=None, flags=None, categories=(), usages=(), values=()):
+    return {
+        "fields": {field: str(value) for field, value in (fields or {}).items()},
+        "flags": {flag: str(value) for flag, value in (flags or {}).items()},
+        "category": list(categories),
+        "usage": list(usages),
+        "value": list(values),
+    }
+
+
+def check_preset(name, preset):
+    fields = preset.get("fields", {})
+    missing = [field for field in FIELDS if field not in fields]
+    if missing:
+        raise ValueError(f"Preset '{name}' is missing {', '.join(missing)}.")
+    for field, value in fields.items():
+        if field not in FIELDS:
+            raise ValueError(f"Preset '{name}' has unknown field '{field}'.")
+        try:
+            parse_count(value)
+        except ValueError:
+            raise ValueError(f"Preset '{name}': {field} must be a whole number >= -1, not {value!r}.")
+    for flag, value in preset.get("flags", {}).items():
+        if flag not in FLAGS:
+            raise ValueError(f"Preset '{name}' has unknown flag '{flag}'.")
+        if not isinstance(value, str):
+            raise ValueError(f"Preset '{name}': flag {flag} must be a string.")
+    for tag in TAGS:
+        tag_names = preset.get(tag, [])
+        if not isinstance(tag_names, list) or not all(isinstance(tag_name, str) for tag_name in tag_names):
+            raise ValueError(f"Preset '{name}': {tag} must be a list of names.")
+    return preset
+
+
+def render_preset_body(preset):
+    return render_type_body(preset["fields"], preset.get("flags", {}), preset.get("category", ()), preset.get("usage", ()), preset.get("value", ()))
+
+
+def pattern_literals(pattern):
+    # The literal runs a name must contain to match the glob.
+    return [part for part in _WILDCARD.split(pattern) if part]
+
+
+class RuleMatcher:
+    # Ordered glob patterns compiled for one pass over many names. Every
+    # pattern is indexed by one trigram of the literal text it requires, so
+    # a name only tries the few patterns sharing one of its trigrams (plus
+    # those too short to index) instead of all of them. Candidates are tried
+    # in rule order and the first full match wins, same as trying every
+    # pattern in turn.
+    def __init__(self, patterns):
+        self.patterns = list(patterns)
+        self._regexes = [re.compile(translate(pattern.lower())).match for pattern in self.patterns]
+        self._by_gram = {}
+        self._exact = {}
+        unindexed = []
+        for index, pattern in enumerate(self.patterns):
+            pattern = pattern.lower()
+            if not _WILDCARD.search(pattern):
+                self._exact.setdefault(pattern, index)
+                continue
+            grams = [literal[i:i + GRAM] for literal in pattern_literals(pattern) for i in range(len(literal) - GRAM + 1)]
+            if not grams:
+                unindexed.append(index)
+                continue
+            # The least used trigram keeps the buckets even.
+            gram = min(grams, key=lambda gram: len(self._by_gram.get(gram, ())))
+            self._by_gram.setdefault(gram, []).append(index)
+        self._unindexed = unindexed
+        self._grams_needed = bool(self._by_gram)
+
+    def __len__(self):
+        return len(self.patterns)
+
+    def match(self, name):
+        # Index of the first matching pattern, or None.
+        key = name.lower()
+        best = self._exact.get(key)
+        candidates = self._unindexed
+        if self._grams_needed:
+            by_gram = self._by_gram
+            found = None
+            for i in range(len(key) - GRAM + 1):
+                bucket = by_gram.get(key[i:i + GRAM])
+                if bucket is not None:
+                    if found is None:
+                        found = set(bucket)
+                    else:
+                        found.update(bucket)
+            if found:
+                candidates = sorted(found.union(self._unindexed)) if self._unindexed else sorted(found)
+        regexes = self._regexes
+        for index in candidates:
+            if best is not None and index > best:
+                break
+            if regexes[index](key):
+                return index
+        return best
+
+
+class PresetLibrary:
+    def __init__(self, presets=None, rules=None, default=None):
+        self.presets = dict(presets or {})
+        # [(pattern, preset name)], first match wins.
+        self.rules = list(rules or [])
+        self.default = default
+
+    def set_preset(self, name, preset):
+        if not name:
+            raise ValueError("A preset needs a name.")
+        self.presets[name] = check_preset(name, preset)
+
+    def remove_preset(self, name):
+        del self.presets[name]
+        self.rules = [(pattern, preset) for pattern, preset in self.rules if preset != name]
+        if self.default == name:
+            self.default = None
+
+    def set_rules(self, rules):
+        for pattern, preset in rules:
+            if preset not in self.presets:
+                raise ValueError(f"Rule '{pattern}' uses unknown preset '{preset}'.")
+        self.rules = list(rules)
+
+    def matcher(self):
+        return RuleMatcher(pattern for pattern, _ in self.rules)
+
+    def resolve(self, name, matcher=None):
+        # Preset name for a class name, None when nothing applies.
+        index = (matcher or self.matcher()).match(name)
+        return self.rules[index][1] if index is not None else self.default
+
+    def to_dict(self):
+        return {
+            "format": PRESETS_FORMAT,
+            "version": PRESETS_VERSION,
+            "presets": self.presets,
+            "rules": [{"pattern": pattern, "preset": preset} for pattern, preset in self.rules],
+            "default": self.default,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        if data.get("format") != PRESETS_FORMAT or data.get("version") != PRESETS_VERSION:
+            raise ValueError(f"Not a {PRESETS_FORMAT} version {PRESETS_VERSION} file.")
+        library = cls()
+        for name, preset in data.get("presets", {}).items():
+            library.set_preset(name, new_preset(preset.get("fields"), preset.get("flags"), preset.get("category", ()), preset.get("usage", ()), preset.get("value", ())))
+        library.set_rules([(rule["pattern"], rule["preset"]) for rule in data.get("rules", [])])
+        default = data.get("default")
+        if default is not None and default not in library.presets:
+            raise ValueError(f"Default preset '{default}' does not exist.")
+        library.default = default
+        return library
+
+
+def parse_rules(text):
+    # "pattern = preset" per line, # starts a comment.
+    rules = []
+    for number, line in enumerate(text.splitlines(), 1):
+        line = line.split("#", 1)[0].strip()
+        if not line:
+            continue
+        pattern, sep, preset = line.rpartition("=")
+        if not sep or not pattern.strip() or not preset.strip():
+            raise ValueError(f"Line {number}: expected 'pattern = preset', got {line!r}.")
+        rules.append((pattern.strip(), preset.strip()))
+    return rules
+
+
+def format_rules(rules):
+    return "".join(f"{pattern} = {preset}\n" for pattern, preset in rules)
+
+
+def load_presets(presets_file):
+    with open(presets_file, 'r', encoding='utf-8') as f:
+        return PresetLibrary.from_dict(json.load(f))
+
+
+def save_presets(presets_file, library, fsync=FSYNC_FILE):
+    with atomic_open(presets_file, fsync) as f:
+        f.write(json.dumps(library.to_dict(), indent=2).encode('utf-8'))
+    return presets_file
+
+
+def import_settings_file(settings_file):
+    # The old settings.txt held a dict repr; read it as a literal only, never
+    # evaluated, and turn it into a preset.
+    with open(settings_file, 'r', encoding='utf-8') as f:
+        settings = ast.literal_eval(f.read())
+    if not isinstance(settings, dict):
+        raise ValueError(f"{settings_file} does not hold saved settings.")
+    fields = {field: str(settings.get(key, "")) for key, field in LEGACY_FIELD_KEYS.items()}
+    flags = {flag: str(settings[flag]) for flag in FLAGS if flag in settings}
+    return new_preset(fields, flags)
+
+
+def generate_preset_types_xml(type_names, output_file, library, fallback=None, job=None, append=False):
+    # One pass over the names: each is matched once and written with the
+    # pre-rendered body of its preset. fallback is a preset used when no rule
+    # matches and the library has no default; names left without one are
+    # skipped. Returns (written, types per preset, skipped names).
+    matcher = library.matcher()
+    bodies = {name: render_preset_body(preset) for name, preset in library.presets.items()}
+    rule_bodies = [(preset, bodies[preset]) for _, preset in library.rules]
+    if library.default is not None:
+        default = (library.default, bodies[library.default])
+    elif fallback is not None:
+        default = ("", render_preset_body(fallback))
+    else:
+        default = None
+    counts = Counter()
+    skipped = []
+
+    def named_bodies():
+        match = matcher.match
+        for type_name in type_names:
+            index = match(type_name)
+            chosen = rule_bodies[index] if index is not None else default
+            if chosen is None:
+                skipped.append(type_name)
+                continue
+            counts[chosen[0]] += 1
+            yield type_name, chosen[1]
+
+    total = len(type_names) if hasattr(type_names, '__len__') else 0
+    if append:
+        written = append_chunks(iter_named_body_chunks(named_bodies()), total, output_file, job)
+    else:
+        written = write_named_types_xml(named_bodies(), output_file, total, job=job)
+    return written, counts, skipped
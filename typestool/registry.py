@@ -0,0 +1,100 @@
+class TypeRegistry:
+    def __init__(self, root_element):
+        self.root_element = root_element
+        self._by_name = {}
+        self._by_lower = None
+        # Later elements sharing a name are kept aside so removing the first
+        # one promotes the next, just like a fresh find() would.
+        self._shadowed = {}
+        for type_elem in root_element.findall('type'):
+            self.register(type_elem)
+
+    def register(self, type_elem):
+        name = type_elem.get('name')
+        if name is None:
+            return
+        if name in self._by_name:
+            self._shadowed.setdefault(name, []).append(type_elem)
+            return
+        self._by_name[name] = type_elem
+        if self._by_lower is not None:
+            self._by_lower.setdefault(name.lower(), []).append(name)
+
+    def _unregister(self, name):
+        type_elem = self._by_name.pop(name)
+        shadowed = self._shadowed.get(name)
+        if shadowed:
+            self._by_name[name] = shadowed.pop(0)
+            if not shadowed:
+                del self._shadowed[name]
+        if self._by_lower is not None and name not in self._by_name:
+            key = name.lower()
+            self._by_lower[key].remove(name)
+            if not self._by_lower[key]:
+                del self._by_lower[key]
+        return type_elem
+
+    def _lower_view(self):
+        if self._by_lower is None:
+            self._by_lower = {}
+            for name in self._by_name:
+                self._by_lower.setdefault(name.lower(), []).append(name)
+        return self._by_lower
+
+    def get(self, name, ignore_case=False):
+        type_elem = self._by_name.get(name)
+        if type_elem is None and ignore_case and name is not None:
+            matches = self._lower_view().get(name.lower())
+            if matches:
+                type_elem = self._by_name[matches[0]]
+        return type_elem
+
+    def names(self):
+        return list(self._by_name)
+
+    def __contains__(self, name):
+        return name in self._by_name
+
+    def __len__(self):
+        return len(self._by_name)
+
+    def __iter__(self):
+        return iter(self._by_name)
+
+    def add(self, type_elem):
+        name = type_elem.get('name')
+        if not name:
+            raise ValueError("Type element has no name.")
+        if name in self._by_name:
+            raise ValueError(f"Type '{name}' already exists.")
+        self.root_element.append(type_elem)
+        self.register(type_elem)
+        return type_elem
+
+    def rename(self, old_name, new_name):
+        if old_name not in self._by_name:
+            raise KeyError(old_name)
+        if new_name in self._by_name:
+            raise ValueError(f"Type '{new_name}' already exists.")
+        type_elem = self._unregister(old_name)
+        type_elem.set('name', new_name)
+        self.register(type_elem)
+        return type_elem
+
+    def replace(self, type_elems):
+        # Swaps in new elements for existing names, keeping their position in
+        # the document. type_elems maps name to element, any number of them
+        # cost one pass over the root.
+        replacements = {id(self._by_name[name]): type_elem for name, type_elem in type_elems.items()}
+        for index, child in enumerate(list(self.root_element)):
+            type_elem = replacements.get(id(child))
+            if type_elem is not None:
+                self.root_element[index] = type_elem
+        self._by_name.update(type_elems)
+
+    def remove(self, name):
+        if name not in self._by_name:
+            raise KeyError(name)
+        type_elem = self._unregister(name)
+        self.root_element.remove(type_elem)
+        return type_elem
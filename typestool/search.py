@@ -0,0 +1,125 @@
+import heapq
+from bisect import bisect_left
+
+SUGGESTION_LIMIT = 50
+
+
+def _trigrams(text):
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+class SearchIndex:
+    def __init__(self, names=()):
+        self._names = []
+        self._lower = []
+        self._ids = {}
+        self._trigrams = {}
+        self._sorted_keys = []
+        self._sorted_ids = []
+        self._sorted_dirty = False
+        self._last_query = None
+        self._last_ids = None
+        self.extend(names)
+
+    def __len__(self):
+        return len(self._ids)
+
+    def __contains__(self, name):
+        return name in self._ids
+
+    def extend(self, names):
+        for name in names:
+            self.add(name)
+
+    def add(self, name):
+        if name in self._ids:
+            return
+        type_id = len(self._names)
+        lower = name.lower()
+        self._ids[name] = type_id
+        self._names.append(name)
+        self._lower.append(lower)
+        for trigram in _trigrams(lower):
+            self._trigrams.setdefault(trigram, []).append(type_id)
+        self._sorted_dirty = True
+        self._last_query = None
+
+    def remove(self, name):
+        type_id = self._ids.pop(name, None)
+        if type_id is None:
+            return
+        # Removed slots stay in the trigram lists; an empty key never matches
+        # a non-empty query so they drop out when candidates are verified.
+        self._names[type_id] = None
+        self._lower[type_id] = ""
+        self._sorted_dirty = True
+        self._last_query = None
+
+    def rename(self, old_name, new_name):
+        self.remove(old_name)
+        self.add(new_name)
+
+    def prepare(self):
+        if self._sorted_dirty:
+            order = sorted(self._ids.values(), key=self._lower.__getitem__)
+            self._sorted_ids = order
+            self._sorted_keys = [self._lower[type_id] for type_id in order]
+            self._sorted_dirty = False
+
+    def _prefix_ids(self, query, limit):
+        self.prepare()
+        keys = self._sorted_keys
+        pos = bisect_left(keys, query)
+        found = []
+        while pos < len(keys) and len(found) < limit and keys[pos].startswith(query):
+            found.append(self._sorted_ids[pos])
+            pos += 1
+        return found
+
+    def _candidate_ids(self, query):
+        lower = self._lower
+        if self._last_query is not None and self._last_query in query:
+            pool = self._last_ids
+        else:
+            pool = None
+            for trigram in _trigrams(query):
+                postings = self._trigrams.get(trigram)
+                if postings is None:
+                    return []
+                if pool is None or len(postings) < len(pool):
+                    pool = postings
+        return [type_id for type_id in pool if query in lower[type_id]]
+
+    def _short_query_ids(self, query, limit):
+        # One or two characters match most of the list, so rather than
+        # collecting every hit just walk the sorted keys until the cap is met.
+        found = self._prefix_ids(query, limit)
+        if len(found) < limit:
+            taken = set(found)
+            for type_id, key in zip(self._sorted_ids, self._sorted_keys):
+                if query in key and type_id not in taken:
+                    found.append(type_id)
+                    if len(found) >= limit:
+                        break
+        return found
+
+    def search(self, query, limit=SUGGESTION_LIMIT):
+        query = query.lower()
+        if not query:
+            return [name for name in self._names if name is not None][:limit]
+        if len(query) < 3:
+            self._last_query = None
+            return [self._names[type_id] for type_id in self._short_query_ids(query, limit)]
+        candidates = self._candidate_ids(query)
+        self._last_query = query
+        self._last_ids = candidates
+
+        # Exact and prefix hits come first in sorted order, then the remaining
+        # substring hits ranked by match position and name length.
+        results = self._prefix_ids(query, limit)
+        if len(results) < limit:
+            lower = self._lower
+            taken = set(results)
+            rest = [type_id for type_id in candidates if type_id not in taken]
+            results += heapq.nsmallest(limit - len(results), rest, key=lambda type_id: (lower[type_id].find(query), len(lower[type_id]), lower[type_id]))
+        return [self._names[type_id] for type_id in results]
@@ -0,0 +1,465 @@
+import mmap
+import re
+import xml.etree.ElementTree as ET
+from itertools import chain
+from xml.sax.saxutils import escape, unescape
+
+from typestool.storage import FSYNC_FILE, atomic_open, file_state, write_tree
+
+# Formatting-preserving saves. Every top-level <type> of the file on disk
+# has a byte span; a save copies the original bytes of the types that did
+# not change, along with the comments and whitespace between them, and
+# serializes only the changed, added and moved types. Removed types are cut
+# out together with the whitespace in front of them. A changed type keeps
+# the bytes of its unchanged children and comments, and changed or new
+# children are written in the style of the file.
+
+# Groups: 1 comment, 2 CDATA, 3 <type, 4 </type>.
+_MARKUP = re.compile(rb'(<!--)|(<!\[CDATA\[)|(<type[\s/>])|(</type\s*>)')
+_TAG_END = re.compile(rb'(?:[^>"\']|"[^"]*"|\'[^\']*\')*>')
+_NAME = re.compile(rb'\sname\s*=\s*(?:"([^"]*)"|\'([^\']*)\')')
+_ENCODING = re.compile(rb'<\?xml[^>]*encoding\s*=\s*["\']([A-Za-z0-9._-]+)["\']')
+_WHITESPACE = b" \t\r\n"
+# Whitespace in front of a type longer than this is only partly cut.
+_LEAD_LIMIT = 256
+_ENTITIES = {"&quot;": '"', "&apos;": "'"}
+_CHILD = re.compile(rb'<([^\s/>!?]+)')
+_QUOTE = re.compile(rb'=\s*(["\'])')
+_CLOSE_PATTERNS = {}
+DEFAULT_INDENT = b"\n    "
+
+
+class SpanError(ValueError):
+    pass
+
+
+def scan_type_spans(data):
+    # [(name, lead, start, end)] of the top-level <type> elements: lead is
+    # where the whitespace in front of the element begins, end is just past
+    # its closing tag. Comments and CDATA are skipped, so a <type> inside
+    # them does not count.
+    match = _ENCODING.match(data, 3 if data[:3] == b"\xef\xbb\xbf" else 0)
+    if match is not None and match.group(1).lower() not in (b"utf-8", b"utf8", b"us-ascii", b"ascii"):
+        raise SpanError(f"{match.group(1).decode('ascii')} files are rewritten, only UTF-8 keeps its formatting.")
+    spans = []
+    depth = 0
+    open_span = None
+    pos = 0
+    search = _MARKUP.search
+    while True:
+        match = search(data, pos)
+        if match is None:
+            break
+        kind = match.lastindex
+        start = match.start()
+        if kind == 1 or kind == 2:
+            closing = b"-->" if kind == 1 else b"]]>"
+            pos = data.find(closing, match.end())
+            if pos < 0:
+                raise SpanError("Unterminated comment." if kind == 1 else "Unterminated CDATA section.")
+            pos += 3
+            continue
+        if kind == 4:
+            pos = match.end()
+            depth -= 1
+            if depth < 0:
+                raise SpanError("Unbalanced </type>.")
+            if depth == 0:
+                spans.append(open_span + (pos,))
+                open_span = None
+            continue
+        tag_end = _TAG_END.match(data, start + 5)
+        if tag_end is None:
+            raise SpanError("Unterminated <type> tag.")
+        pos = tag_end.end()
+        empty = data[pos - 2] == 47  # "/>"
+        if depth == 0:
+            name = _NAME.search(data, start, pos)
+            if name is not None:
+                name = (name.group(1) if name.group(1) is not None else name.group(2)).decode('utf-8')
+                if "&" in name:
+                    name = unescape(name, _ENTITIES)
+            before = data[max(0, start - _LEAD_LIMIT):start]
+            lead = start - (len(before) - len(before.rstrip(_WHITESPACE)))
+            open_span = (name, lead, start)
+            if empty:
+                spans.append(open_span + (pos,))
+                open_span = None
+                continue
+        elif empty:
+            continue
+        depth += 1
+    if depth:
+        raise SpanError("Unterminated <type> element.")
+    return spans
+
+
+def _serialize(type_elem):
+    # The element alone: its tail belongs to the whitespace after it.
+    tail = type_elem.tail
+    type_elem.tail = None
+    try:
+        return ET.tostring(type_elem, encoding='unicode').encode('utf-8')
+    finally:
+        type_elem.tail = tail
+
+
+def _element_end(data, tag, pos, limit):
+    # End of the element whose start tag ends at pos.
+    pattern = _CLOSE_PATTERNS.get(tag)
+    if pattern is None:
+        pattern = _CLOSE_PATTERNS[tag] = re.compile(rb'<(/?)' + re.escape(tag) + rb'(?=[\s/>])')
+    depth = 1
+    while depth:
+        match = pattern.search(data, pos, limit)
+        if match is None:
+            return None
+        tag_end = _TAG_END.match(data, match.end())
+        if tag_end is None:
+            return None
+        pos = tag_end.end()
+        if match.group(1):
+            depth -= 1
+        elif data[pos - 2] != 47:
+            depth += 1
+    return pos
+
+
+def _type_parts(original):
+    # (start tag, [(kind, lead, bytes)], closing lead, closing tag) of the
+    # bytes of one <type>, kind being "element" or "comment" and lead the
+    # whitespace in front. None when there is more than whitespace between
+    # the children, which is left to ElementTree.
+    head = _TAG_END.match(original, 5)
+    if head is None:
+        return None
+    start_tag = original[:head.end()]
+    if start_tag.endswith(b"/>"):
+        return start_tag, [], None, None
+    close = original.rfind(b"</")
+    tokens = []
+    pos = head.end()
+    while True:
+        lt = original.find(b"<", pos, close)
+        if lt < 0:
+            break
+        lead = original[pos:lt]
+        if lead.strip(_WHITESPACE):
+            return None
+        if original.startswith(b"<!--", lt):
+            end = original.find(b"-->", lt, close)
+            if end < 0:
+                return None
+            end += 3
+            tokens.append(("comment", lead, original[lt:end]))
+        else:
+            match = _CHILD.match(original, lt)
+            tag_end = _TAG_END.match(original, lt + 1) if match is not None else None
+            if tag_end is None:
+                return None
+            end = tag_end.end()
+            if original[end - 2] != 47:
+                end = _element_end(original, match.group(1), end, close)
+                if end is None:
+                    return None
+            tokens.append(("element", lead, original[lt:end]))
+        pos = end
+    closing_lead = original[pos:close]
+    if closing_lead.strip(_WHITESPACE):
+        return None
+    return start_tag, tokens, closing_lead, original[close:]
+
+
+def _style(sample):
+    # The attribute quote and the "/>" or " />" of empty elements in sample.
+    match = _QUOTE.search(sample)
+    quote = match.group(1).decode('ascii') if match is not None else '"'
+    return quote, " />" if b" />" in sample else "/>"
+
+
+def _attributes(attrib, quote):
+    entities = {quote: "&quot;" if quote == '"' else "&apos;", "\n": "&#10;", "\r": "&#13;", "\t": "&#09;"}
+    return "".join(f" {key}={quote}{escape(value, entities)}{quote}" for key, value in attrib.items())
+
+
+def _render(elem, quote, empty, like=None):
+    # A child in the file's style; like is the bytes of the child it
+    # replaces, whose <x></x> or <x/> form an empty one keeps.
+    if len(elem) or not isinstance(elem.tag, str) or "{" in elem.tag:
+        return _serialize(elem)
+    attributes = _attributes(elem.attrib, quote)
+    if elem.text or (like is not None and not like.endswith(b"/>")):
+        return f"<{elem.tag}{attributes}>{escape(elem.text or '')}</{elem.tag}>".encode('utf-8')
+    return f"<{elem.tag}{attributes}{empty}".encode('utf-8')
+
+
+def _same(a, b):
+    if a.tag != b.tag or a.attrib != b.attrib or (a.text or "") != (b.text or "") or len(a) != len(b):
+        return False
+    return all(_same(x, y) and (x.tail or "").strip() == (y.tail or "").strip() for x, y in zip(a, b))
+
+
+def serialize_like(type_elem, original=None, sample=b""):
+    # The <type> as bytes laid out like original, its bytes in the file:
+    # unchanged children are copied with the whitespace in front of them,
+    # comments stay in front of the child they preceded, and changed or new
+    # children take the indentation and quoting of the ones they replace.
+    # A type new to the file is written in the style of sample.
+    if type_elem.text and type_elem.text.strip():
+        return _serialize(type_elem)
+    parts = _type_parts(original) if original is not None else None
+    if original is not None and parts is None:
+        return _serialize(type_elem)
+    if parts is not None:
+        try:
+            old = ET.fromstring(original)
+        except ET.ParseError:
+            return _serialize(type_elem)
+        start_tag, tokens, closing_lead, closing = parts
+        old_elements = [token for token in tokens if token[0] == "element"]
+        if len(old) != len(old_elements):
+            return _serialize(type_elem)
+        quote, empty = _style(original)
+    else:
+        start_tag, tokens, closing_lead, closing = None, [], None, None
+        old = old_elements = []
+        quote, empty = _style(sample)
+    children = list(type_elem)
+    if not children and start_tag is not None and start_tag.endswith(b"/>") and old.attrib == type_elem.attrib:
+        return bytes(original)
+
+    # Unchanged children first, in file order where possible, then a child
+    # of the same tag for each changed one.
+    count = len(old_elements)
+    used = [False] * count
+    matches = [None] * len(children)
+    last = -1
+    for i, child in enumerate(children):
+        for j in chain(range(last + 1, count), range(last + 1)):
+            if not used[j] and _same(child, old[j]):
+                used[j] = True
+                matches[i] = (j, True)
+                last = j
+                break
+    for i, child in enumerate(children):
+        if matches[i] is None:
+            for j in range(count):
+                if not used[j] and old[j].tag == child.tag:
+                    used[j] = True
+                    matches[i] = (j, False)
+                    break
+
+    if start_tag is not None and old.attrib == type_elem.attrib:
+        head = start_tag[:-2].rstrip() + b">" if start_tag.endswith(b"/>") else start_tag
+    else:
+        head = f"<type{_attributes(type_elem.attrib, quote)}>".encode('utf-8')
+    # Comments go in front of the old child that followed them.
+    comments = []
+    position = 0
+    for kind, lead, text in tokens:
+        if kind == "element":
+            position += 1
+        else:
+            comments.append((position, lead + text))
+    out = [head]
+    pending = 0
+    lead = old_elements[0][1] if old_elements else None
+    for i, child in enumerate(children):
+        match = matches[i]
+        if match is not None:
+            j, same = match
+            while pending < len(comments) and comments[pending][0] <= j:
+                out.append(comments[pending][1])
+                pending += 1
+            lead = old_elements[j][1]
+            out.append(lead)
+            out.append(old_elements[j][2] if same else _render(child, quote, empty, old_elements[j][2]))
+            continue
+        if lead is None:
+            # No child to copy from: the whitespace the tree has.
+            whitespace = type_elem.text if i == 0 else children[i - 1].tail
+            out.append((whitespace or "").encode('utf-8'))
+        else:
+            out.append(lead)
+        like = next((token[2] for token, elem in zip(old_elements, old) if elem.tag == child.tag), None)
+        out.append(_render(child, quote, empty, like))
+    out.extend(text for _, text in comments[pending:])
+    if closing_lead is None:
+        closing_lead = ((children[-1].tail if children else type_elem.text) or "").encode('utf-8')
+        closing = b"</type>"
+    out.append(closing_lead)
+    out.append(closing)
+    return b"".join(out)
+
+
+class TypeSpans:
+    # Byte spans of the loaded document's types in its file, kept up to
+    # date across saves. Spans belong to elements, so in-place edits and
+    # renames keep them; elements are matched to the spans of a scanned
+    # file by name, in order. Unchanged types are only copied from a file in
+    # the trusted state, the one the tree was read from or last written to.
+    def __init__(self, xml_file):
+        self.xml_file = xml_file
+        self.spans = {}
+        self.state = None
+        self.trusted = None
+        # Spans of types the tree does not have, cut on the next write.
+        self.unmatched = []
+        self.indent = DEFAULT_INDENT
+        # Bytes of a type of the file, the style new types are written in.
+        self.sample = b""
+        self.usable = False
+        self.error = None
+
+    def trust(self, state):
+        # The tree holds what the file held in this state, apart from the
+        # types edited since.
+        self.trusted = state
+
+    def scan(self, root_element):
+        # Returns whether the file could be scanned; usable is only set when
+        # its types can be copied as well.
+        self.spans = {}
+        self.unmatched = []
+        self.usable = False
+        state = file_state(self.xml_file)
+        try:
+            with open(self.xml_file, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                found = scan_type_spans(data)
+                if found:
+                    _, lead, start, end = found[0]
+                    self.indent = data[lead:start] or DEFAULT_INDENT
+                    self.sample = data[start:end]
+        except (OSError, ValueError) as e:
+            self.error = e
+            return False
+        by_name = {}
+        for name, lead, start, end in found:
+            by_name.setdefault(name, []).append((lead, start, end))
+        for spans in by_name.values():
+            spans.reverse()
+        for type_elem in root_element:
+            if type_elem.tag != 'type':
+                continue
+            spans = by_name.get(type_elem.get('name'))
+            if spans:
+                self.spans[type_elem] = spans.pop()
+        self.unmatched = [span for spans in by_name.values() for span in spans]
+        self.state = state
+        self.usable = self.trusted is None or state == self.trusted
+        self.error = None
+        return True
+
+    def _plan(self, root_element, changed):
+        # [(element, span, dirty)] in tree order, all dirty when changed is
+        # None. A span is kept while the spans stay in file order; an element
+        # out of order is written anew where the tree has it and its old span
+        # is cut.
+        plan = []
+        used = set()
+        last_end = 0
+        spans = self.spans
+        for type_elem in root_element:
+            if type_elem.tag != 'type':
+                # Anything else at the top level stays where the file has it.
+                continue
+            span = spans.get(type_elem)
+            if span is not None and span[1] >= last_end:
+                last_end = span[2]
+                used.add(span)
+                plan.append((type_elem, span, changed is None or type_elem.get('name') in changed))
+            else:
+                plan.append((type_elem, None, True))
+        cuts = sorted([span for span in spans.values() if span not in used] + self.unmatched)
+        return plan, cuts
+
+    def write(self, root_element, changed, fsync=FSYNC_FILE):
+        # Writes the document, copying unchanged types from the current file;
+        # changed is the set of type names edited since the last save.
+        # Returns False, writing nothing, when the file no longer matches the
+        # spans and could not be scanned again.
+        if not self.usable or file_state(self.xml_file) != self.state:
+            if not self.scan(root_element):
+                return False
+            if not self.usable:
+                # Changed by someone else: its types may not be what the tree
+                # holds, so all of them are written, only what lies between
+                # them is kept.
+                changed = None
+        plan, cuts = self._plan(root_element, changed)
+        new_spans = {}
+        # The source is closed before the new file replaces it, which
+        # Windows insists on.
+        with atomic_open(self.xml_file, fsync) as f, open(self.xml_file, 'rb') as src, mmap.mmap(src.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            view = memoryview(data)
+            out = 0
+            pos = 0
+            last_end = 0
+            cut_index = 0
+
+            def copy_to(end):
+                # Original bytes from pos up to end, leaving out cut spans.
+                nonlocal pos, out, cut_index
+                while cut_index < len(cuts) and cuts[cut_index][0] < end:
+                    lead, _, cut_end = cuts[cut_index]
+                    cut_index += 1
+                    if lead > pos:
+                        f.write(view[pos:lead])
+                        out += lead - pos
+                    pos = max(pos, cut_end)
+                if end > pos:
+                    f.write(view[pos:end])
+                    out += end - pos
+                    pos = end
+
+            try:
+                for type_elem, span, dirty in plan:
+                    if span is None:
+                        # After the type before it, whose bytes may not be
+                        # copied yet.
+                        copy_to(last_end)
+                        text = self.indent + serialize_like(type_elem, None, self.sample)
+                        f.write(text)
+                        new_spans[type_elem] = (out, out + len(self.indent), out + len(text))
+                        out += len(text)
+                        continue
+                    lead, start, end = span
+                    last_end = end
+                    if not dirty:
+                        # Where this span lands is known before the copy, the
+                        # copy itself is batched with its neighbours below.
+                        copy_to(lead)
+                        new_spans[type_elem] = (out, out + start - lead, out + end - lead)
+                        continue
+                    copy_to(start)
+                    text = serialize_like(type_elem, data[start:end], self.sample)
+                    f.write(text)
+                    new_spans[type_elem] = (out - (start - lead), out, out + len(text))
+                    out += len(text)
+                    pos = end
+                copy_to(len(data))
+            finally:
+                view.release()
+        self.spans = new_spans
+        self.unmatched = []
+        self.state = self.trusted = file_state(self.xml_file)
+        self.usable = True
+        return True
+
+
+def save_tree(tree, xml_file, spans=None, changed=(), fsync=FSYNC_FILE, lock=None):
+    # Formatting-preserving save when spans are given and usable, a full
+    # rewrite otherwise. Returns the TypeSpans to pass to the next save.
+    if spans is not None and spans.xml_file == xml_file:
+        if lock is not None:
+            with lock:
+                if spans.write(tree.getroot(), set(changed), fsync):
+                    return spans
+        elif spans.write(tree.getroot(), set(changed), fsync):
+            return spans
+    write_tree(tree, xml_file, fsync, lock)
+    if spans is not None:
+        # Spans are found again on the next save, the file holds the tree.
+        spans.usable = False
+        spans.trust(file_state(xml_file))
+    return spans
@@ -0,0 +1,64 @@
+import os
+import tempfile
+from contextlib import contextmanager
+
+FSYNC_NEVER = "never"
+FSYNC_FILE = "file"
+FSYNC_FULL = "full"
+FSYNC_POLICIES = (FSYNC_NEVER, FSYNC_FILE, FSYNC_FULL)
+
+
+def _fsync_directory(directory):
+    if not hasattr(os, 'O_DIRECTORY'):
+        return
+    fd = os.open(directory, os.O_RDONLY | os.O_DIRECTORY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+@contextmanager
+def atomic_open(path, fsync=FSYNC_FILE):
+    # Writes go to a temp file next to the target which replaces it only once
+    # everything was written, so a crash never leaves a half-written file.
+    # "file" fsyncs the data before the rename, "full" also the directory.
+    if fsync not in FSYNC_POLICIES:
+        raise ValueError(f"Unknown fsync policy '{fsync}', expected one of {', '.join(FSYNC_POLICIES)}.")
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, temp_path = tempfile.mkstemp(prefix=f".{os.path.basename(path)}.", suffix=".tmp", dir=directory)
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            yield f
+            f.flush()
+            if fsync != FSYNC_NEVER:
+                os.fsync(f.fileno())
+        if os.path.exists(path):
+            os.chmod(temp_path, os.stat(path).st_mode & 0o7777)
+        os.replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+    if fsync == FSYNC_FULL:
+        _fsync_directory(directory)
+
+
+def file_state(path):
+    # Size and modification time, enough to notice that a file was rewritten
+    # without reading it. None when the file is missing.
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return stat.st_size, stat.st_mtime_ns
+
+
+def write_tree(tree, xml_file, fsync=FSYNC_FILE, lock=None):
+    with atomic_open(xml_file, fsync) as f:
+        if lock is None:
+            tree.write(f, encoding='utf-8', xml_declaration=True)
+        else:
+            with lock:
+                tree.write(f, encoding='utf-8', xml_declaration=True)
+    return xml_file
@@ -0,0 +1,247 @@
+import json
+import os
+import re
+from contextlib import ExitStack
+
+from typestool.cache import load_cached_types
+from typestool.model import FIELDS, TAGS
+from typestool.storage import FSYNC_NEVER, atomic_open
+
+TRADER_VERSION = 8
+ITEM_FIELDS = ("MaxPriceThreshold", "MinPriceThreshold", "SellPricePercent", "MaxStockThreshold", "MinStockThreshold", "QuantityPercent")
+CHECK_EVERY = 1000
+WRITE_BUFFER = 1024 * 1024
+SPLIT_MODES = ("category", "value", "category-value")
+UNCATEGORIZED = "Uncategorized"
+UNTIERED = "NoTier"
+# Index of each tag tuple in a packed record, see model.pack_record.
+_PACKED_TAG = {tag: 2 + len(FIELDS) + index for index, tag in enumerate(TAGS)}
+
+
+def trader_item(class_name):
+    return {
+        "ClassName": class_name,
+        "MaxPriceThreshold": 1000,
+        "MinPriceThreshold": 500,
+        "SellPricePercent": -1,
+        "MaxStockThreshold": 50,
+        "MinStockThreshold": 10,
+        "QuantityPercent": -1,
+        "SpawnAttachments": [],
+        "Variants": []
+    }
+
+
+def trader_category(display_name, icon, color, init_stock_percent, items):
+    return {
+        "m_Version": TRADER_VERSION,
+        "DisplayName": display_name,
+        "Icon": icon,
+        "Color": color,
+        "InitStockPercent": init_stock_percent,
+        "Items": items
+    }
+
+
+class TraderFileWriter:
+    # Streams one trader category file. The output is byte-for-byte what
+    # json.dump(..., indent=4) gives for the same category, but items are
+    # rendered from a template as they arrive instead of from a list.
+    def __init__(self, f, display_name, icon, color, init_stock_percent):
+        self.f = f
+        self.count = 0
+        self.pending = []
+        self.pending_size = 0
+        header = json.dumps(trader_category(display_name, icon, color, init_stock_percent, []), indent=4)
+        self.prefix, self.suffix = header.rsplit("[]", 1)
+        self.f.write(self.prefix.encode('utf-8'))
+
+    def add(self, class_name):
+        text = _ITEM_TEMPLATE.replace(_ITEM_PLACEHOLDER, json.dumps(class_name), 1)
+        self.pending.append(text if not self.count else ",\n" + text)
+        self.pending_size += len(text)
+        self.count += 1
+        if self.pending_size >= WRITE_BUFFER:
+            self.flush()
+
+    def flush(self):
+        if self.pending:
+            if self.count == len(self.pending):
+                self.pending[0] = "[\n" + self.pending[0]
+            self.f.write("".join(self.pending).encode('utf-8'))
+            self.pending = []
+            self.pending_size = 0
+
+    def close(self):
+        self.flush()
+        self.f.write(("\n    ]" if self.count else "[]").encode('utf-8') + self.suffix.encode('utf-8'))
+
+
+def _item_template():
+    placeholder = "\x00class\x00"
+    text = json.dumps(trader_item(placeholder), indent=4)
+    return "\n".join("        " + line for line in text.splitlines()), json.dumps(placeholder)
+
+
+_ITEM_TEMPLATE, _ITEM_PLACEHOLDER = _item_template()
+
+
+def write_trader_json(types_file, output_file, display_name, icon, color, init_stock_percent, job=None):
+    with load_cached_types(types_file) as types:
+        type_names = types.names
+    with atomic_open(output_file, FSYNC_NEVER) as f:
+        writer = TraderFileWriter(f, display_name, icon, color, init_stock_percent)
+        for count, type_name in enumerate(type_names):
+            if job is not None and count % CHECK_EVERY == 0:
+                job.check_cancelled()
+            writer.add(type_name)
+        writer.close()
+    return output_file
+
+
+def trader_group(packed, split):
+    # The first category and/or value tier of a packed record.
+    parts = []
+    if split in ("category", "category-value"):
+        categories = packed[_PACKED_TAG["category"]]
+        parts.append((categories[0] if categories else None) or UNCATEGORIZED)
+    if split in ("value", "category-value"):
+        values = packed[_PACKED_TAG["value"]]
+        parts.append((values[0] if values else None) or UNTIERED)
+    return "_".join(parts)
+
+
+def group_file_name(group, taken=None):
+    # taken holds the case-folded names already in use, e.g. "Vehicle Parts"
+    # and "Vehicle_Parts" or "weapons" and "Weapons" on a case-insensitive
+    # file system; a later group gets a _2, _3... suffix.
+    base = re.sub(r"[^\w.-]+", "_", group)
+    file_name = base + ".json"
+    if taken is not None:
+        number = 1
+        while file_name.casefold() in taken:
+            number += 1
+            file_name = f"{base}_{number}.json"
+        taken.add(file_name.casefold())
+    return file_name
+
+
+def write_split_trader_json(types_file, output_dir, split="category", display_name="{group}", icon="Deliver", color="FBFCFEFF", init_stock_percent=75, job=None):
+    # One pass over the types: every group's file is open at once and gets
+    # its items as they are read, so no item list is ever built. The files
+    # are swapped in together at the end, or not at all on error or cancel.
+    if split not in SPLIT_MODES:
+        raise ValueError(f"Unknown split '{split}', expected one of {', '.join(SPLIT_MODES)}.")
+    os.makedirs(output_dir, exist_ok=True)
+    writers = {}
+    taken = set()
+    with load_cached_types(types_file) as types, ExitStack() as stack:
+        for count, packed in enumerate(types.iter_packed()):
+            if job is not None and count % CHECK_EVERY == 0:
+                job.check_cancelled()
+                job.progress(count, len(types))
+            group = trader_group(packed, split)
+            writer = writers.get(group)
+            if writer is None:
+                path = os.path.join(output_dir, group_file_name(group, taken))
+                f = stack.enter_context(atomic_open(path, FSYNC_NEVER))
+                writer = writers[group] = TraderFileWriter(f, display_name.replace("{group}", group), icon, color, init_stock_percent)
+                writer.path = path
+            writer.add(packed[0])
+        for writer in writers.values():
+            writer.close()
+    return {group: (writer.path, writer.count) for group, writer in sorted(writers.items())}
+
+
+def load_json_file(json_file):
+    with open(json_file, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def save_json_file(json_file, data):
+    with open(json_file, 'w', encoding='utf-8') as f:
+        json.dump(data, f, indent=4)
+
+
+def update_trader_items(data, class_names, changes):
+    wanted = set(class_names) if class_names is not None else None
+    updated = 0
+    for item in data["Items"]:
+        if wanted is None or item["ClassName"] in wanted:
+            item.update(changes)
+            updated += 1
+    return updated
+
+
+class TraderDocument:
+    # An opened trader category with a ClassName index. Items keep their
+    # rendered JSON between saves, so a save only re-encodes the items that
+    # changed, and nothing is written while the document is clean.
+    def __init__(self, json_file, data=None):
+        self.json_file = json_file
+        self.data = load_json_file(json_file) if data is None else data
+        self.items = self.data["Items"]
+        self.index = {}
+        for position, item in enumerate(self.items):
+            self.index.setdefault(item["ClassName"], position)
+        self._rendered = [None] * len(self.items)
+        self._dirty_items = set()
+        self._header_dirty = True
+        self._header = None
+        self.dirty = False
+
+    def class_names(self):
+        return [item["ClassName"] for item in self.items]
+
+    def item(self, class_name):
+        position = self.index.get(class_name)
+        return None if position is None else self.items[position]
+
+    def set_header(self, key, value):
+        if self.data.get(key) != value:
+            self.data[key] = value
+            self._header_dirty = True
+            self.dirty = True
+
+    def update_items(self, class_names, changes):
+        # Returns how many items actually changed.
+        updated = 0
+        for class_name in class_names:
+            position = self.index.get(class_name)
+            if position is None:
+                continue
+            item = self.items[position]
+            if any(item.get(key) != value for key, value in changes.items()):
+                item.update(changes)
+                self._dirty_items.add(position)
+                updated += 1
+        if updated:
+            self.dirty = True
+        return updated
+
+    def render(self):
+        if self._header_dirty or self._header is None:
+            placeholder = "\x00items\x00"
+            header = dict(self.data)
+            header["Items"] = placeholder
+            self._header = json.dumps(header, indent=4).split(json.dumps(placeholder), 1)
+            self._header_dirty = False
+        for position in self._dirty_items:
+            self._rendered[position] = None
+        self._dirty_items.clear()
+        for position, text in enumerate(self._rendered):
+            if text is None:
+                lines = json.dumps(self.items[position], indent=4).splitlines()
+                self._rendered[position] = "\n".join("        " + line for line in lines)
+        if not self.items:
+            return self._header[0] + "[]" + self._header[1]
+        return self._header[0] + "[\n" + ",\n".join(self._rendered) + "\n    ]" + self._header[1]
+
+    def save(self, force=False):
+        if not self.dirty and not force:
+            return False
+        text = self.render()
+        with atomic_open(self.json_file, FSYNC_NEVER) as f:
+            f.write(text.encode('utf-8'))
+        self.dirty = False
+        return True
@@ -0,0 +1,265 @@
+import json
+import xml.etree.ElementTree as ET
+from collections import Counter
+
+from typestool.cache import load_cached_types
+from typestool.model import CATEGORIES, FIELDS, TAGS, USAGES, VALUES
+
+# Names known to vanilla cfglimitsdefinition.xml plus the ones the generator
+# offers. Compared case-insensitively; a server's own cfglimitsdefinition.xml
+# can replace them with load_limits_definition.
+VANILLA_CATEGORIES = ["clothes", "containers", "explosives", "food", "tools", "weapons", "books", "lootdispatch", "vehiclesparts"]
+VANILLA_USAGES = ["Military", "Police", "Medic", "Firefighter", "Industrial", "Farm", "Coast", "Town", "Village", "Hunting", "Office", "School", "Prison", "Lunapark", "SeasonalEvent", "ContaminatedArea", "Historical"]
+VANILLA_VALUES = ["Tier1", "Tier2", "Tier3", "Tier4", "Unique"]
+
+ERROR = "error"
+WARNING = "warning"
+SEVERITY = {
+    "duplicate": ERROR,
+    "missing-name": ERROR,
+    "not-numeric": ERROR,
+    "quantity-range": ERROR,
+    "min-above-nominal": ERROR,
+    "missing-field": WARNING,
+    "missing-flags": WARNING,
+    "unknown-category": WARNING,
+    "unknown-usage": WARNING,
+    "unknown-value": WARNING,
+}
+# Where the flags sit in a packed record, see model.pack_record.
+_PACKED_FLAGS = len(FIELDS) + 1
+
+
+def default_known_names():
+    return {
+        "category": {name.lower() for name in VANILLA_CATEGORIES + CATEGORIES},
+        "usage": {name.lower() for name in VANILLA_USAGES + USAGES},
+        "value": {name.lower() for name in VANILLA_VALUES + VALUES},
+    }
+
+
+def load_limits_definition(limits_file):
+    # cfglimitsdefinition.xml: <categories>, <usageflags> and <valueflags>
+    # lists of <category|usage|value name="..."/>.
+    root_element = ET.parse(limits_file).getroot()
+    known = {tag: set() for tag in TAGS}
+    for tag in TAGS:
+        for elem in root_element.iter(tag):
+            name = elem.get('name')
+            if name:
+                known[tag].add(name.lower())
+    return known
+
+
+_FIELD_INDEX = {field: index for index, field in enumerate(FIELDS)}
+
+
+class TypeChecker:
+    # Per-type checks. Whole field and tag combinations repeat heavily
+    # across a file, so their results are memoized and a typical type costs
+    # two dict lookups.
+    def __init__(self, known=None):
+        self.known = known or default_known_names()
+        self._field_results = {}
+        self._tag_results = {}
+        self._layouts = {}
+
+    def check(self, name, texts, has_flags, categories, usages, values):
+        # texts are the field texts in FIELDS order, None for a missing
+        # field. An empty field counts as missing: packed records cannot
+        # tell the two apart, and every entry point reports the same.
+        # Returns a list of (code, field, message), empty when clean.
+        texts = tuple([text if text and not text.isspace() else None for text in texts])
+        field_issues = self._field_results.get(texts)
+        if field_issues is None:
+            field_issues = self._field_results[texts] = self._check_fields(texts)
+        tags = (tuple(categories), tuple(usages), tuple(values))
+        tag_issues = self._tag_results.get(tags)
+        if tag_issues is None:
+            tag_issues = self._tag_results[tags] = self._check_tags(tags)
+        if not field_issues and not tag_issues and has_flags and name is not None:
+            return []
+        issues = list(field_issues)
+        if not has_flags:
+            issues.append(("missing-flags", "flags", "no <flags> attributes"))
+        issues += tag_issues
+        if name is None:
+            issues.append(("missing-name", None, "<type> has no name attribute"))
+        return issues
+
+    def _check_fields(self, texts):
+        issues = []
+        numbers = []
+        for field, text in zip(FIELDS, texts):
+            if text is None:
+                issues.append(("missing-field", field, f"<{field}> is missing or empty"))
+                numbers.append(None)
+                continue
+            try:
+                numbers.append(int(text))
+            except ValueError:
+                issues.append(("not-numeric", field, f"<{field}> is {text.strip()!r}, not a whole number"))
+                numbers.append(None)
+        nominal, _, _, minimum, quantmin, quantmax, _ = numbers
+        if quantmin is not None and quantmax is not None and quantmin > quantmax:
+            issues.append(("quantity-range", "quantmin", f"quantmin {quantmin} is above quantmax {quantmax}"))
+        if minimum is not None and nominal is not None and minimum > nominal:
+            issues.append(("min-above-nominal", "min", f"min {minimum} is above nominal {nominal}"))
+        return tuple(issues)
+
+    def _check_tags(self, tags):
+        issues = []
+        for tag, tag_names in zip(TAGS, tags):
+            for tag_name in tag_names:
+                if not tag_name or tag_name.lower() not in self.known[tag]:
+                    issues.append((f"unknown-{tag}", tag, f"unknown {tag} {tag_name!r}"))
+        return tuple(issues)
+
+    def check_element(self, type_elem):
+        # Types in one file share a few child layouts, so where each field,
+        # the flags and the tags sit is worked out once per layout.
+        children = type_elem[:]
+        shape = tuple([child.tag for child in children])
+        layout = self._layouts.get(shape)
+        if layout is None:
+            layout = self._layouts[shape] = _element_layout(shape)
+        field_positions, flags_position, tag_positions = layout
+        texts = tuple([(children[i].text or "") if i is not None else None for i in field_positions])
+        has_flags = flags_position is not None and bool(children[flags_position].attrib)
+        categories, usages, values = [[children[i].get('name') for i in positions] for positions in tag_positions]
+        return self.check(type_elem.get('name'), texts, has_flags, categories, usages, values)
+
+    def check_packed(self, packed):
+        return self.check(packed[0], packed[1:_PACKED_FLAGS], bool(packed[_PACKED_FLAGS]), *packed[_PACKED_FLAGS + 1:])
+
+
+def _element_layout(shape):
+    field_positions = [None] * len(FIELDS)
+    flags_position = None
+    tag_positions = {tag: [] for tag in TAGS}
+    for position, tag in enumerate(shape):
+        index = _FIELD_INDEX.get(tag)
+        if index is not None:
+            if field_positions[index] is None:
+                field_positions[index] = position
+        elif tag == 'flags':
+            if flags_position is None:
+                flags_position = position
+        elif tag in tag_positions:
+            tag_positions[tag].append(position)
+    return tuple(field_positions), flags_position, tuple(tuple(tag_positions[tag]) for tag in TAGS)
+
+
+class ValidationReport:
+    def __init__(self):
+        self.issues = {}
+        self.checked = 0
+
+    def set(self, name, issues):
+        if issues:
+            self.issues[name] = issues
+        else:
+            self.issues.pop(name, None)
+
+    def get(self, name):
+        return self.issues.get(name, [])
+
+    def __len__(self):
+        return sum(len(issues) for issues in self.issues.values())
+
+    def __bool__(self):
+        return bool(self.issues)
+
+    def count(self, severity=None):
+        return sum(1 for issues in self.issues.values() for code, _, _ in issues if severity is None or SEVERITY[code] == severity)
+
+    def by_code(self):
+        return Counter(code for issues in self.issues.values() for code, _, _ in issues)
+
+    def lines(self, limit=None):
+        shown = 0
+        for name, issues in self.issues.items():
+            for code, field, message in issues:
+                if limit is not None and shown >= limit:
+                    yield f"... and {len(self) - limit} more"
+                    return
+                yield f"{SEVERITY[code]}: {name}: {message} [{code}]"
+                shown += 1
+
+    def summary(self):
+        codes = ", ".join(f"{count} {code}" for code, count in sorted(self.by_code().items()))
+        return f"{self.checked} types checked, {self.count(ERROR)} errors, {self.count(WARNING)} warnings" + (f" ({codes})" if codes else "")
+
+    def to_dict(self):
+        return {
+            "checked": self.checked,
+            "errors": self.count(ERROR),
+            "warnings": self.count(WARNING),
+            "types": {
+                str(name): [{"code": code, "severity": SEVERITY[code], "field": field, "message": message} for code, field, message in issues]
+                for name, issues in self.issues.items()
+            },
+        }
+
+
+class TypesValidator:
+    # Full check in one pass, then revalidate(registry, names) after edits
+    # re-checks only the touched types. Duplicates come from the full pass,
+    # since field edits never change how often a name occurs.
+    def __init__(self, known=None):
+        self.checker = TypeChecker(known)
+        self.report = ValidationReport()
+        self.counts = Counter()
+
+    def _finish(self, name, issues):
+        occurrences = self.counts[name]
+        if occurrences > 1:
+            issues.insert(0, ("duplicate", None, f"defined {occurrences} times"))
+        self.report.set(name, issues)
+
+    def validate_elements(self, type_elems):
+        check = self.checker.check_element
+        return self._validate_all(((type_elem.get('name'), check(type_elem)) for type_elem in type_elems))
+
+    def validate_packed(self, packed_records):
+        check = self.checker.check_packed
+        return self._validate_all(((packed[0], check(packed)) for packed in packed_records))
+
+    def _validate_all(self, results):
+        self.report = ValidationReport()
+        counts = {}
+        found = {}
+        for name, issues in results:
+            counts[name] = counts.get(name, 0) + 1
+            if issues:
+                found.setdefault(name, []).extend(issues)
+        for name, occurrences in counts.items():
+            if occurrences > 1:
+                found.setdefault(name, [])
+        self.counts = Counter(counts)
+        for name, issues in found.items():
+            self._finish(name, issues)
+        self.report.checked = sum(counts.values())
+        return self.report
+
+    def revalidate(self, registry, names):
+        # Only the first definition of a duplicated name is editable, so
+        # that is the one re-checked.
+        for name in names:
+            type_elem = registry.get(name)
+            if type_elem is None:
+                self.counts.pop(name, None)
+                self.report.set(name, [])
+            else:
+                self._finish(name, self.checker.check_element(type_elem))
+        return self.report
+
+
+def validate_types_file(xml_file, known=None):
+    with load_cached_types(xml_file) as types:
+        return TypesValidator(known).validate_packed(types.iter_packed())
+
+
+def save_report(report_file, report):
+    with open(report_file, 'w', encoding='utf-8') as f:
+        json.dump(report.to_dict(), f, indent=2)
@@ -0,0 +1,242 @@
+from typestool.history import snapshot_element
+from typestool.jobs import watch_job
+from typestool.loader import _iter_type_elements
+from typestool.storage import file_state
+
+WATCH_INTERVAL_MS = 1000
+RECONCILE_RETRY_MS = 100
+
+
+def type_fingerprint(type_elem):
+    # Hash of everything the editor keeps of a type, including whitespace,
+    # so a type only counts as unchanged when saving it would write the
+    # same bytes.
+    return hash(snapshot_element(type_elem))
+
+
+def fingerprint_elements(type_elems):
+    # First definition wins, like TypeRegistry.
+    fingerprints = {}
+    for type_elem in type_elems:
+        name = type_elem.get('name')
+        if name is not None and name not in fingerprints:
+            fingerprints[name] = type_fingerprint(type_elem)
+    return fingerprints
+
+
+class FileScan:
+    def __init__(self, state, fingerprints, changed, removed):
+        self.state = state
+        self.fingerprints = fingerprints
+        self.changed = changed
+        self.removed = removed
+
+
+def scan_types_file(job, xml_file, baseline):
+    # Parses the file on disk and keeps only the types whose fingerprint
+    # differs from the baseline, everything else is dropped as it is read.
+    state = file_state(xml_file)
+    fingerprints = {}
+    changed = {}
+    for type_elem in _iter_type_elements(xml_file):
+        job.check_cancelled()
+        name = type_elem.get('name')
+        if name is None or name in fingerprints:
+            continue
+        fingerprint = fingerprints[name] = type_fingerprint(type_elem)
+        if baseline.get(name) != fingerprint:
+            changed[name] = type_elem
+    removed = [name for name in baseline if name not in fingerprints]
+    return FileScan(state, fingerprints, changed, removed)
+
+
+class ExternalChange:
+    def __init__(self, added, changed, removed, conflicts, replaced):
+        self.added = added
+        self.changed = changed
+        self.removed = removed
+        # name -> the version on disk, None when it was removed there.
+        self.conflicts = conflicts
+        # Elements that left the tree, for dropping their undo history.
+        self.replaced = replaced
+
+    def __bool__(self):
+        return bool(self.added or self.changed or self.removed or self.conflicts)
+
+    def names(self):
+        return self.added + self.changed + self.removed
+
+    def summary(self):
+        parts = [f"{len(names)} {label}" for label, names in (("added", self.added), ("changed", self.changed), ("removed", self.removed), ("in conflict", self.conflicts)) if names]
+        return ", ".join(parts)
+
+
+class TypesWatcher:
+    # Polls the loaded types.xml and merges changes made by other programs
+    # into the open document. Every type's fingerprint as last read from or
+    # written to disk is the baseline: a type that differs from it on disk
+    # was changed outside, and if it also has unsaved edits here it is a
+    # conflict that is left for the caller to resolve.
+    def __init__(self, widget, runner, commit_queue, interval=WATCH_INTERVAL_MS, on_change=None, on_error=None):
+        self.widget = widget
+        self.runner = runner
+        self.commit_queue = commit_queue
+        self.interval = interval
+        self.on_change = on_change
+        self.on_error = on_error
+        self.enabled = True
+        self.registry = None
+        self.xml_file = None
+        self.baseline = {}
+        self.state = None
+        self.scan_job = None
+        self._failed_state = None
+        self._timer = None
+
+    def attach(self, registry, xml_file, baseline, state):
+        self.detach()
+        self.registry = registry
+        self.xml_file = xml_file
+        self.baseline = baseline
+        self.state = state
+        self._schedule()
+
+    def detach(self):
+        if self._timer is not None:
+            self.widget.after_cancel(self._timer)
+            self._timer = None
+        if self.scan_job is not None:
+            self.scan_job.cancel()
+            self.scan_job = None
+        self.registry = None
+        self._failed_state = None
+
+    def _schedule(self, delay=None):
+        if self._timer is None and self.registry is not None:
+            self._timer = self.widget.after(self.interval if delay is None else delay, self._poll)
+
+    def changed_on_disk(self):
+        current = file_state(self.xml_file) if self.registry is not None else None
+        return current is not None and current != self.state
+
+    def can_write(self):
+        # CommitQueue hook: never save over a change that was not merged yet,
+        # look at it now instead and save once it is in.
+        if not self.enabled or not self.changed_on_disk():
+            return True
+        self.check_now()
+        return False
+
+    def on_saved(self, type_names, state):
+        # CommitQueue hook: what was just written is the new baseline.
+        if self.registry is None:
+            return
+        self.state = state
+        for name in type_names:
+            type_elem = self.registry.get(name)
+            if type_elem is None:
+                self.baseline.pop(name, None)
+            else:
+                self.baseline[name] = type_fingerprint(type_elem)
+
+    def check_now(self):
+        if self._timer is not None:
+            self.widget.after_cancel(self._timer)
+            self._timer = None
+        self._poll()
+
+    def _poll(self):
+        self._timer = None
+        if self.registry is None:
+            return
+        if self.enabled and self.scan_job is None and self.commit_queue.write_job is None:
+            current = file_state(self.xml_file)
+            if current is not None and current != self.state and current != self._failed_state:
+                job = self.runner.submit("watch", scan_types_file, self.xml_file, dict(self.baseline))
+                self.scan_job = job
+                watch_job(self.widget, job, on_done=lambda scan: self._on_scanned(job, scan), on_error=lambda error: self._on_scan_failed(job, current, error))
+                return
+        self._schedule()
+
+    def _on_scan_failed(self, job, state, error):
+        if job is not self.scan_job:
+            return
+        # Often a file caught half-written, it is read again once it changes.
+        self.scan_job = None
+        self._failed_state = state
+        if self.on_error is not None:
+            self.on_error(error)
+        self._schedule()
+
+    def _on_scanned(self, job, scan):
+        if job is not self.scan_job:
+            return
+        # Unsaved names are only known while nothing is being written or
+        # waiting to be applied.
+        if not self.commit_queue.idle or not self.commit_queue.lock.acquire(blocking=False):
+            self.widget.after(RECONCILE_RETRY_MS, lambda: self._on_scanned(job, scan))
+            return
+        try:
+            change = self._reconcile(scan)
+        finally:
+            self.commit_queue.lock.release()
+        self.scan_job = None
+        self._failed_state = None
+        if change and self.on_change is not None:
+            self.on_change(change)
+        if self.commit_queue.dirty:
+            # A save held back by can_write can go now.
+            self.commit_queue.mark_dirty(())
+        self._schedule()
+
+    def _reconcile(self, scan):
+        registry = self.registry
+        unsaved = self.commit_queue.dirty
+        added, removed, replaced = [], [], []
+        replacements = {}
+        conflicts = {}
+        for name, type_elem in scan.changed.items():
+            if name in unsaved:
+                conflicts[name] = type_elem
+            elif name in registry:
+                replacements[name] = type_elem
+            else:
+                registry.add(type_elem)
+                added.append(name)
+        for name in scan.removed:
+            if name in unsaved:
+                conflicts[name] = None
+            elif name in registry:
+                replaced.append(registry.remove(name))
+                removed.append(name)
+        replaced += [registry.get(name) for name in replacements]
+        registry.replace(replacements)
+        # Conflicting types take the disk version as baseline too, so they
+        # are reported once; keeping the local version saves it over that.
+        self.baseline = scan.fingerprints
+        self.state = scan.state
+        if self.commit_queue.spans is not None:
+            # Outside the unsaved types the tree now matches the file.
+            self.commit_queue.spans.trust(scan.state)
+        return ExternalChange(added, list(replacements), removed, conflicts, replaced)
+
+    def take_theirs(self, change, names):
+        # Resolves conflicts in favour of the file: the disk version replaces
+        # the local one and its unsaved edits are dropped.
+        replacements = {}
+        replaced = []
+        with self.commit_queue.lock:
+            for name in names:
+                type_elem = change.conflicts[name]
+                self.commit_queue.dirty.discard(name)
+                if type_elem is None:
+                    if name in self.registry:
+                        replaced.append(self.registry.remove(name))
+                elif name in self.registry:
+                    replacements[name] = type_elem
+                else:
+                    self.registry.add(type_elem)
+            replaced += [self.registry.get(name) for name in replacements]
+            self.registry.replace(replacements)
+        self.commit_queue.mark_dirty(())
+        return replaced